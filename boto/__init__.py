@@ -27,11 +27,9 @@ from boto.pyami.config import Config, BotoConfigLocations
 from boto.storage_uri import BucketStorageUri, FileStorageUri
 import boto.plugin
 import os
-import platform
 import re
 import sys
 import logging
-import logging.config
 import urlparse
 from boto.exception import InvalidUriError
 
@@ -43,9 +41,15 @@ config = Config()
 
 
 def init_logging():
+    # logging.config pulls in the socket and threading machinery for its
+    # listener, so only import it when there is a config file to read.
     for file in BotoConfigLocations:
+        path = os.path.expanduser(file)
+        if not os.path.isfile(path):
+            continue
+        import logging.config
         try:
-            logging.config.fileConfig(os.path.expanduser(file))
+            logging.config.fileConfig(path)
         except:
             pass
 
@@ -683,6 +687,7 @@ def storage_uri(uri_str, default_scheme='file', debug=0, validate=True,
         # confusion for callers, so we don't.
         colon_pos = uri_str.find(':')
         if colon_pos != -1:
+            import platform
             # Allow Windows path names including drive letter (C: etc.)
             drive_char = uri_str[0].lower()
             if not (platform.system().lower().startswith('windows')
@@ -96,16 +96,17 @@ class HmacKeys(object):
         else:
             return 'HmacSHA1'
 
-    def _get_hmac(self):
+    def _get_hmac(self, secret_key=None):
         if self._hmac_256:
             digestmod = sha256
         else:
             digestmod = sha
-        return hmac.new(self._provider.secret_key,
-                        digestmod=digestmod)
+        if secret_key is None:
+            secret_key = self._provider.secret_key
+        return hmac.new(secret_key, digestmod=digestmod)
 
-    def sign_string(self, string_to_sign):
-        new_hmac = self._get_hmac()
+    def sign_string(self, string_to_sign, secret_key=None):
+        new_hmac = self._get_hmac(secret_key)
         new_hmac.update(string_to_sign)
         return base64.encodestring(new_hmac.digest()).strip()
 
@@ -155,18 +156,19 @@ class HmacAuthV1Handler(AuthHandler, HmacKeys):
         if 'Date' not in headers:
             headers['Date'] = formatdate(usegmt=True)
 
-        if self._provider.security_token:
+        access_key, secret_key, security_token = \
+            self._provider.get_current_credentials()
+        if security_token:
             key = self._provider.security_token_header
-            headers[key] = self._provider.security_token
+            headers[key] = security_token
         string_to_sign = boto.utils.canonical_string(method, auth_path,
                                                      headers, None,
                                                      self._provider)
-        boto.log.debug('StringToSign:\n%s' % string_to_sign)
-        b64_hmac = self.sign_string(string_to_sign)
+        boto.log.debug('StringToSign:\n%s', string_to_sign)
+        b64_hmac = self.sign_string(string_to_sign, secret_key)
         auth_hdr = self._provider.auth_header
         headers['Authorization'] = ("%s %s:%s" %
-                                    (auth_hdr,
-                                     self._provider.access_key, b64_hmac))
+                                    (auth_hdr, access_key, b64_hmac))
 
 
 class HmacAuthV2Handler(AuthHandler, HmacKeys):
@@ -189,11 +191,12 @@ class HmacAuthV2Handler(AuthHandler, HmacKeys):
         if 'Date' not in headers:
             headers['Date'] = formatdate(usegmt=True)
 
-        b64_hmac = self.sign_string(headers['Date'])
+        access_key, secret_key, security_token = \
+            self._provider.get_current_credentials()
+        b64_hmac = self.sign_string(headers['Date'], secret_key)
         auth_hdr = self._provider.auth_header
         headers['Authorization'] = ("%s %s:%s" %
-                                    (auth_hdr,
-                                     self._provider.access_key, b64_hmac))
+                                    (auth_hdr, access_key, b64_hmac))
 
 
 class HmacAuthV3Handler(AuthHandler, HmacKeys):
@@ -210,12 +213,14 @@ class HmacAuthV3Handler(AuthHandler, HmacKeys):
         if 'Date' not in headers:
             headers['Date'] = formatdate(usegmt=True)
 
-        if self._provider.security_token:
+        access_key, secret_key, security_token = \
+            self._provider.get_current_credentials()
+        if security_token:
             key = self._provider.security_token_header
-            headers[key] = self._provider.security_token
+            headers[key] = security_token
 
-        b64_hmac = self.sign_string(headers['Date'])
-        s = "AWS3-HTTPS AWSAccessKeyId=%s," % self._provider.access_key
+        b64_hmac = self.sign_string(headers['Date'], secret_key)
+        s = "AWS3-HTTPS AWSAccessKeyId=%s," % access_key
         s += "Algorithm=%s,Signature=%s" % (self.algorithm(), b64_hmac)
         headers['X-Amzn-Authorization'] = s
 
@@ -283,13 +288,15 @@ class HmacAuthV3HTTPHandler(AuthHandler, HmacKeys):
         if 'X-Amzn-Authorization' in req.headers:
             del req.headers['X-Amzn-Authorization']
         req.headers['X-Amz-Date'] = formatdate(usegmt=True)
-        if self._provider.security_token:
-            req.headers['X-Amz-Security-Token'] = self._provider.security_token
+        access_key, secret_key, security_token = \
+            self._provider.get_current_credentials()
+        if security_token:
+            req.headers['X-Amz-Security-Token'] = security_token
         string_to_sign, headers_to_sign = self.string_to_sign(req)
-        boto.log.debug('StringToSign:\n%s' % string_to_sign)
+        boto.log.debug('StringToSign:\n%s', string_to_sign)
         hash_value = sha256(string_to_sign).digest()
-        b64_hmac = self.sign_string(hash_value)
-        s = "AWS3 AWSAccessKeyId=%s," % self._provider.access_key
+        b64_hmac = self.sign_string(hash_value, secret_key)
+        s = "AWS3 AWSAccessKeyId=%s," % access_key
         s += "Algorithm=%s," % self.algorithm()
         s += "SignedHeaders=%s," % ';'.join(headers_to_sign)
         s += "Signature=%s" % b64_hmac
@@ -306,6 +313,15 @@ class HmacAuthV4Handler(AuthHandler, HmacKeys):
     def __init__(self, host, config, provider):
         AuthHandler.__init__(self, host, config, provider)
         HmacKeys.__init__(self, host, config, provider)
+        # The derived signing key only depends on the secret key and the
+        # credential scope, so it is reused until either changes.  That
+        # happens at UTC midnight, when the scope date rolls over, and
+        # when the provider's credentials are refreshed.  The canonical
+        # header and query strings aren't cached: the headers include
+        # the X-Amz-Date of each attempt and the query string is built
+        # from each request's own parameters, so neither is ever the
+        # same for two signatures.
+        self._signing_key_cache = (None, None)
 
     def _sign(self, key, msg, hex=False):
         if hex:
@@ -369,6 +385,9 @@ class HmacAuthV4Handler(AuthHandler, HmacKeys):
         return http_request.auth_path
 
     def payload(self, http_request):
+        # Glacier requests carry the hash of their payload already.
+        if 'x-amz-content-sha256' in http_request.headers:
+            return http_request.headers['x-amz-content-sha256']
         body = http_request.body
         # If the body is a file like object, we can use
         # boto.utils.compute_hash, which will avoid reading
@@ -377,18 +396,24 @@ class HmacAuthV4Handler(AuthHandler, HmacKeys):
             return boto.utils.compute_hash(body, hash_algorithm=sha256)[0]
         return sha256(http_request.body).hexdigest()
 
-    def canonical_request(self, http_request):
+    def canonical_request(self, http_request, headers_to_sign=None,
+                          signed_headers=None):
+        if headers_to_sign is None:
+            headers_to_sign = self.headers_to_sign(http_request)
+        if signed_headers is None:
+            signed_headers = self.signed_headers(headers_to_sign)
         cr = [http_request.method.upper()]
         cr.append(self.canonical_uri(http_request))
         cr.append(self.canonical_query_string(http_request))
-        headers_to_sign = self.headers_to_sign(http_request)
         cr.append(self.canonical_headers(headers_to_sign) + '\n')
-        cr.append(self.signed_headers(headers_to_sign))
+        cr.append(signed_headers)
         cr.append(self.payload(http_request))
         return '\n'.join(cr)
 
-    def scope(self, http_request):
-        scope = [self._provider.access_key]
+    def scope(self, http_request, access_key=None):
+        if access_key is None:
+            access_key = self._provider.access_key
+        scope = [access_key]
         scope.append(http_request.timestamp)
         scope.append(http_request.region_name)
         scope.append(http_request.service_name)
@@ -422,14 +447,33 @@ class HmacAuthV4Handler(AuthHandler, HmacKeys):
         sts.append(sha256(canonical_request).hexdigest())
         return '\n'.join(sts)
 
-    def signature(self, http_request, string_to_sign):
-        key = self._provider.secret_key
+    def signing_key(self, http_request, secret_key=None):
+        """
+        Return the key derived from the secret key and the credential
+        scope of the request, computing it only when the scope or the
+        secret key has changed since the last request.
+        """
+        key = secret_key
+        if key is None:
+            key = self._provider.secret_key
+        cache_key = (key, http_request.timestamp, http_request.region_name,
+                     http_request.service_name)
+        cached_key, k_signing = self._signing_key_cache
+        if cached_key == cache_key:
+            return k_signing
         k_date = self._sign(('AWS4' + key).encode('utf-8'),
                               http_request.timestamp)
         k_region = self._sign(k_date, http_request.region_name)
         k_service = self._sign(k_region, http_request.service_name)
         k_signing = self._sign(k_service, 'aws4_request')
-        return self._sign(k_signing, string_to_sign, hex=True)
+        # A single assignment, so concurrent signers never see a key
+        # paired with the wrong scope.
+        self._signing_key_cache = (cache_key, k_signing)
+        return k_signing
+
+    def signature(self, http_request, string_to_sign, secret_key=None):
+        return self._sign(self.signing_key(http_request, secret_key),
+                          string_to_sign, hex=True)
 
     def add_auth(self, req, **kwargs):
         """
@@ -444,8 +488,10 @@ class HmacAuthV4Handler(AuthHandler, HmacKeys):
             del req.headers['X-Amzn-Authorization']
         now = datetime.datetime.utcnow()
         req.headers['X-Amz-Date'] = now.strftime('%Y%m%dT%H%M%SZ')
-        if self._provider.security_token:
-            req.headers['X-Amz-Security-Token'] = self._provider.security_token
+        access_key, secret_key, security_token = \
+            self._provider.get_current_credentials()
+        if security_token:
+            req.headers['X-Amz-Security-Token'] = security_token
         qs = self.query_string(req)
         if qs and req.method == 'POST':
             # Stash request parameters into post body
@@ -458,15 +504,17 @@ class HmacAuthV4Handler(AuthHandler, HmacKeys):
             # the signature will use req.auth_path.
             req.path = req.path.split('?')[0]
             req.path = req.path + '?' + qs
-        canonical_request = self.canonical_request(req)
-        boto.log.debug('CanonicalRequest:\n%s' % canonical_request)
-        string_to_sign = self.string_to_sign(req, canonical_request)
-        boto.log.debug('StringToSign:\n%s' % string_to_sign)
-        signature = self.signature(req, string_to_sign)
-        boto.log.debug('Signature:\n%s' % signature)
         headers_to_sign = self.headers_to_sign(req)
-        l = ['AWS4-HMAC-SHA256 Credential=%s' % self.scope(req)]
-        l.append('SignedHeaders=%s' % self.signed_headers(headers_to_sign))
+        signed_headers = self.signed_headers(headers_to_sign)
+        canonical_request = self.canonical_request(req, headers_to_sign,
+                                                   signed_headers)
+        boto.log.debug('CanonicalRequest:\n%s', canonical_request)
+        string_to_sign = self.string_to_sign(req, canonical_request)
+        boto.log.debug('StringToSign:\n%s', string_to_sign)
+        signature = self.signature(req, string_to_sign, secret_key)
+        boto.log.debug('Signature:\n%s', signature)
+        l = ['AWS4-HMAC-SHA256 Credential=%s' % self.scope(req, access_key)]
+        l.append('SignedHeaders=%s' % signed_headers)
         l.append('Signature=%s' % signature)
         req.headers['Authorization'] = ','.join(l)
 
@@ -481,12 +529,13 @@ class QuerySignatureHelper(HmacKeys):
     def add_auth(self, http_request, **kwargs):
         headers = http_request.headers
         params = http_request.params
-        params['AWSAccessKeyId'] = self._provider.access_key
+        credentials = self._provider.get_current_credentials()
+        params['AWSAccessKeyId'] = credentials[0]
         params['SignatureVersion'] = self.SignatureVersion
         params['Timestamp'] = boto.utils.get_ts()
         qs, signature = self._calc_signature(
             http_request.params, http_request.method,
-            http_request.auth_path, http_request.host)
+            http_request.auth_path, http_request.host, credentials)
         boto.log.debug('query_string: %s Signature: %s' % (qs, signature))
         if http_request.method == 'POST':
             headers['Content-Type'] = 'application/x-www-form-urlencoded; charset=UTF-8'
@@ -507,9 +556,12 @@ class QuerySignatureV0AuthHandler(QuerySignatureHelper, AuthHandler):
     SignatureVersion = 0
     capability = ['sign-v0']
 
-    def _calc_signature(self, params, *args):
+    def _calc_signature(self, params, verb=None, path=None,
+                        server_name=None, credentials=None):
         boto.log.debug('using _calc_signature_0')
-        hmac = self._get_hmac()
+        if credentials is None:
+            credentials = self._provider.get_current_credentials()
+        hmac = self._get_hmac(credentials[1])
         s = params['Action'] + params['Timestamp']
         hmac.update(s)
         keys = params.keys()
@@ -535,9 +587,12 @@ class QuerySignatureV1AuthHandler(QuerySignatureHelper, AuthHandler):
         AuthHandler.__init__(self, *args, **kw)
         self._hmac_256 = None
 
-    def _calc_signature(self, params, *args):
+    def _calc_signature(self, params, verb=None, path=None,
+                        server_name=None, credentials=None):
         boto.log.debug('using _calc_signature_1')
-        hmac = self._get_hmac()
+        if credentials is None:
+            credentials = self._provider.get_current_credentials()
+        hmac = self._get_hmac(credentials[1])
         keys = params.keys()
         keys.sort(cmp=lambda x, y: cmp(x.lower(), y.lower()))
         pairs = []
@@ -557,13 +612,17 @@ class QuerySignatureV2AuthHandler(QuerySignatureHelper, AuthHandler):
     capability = ['sign-v2', 'ec2', 'ec2', 'emr', 'fps', 'ecs',
                   'sdb', 'iam', 'rds', 'sns', 'sqs', 'cloudformation']
 
-    def _calc_signature(self, params, verb, path, server_name):
+    def _calc_signature(self, params, verb, path, server_name,
+                        credentials=None):
         boto.log.debug('using _calc_signature_2')
+        if credentials is None:
+            credentials = self._provider.get_current_credentials()
+        access_key, secret_key, security_token = credentials
         string_to_sign = '%s\n%s\n%s\n' % (verb, server_name.lower(), path)
-        hmac = self._get_hmac()
+        hmac = self._get_hmac(secret_key)
         params['SignatureMethod'] = self.algorithm()
-        if self._provider.security_token:
-            params['SecurityToken'] = self._provider.security_token
+        if security_token:
+            params['SecurityToken'] = security_token
         keys = sorted(params.keys())
         pairs = []
         for key in keys:
@@ -590,11 +649,13 @@ class POSTPathQSV2AuthHandler(QuerySignatureV2AuthHandler, AuthHandler):
     capability = ['mws']
 
     def add_auth(self, req, **kwargs):
-        req.params['AWSAccessKeyId'] = self._provider.access_key
+        credentials = self._provider.get_current_credentials()
+        req.params['AWSAccessKeyId'] = credentials[0]
         req.params['SignatureVersion'] = self.SignatureVersion
         req.params['Timestamp'] = boto.utils.get_ts()
         qs, signature = self._calc_signature(req.params, req.method,
-                                             req.auth_path, req.host)
+                                             req.auth_path, req.host,
+                                             credentials)
         boto.log.debug('query_string: %s Signature: %s' % (qs, signature))
         if req.method == 'POST':
             req.headers['Content-Length'] = str(len(req.body))
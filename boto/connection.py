@@ -56,8 +56,8 @@ import sys
 import time
 import urllib
 import urlparse
-import xml.sax
 import copy
+from collections import deque
 
 import auth
 import auth_handler
@@ -65,9 +65,13 @@ import boto
 import boto.utils
 import boto.handler
 import boto.cacerts
+import boto.executor
+import boto.metrics
+import boto.ratelimit
 
 from boto import config, UserAgent
 from boto.exception import AWSConnectionError, BotoClientError
+from boto.exception import CircuitOpenError, ConnectionPoolTimeoutError
 from boto.exception import BotoServerError
 from boto.provider import Provider
 from boto.resultset import ResultSet
@@ -101,20 +105,24 @@ class HostConnectionPool(object):
     """
     A pool of connections for one remote (host,is_secure).
 
-    When connections are added to the pool, they are put into a
-    pending queue.  The _mexe method returns connections to the pool
-    before the response body has been read, so they connections aren't
-    ready to send another request yet.  They stay in the pending queue
-    until they are ready for another request, at which point they are
-    returned to the pool of ready connections.
-
-    The pool of ready connections is an ordered list of
-    (connection,time) pairs, where the time is the time the connection
-    was returned from _mexe.  After a certain period of time,
-    connections are considered stale, and discarded rather than being
-    reused.  This saves having to wait for the connection to time out
-    if AWS has decided to close it on the other end because of
-    inactivity.
+    The _mexe method returns connections to the pool before the
+    response body has been read, so those connections aren't ready to
+    send another request yet.  Connections that are ready when they
+    are added go into the ready queue; the rest go into the busy
+    queue, and are moved out of it once their responses have been
+    read.
+
+    Both queues are deques of (connection,time) pairs, where the time
+    is the time the connection was returned from _mexe.
+    After a certain period of time, connections are considered stale,
+    and discarded rather than being reused.  This saves having to wait
+    for the connection to time out if AWS has decided to close it on
+    the other end because of inactivity.  A busy connection whose
+    response still hasn't been read by then is expired the same way,
+    rather than being held on to for good.
+
+    Checkouts are O(1): get() takes the oldest ready connection, and
+    otherwise looks only at the busy one that has waited longest.
 
     Thread Safety:
 
@@ -123,7 +131,8 @@ class HostConnectionPool(object):
     """
 
     def __init__(self):
-        self.queue = []
+        self.ready = deque()
+        self.busy = deque()
 
     def size(self):
         """
@@ -131,14 +140,17 @@ class HostConnectionPool(object):
         Some of the connections may still be in use, and may not be
         ready to be returned by get().
         """
-        return len(self.queue)
+        return len(self.ready) + len(self.busy)
 
     def put(self, conn):
         """
         Adds a connection to the pool, along with the time it was
         added.
         """
-        self.queue.append((conn, time.time()))
+        if self._conn_ready(conn):
+            self.ready.append((conn, time.time()))
+        else:
+            self.busy.append((conn, time.time()))
 
     def get(self):
         """
@@ -148,16 +160,17 @@ class HostConnectionPool(object):
         # Discard ready connections that are too old.
         self.clean()
 
-        # Return the first connection that is ready, and remove it
-        # from the queue.  Connections that aren't ready are returned
-        # to the end of the queue with an updated time, on the
-        # assumption that somebody is actively reading the response.
-        for _ in range(len(self.queue)):
-            (conn, _) = self.queue.pop(0)
-            if self._conn_ready(conn):
-                return conn
-            else:
-                self.put(conn)
+        if self.ready:
+            return self.ready.popleft()[0]
+        # Check the busy connection that has been waiting longest.  If
+        # it still isn't ready, it goes to the back of the queue with
+        # the time it was added, so it expires when it gets stale.
+        if self.busy:
+            pair = self.busy.popleft()
+            if not self._pair_stale(pair):
+                if self._conn_ready(pair[0]):
+                    return pair[0]
+                self.busy.append(pair)
         return None
 
     def _conn_ready(self, conn):
@@ -185,12 +198,27 @@ class HostConnectionPool(object):
 
     def clean(self):
         """
-        Get rid of stale connections.
+        Get rid of stale connections.  Returns the number of
+        connections that were discarded.
         """
         # Note that we do not close the connection here -- somebody
         # may still be reading from it.
-        while len(self.queue) > 0 and self._pair_stale(self.queue[0]):
-            self.queue.pop(0)
+        removed = 0
+        while len(self.ready) > 0 and self._pair_stale(self.ready[0]):
+            self.ready.popleft()
+            removed += 1
+        return removed
+
+    def expire_busy(self):
+        """
+        Get rid of busy connections that are stale, whose responses
+        were never read.  Returns the number of connections that were
+        discarded.
+        """
+        before = len(self.busy)
+        self.busy = deque(pair for pair in self.busy
+                          if not self._pair_stale(pair))
+        return before - len(self.busy)
 
     def _pair_stale(self, pair):
         """
@@ -209,6 +237,16 @@ class ConnectionPool(object):
     time.  This saves time spent waiting for a connection that AWS has
     timed out on the other end.
 
+    The pool can optionally be bounded.  When max_connections_per_host
+    is set, no more than that many connections will be handed out for
+    any one (host,is_secure) at a time, counting both the connections
+    that are checked out and those sitting idle in the pool.  Callers
+    asking for a connection when the limit has been reached block until
+    one is returned or discarded, or until checkout_timeout seconds
+    have passed, at which point ConnectionPoolTimeoutError is raised.
+    Connections that are checked out but will never be put back must
+    be handed to discard_http_connection so the slot is freed.
+
     This class is thread-safe.
     """
 
@@ -231,45 +269,185 @@ class ConnectionPool(object):
 
     STALE_DURATION = 60.0
 
-    def __init__(self):
+    #
+    # While waiting for a connection in a bounded pool, how often to
+    # look for connections whose responses have been fully read.  The
+    # readers of those responses do not notify the pool, so we have
+    # to poll.
+    #
+
+    WAIT_POLL_INTERVAL = 0.05
+
+    def __init__(self, max_connections_per_host=None, checkout_timeout=None):
         # Mapping from (host,is_secure) to HostConnectionPool.
         # If a pool becomes empty, it is removed.
         self.host_to_pool = {}
+        # Mapping from (host,is_secure) to the number of connections
+        # handed out by this pool that have not been discarded.  Only
+        # maintained for bounded pools.
+        self.host_to_count = {}
         # The last time the pool was cleaned.
         self.last_clean_time = 0.0
         self.mutex = threading.Lock()
+        self.available = threading.Condition(self.mutex)
         ConnectionPool.STALE_DURATION = \
             config.getfloat('Boto', 'connection_stale_duration',
                             ConnectionPool.STALE_DURATION)
+        if max_connections_per_host is None and \
+                config.has_option('Boto', 'max_connections_per_host'):
+            max_connections_per_host = config.getint(
+                'Boto', 'max_connections_per_host')
+        if checkout_timeout is None and \
+                config.has_option('Boto', 'connection_checkout_timeout'):
+            checkout_timeout = config.getfloat(
+                'Boto', 'connection_checkout_timeout')
+        self.max_connections_per_host = max_connections_per_host or None
+        self.checkout_timeout = checkout_timeout
+        self._reset_stats()
 
     def __getstate__(self):
         pickled_dict = copy.copy(self.__dict__)
         pickled_dict['host_to_pool'] = {}
+        pickled_dict['host_to_count'] = {}
         del pickled_dict['mutex']
+        del pickled_dict['available']
         return pickled_dict
 
     def __setstate__(self, dct):
-        self.__init__()
+        self.__init__(dct.get('max_connections_per_host'),
+                      dct.get('checkout_timeout'))
+
+    def _reset_stats(self):
+        self.hits = 0
+        self.misses = 0
+        self.stale_evictions = 0
+        self.waits = 0
+        self.wait_time = 0.0
+
+    def get_stats(self):
+        """
+        Returns a dict of counters describing how the pool has been
+        used: the number of checkouts satisfied by an idle connection
+        (hits) or that required a new one (misses), the number of stale
+        connections discarded, and how many checkouts had to wait for
+        a free slot along with the total time spent waiting.
+        """
+        with self.mutex:
+            return {'hits': self.hits,
+                    'misses': self.misses,
+                    'stale_evictions': self.stale_evictions,
+                    'waits': self.waits,
+                    'wait_time': self.wait_time,
+                    'size': self._size(),
+                    'checked_out': self._checked_out()}
+
+    def reset_stats(self):
+        """
+        Zeroes the counters returned by get_stats.
+        """
+        with self.mutex:
+            self._reset_stats()
 
     def size(self):
         """
         Returns the number of connections in the pool.
         """
+        return self._size()
+
+    def _size(self):
         return sum(pool.size() for pool in self.host_to_pool.values())
 
-    def get_http_connection(self, host, is_secure):
+    def _checked_out(self):
+        if self.max_connections_per_host is None:
+            return None
+        total = 0
+        for key, count in self.host_to_count.items():
+            pool = self.host_to_pool.get(key)
+            total += count - (pool and pool.size() or 0)
+        return total
+
+    def get_http_connection(self, host, is_secure, blocking=True):
         """
         Gets a connection from the pool for the named host.  Returns
         None if there is no connection that can be reused. It's the caller's
         responsibility to call close() on the connection when it's no longer
         needed.
+
+        In a bounded pool a return value of None reserves a slot for
+        the new connection the caller is about to open, and this method
+        may block while the host is at its connection limit.  If
+        blocking is False, ConnectionPoolTimeoutError is raised at once
+        instead of waiting.
         """
         self.clean()
+        key = (host, is_secure)
         with self.mutex:
-            key = (host, is_secure)
-            if key not in self.host_to_pool:
-                return None
-            return self.host_to_pool[key].get()
+            if self.max_connections_per_host is None:
+                conn = self._get_idle(key)
+                if conn is None:
+                    self.misses += 1
+                return conn
+            deadline = None
+            wait_start = None
+            while True:
+                conn = self._get_idle(key)
+                if conn is not None:
+                    break
+                count = self.host_to_count.get(key, 0)
+                if count < self.max_connections_per_host:
+                    self.host_to_count[key] = count + 1
+                    self.misses += 1
+                    break
+                if not blocking:
+                    raise ConnectionPoolTimeoutError(
+                        'No free connection to %s' % host)
+                now = time.time()
+                if wait_start is None:
+                    wait_start = now
+                    self.waits += 1
+                    if self.checkout_timeout is not None:
+                        deadline = now + self.checkout_timeout
+                interval = self.WAIT_POLL_INTERVAL
+                if deadline is not None:
+                    if now >= deadline:
+                        self.wait_time += now - wait_start
+                        raise ConnectionPoolTimeoutError(
+                            'Timed out after %.1f seconds waiting for a '
+                            'connection to %s' % (self.checkout_timeout,
+                                                  host))
+                    interval = min(interval, deadline - now)
+                self.available.wait(interval)
+            if wait_start is not None:
+                self.wait_time += time.time() - wait_start
+            return conn
+
+    def _get_idle(self, key):
+        pool = self.host_to_pool.get(key)
+        if pool is None:
+            return None
+        before = pool.size()
+        conn = pool.get()
+        if conn is not None:
+            self.hits += 1
+            before -= 1
+        # Whatever get() did not hand back or keep was stale.
+        evicted = before - pool.size()
+        if evicted:
+            self._evicted(key, evicted)
+        return conn
+
+    def _evicted(self, key, count):
+        self.stale_evictions += count
+        if self.max_connections_per_host is not None:
+            self._release(key, count)
+
+    def _release(self, key, count=1):
+        remaining = self.host_to_count.get(key, 0) - count
+        if remaining > 0:
+            self.host_to_count[key] = remaining
+        else:
+            self.host_to_count.pop(key, None)
+        self.available.notify(count)
 
     def put_http_connection(self, host, is_secure, conn):
         """
@@ -281,6 +459,32 @@ class ConnectionPool(object):
             if key not in self.host_to_pool:
                 self.host_to_pool[key] = HostConnectionPool()
             self.host_to_pool[key].put(conn)
+            self.available.notify()
+
+    def take_idle_connection(self, host, is_secure):
+        """
+        Removes an idle connection for the named host from the pool for
+        good, or returns None if there isn't one.  Unlike
+        get_http_connection this never blocks or reserves a slot, and
+        the connection no longer counts against a bounded pool's limit.
+        """
+        key = (host, is_secure)
+        with self.mutex:
+            conn = self._get_idle(key)
+            if conn is not None and self.max_connections_per_host is not None:
+                self._release(key)
+            return conn
+
+    def discard_http_connection(self, host, is_secure):
+        """
+        Tells the pool that a connection obtained for the named host
+        will not be put back, freeing its slot in a bounded pool.  This
+        is a no-op for unbounded pools.
+        """
+        if self.max_connections_per_host is None:
+            return
+        with self.mutex:
+            self._release((host, is_secure))
 
     def clean(self):
         """
@@ -295,7 +499,9 @@ class ConnectionPool(object):
             if self.last_clean_time + self.CLEAN_INTERVAL < now:
                 to_remove = []
                 for (host, pool) in self.host_to_pool.items():
-                    pool.clean()
+                    evicted = pool.clean() + pool.expire_busy()
+                    if evicted:
+                        self._evicted(host, evicted)
                     if pool.size() == 0:
                         to_remove.append(host)
                 for host in to_remove:
@@ -464,6 +670,22 @@ class AWSAuthConnection(object):
         """
         self.suppress_consec_slashes = suppress_consec_slashes
         self.num_retries = 6
+        self.max_requests_in_flight = 10
+        self.max_concurrent_requests = 10
+        # Whether XML responses are parsed as they are read from the
+        # socket rather than after the whole body has been read.
+        self.stream_xml_responses = config.getbool(
+            'Boto', 'stream_xml_responses', False)
+        # Client-side flow control shared with other connections to the
+        # same endpoint, see boto.ratelimit.  Both are off by default.
+        self.adaptive_rate_limit = config.getbool(
+            'Boto', 'adaptive_rate_limit', False)
+        self.circuit_breaker_threshold = config.getint(
+            'Boto', 'circuit_breaker_threshold', 0)
+        self.circuit_breaker_timeout = config.getfloat(
+            'Boto', 'circuit_breaker_timeout', 30.0)
+        # Functions called at each stage of a request, see boto.metrics.
+        self._request_hooks = {}
         # Override passed-in is_secure setting if value was defined in config.
         if config.has_option('Boto', 'is_secure'):
             is_secure = config.getboolean('Boto', 'is_secure')
@@ -542,6 +764,8 @@ class AWSAuthConnection(object):
             self.host = self.provider.host
 
         self._pool = ConnectionPool()
+        self._executor = None
+        self._executor_lock = threading.Lock()
         self._connection = (self.server_name(), self.is_secure)
         self._last_rs = None
         self._auth_handler = auth.get_auth_handler(
@@ -550,11 +774,29 @@ class AWSAuthConnection(object):
     def __repr__(self):
         return '%s:%s' % (self.__class__.__name__, self.host)
 
+    def __getstate__(self):
+        pickled_dict = copy.copy(self.__dict__)
+        pickled_dict['_executor'] = None
+        pickled_dict['_request_hooks'] = {}
+        del pickled_dict['_executor_lock']
+        return pickled_dict
+
+    def __setstate__(self, dct):
+        self.__dict__.update(dct)
+        self._executor_lock = threading.Lock()
+
     def _required_auth_capability(self):
         return []
 
     def connection(self):
-        return self.get_http_connection(*self._connection)
+        # The caller keeps this connection, so it must not hold a slot
+        # in a bounded pool: reuse an idle one if there is one, or open
+        # a new one outside the pool.
+        host, is_secure = self._connection
+        conn = self._pool.take_idle_connection(host, is_secure)
+        if conn is None:
+            conn = self.new_http_connection(host, is_secure)
+        return conn
     connection = property(connection)
 
     def aws_access_key_id(self):
@@ -650,8 +892,8 @@ class AWSAuthConnection(object):
             self.proxy_port = self.port
         self.use_proxy = (self.proxy != None)
 
-    def get_http_connection(self, host, is_secure):
-        conn = self._pool.get_http_connection(host, is_secure)
+    def get_http_connection(self, host, is_secure, blocking=True):
+        conn = self._pool.get_http_connection(host, is_secure, blocking)
         if conn is not None:
             return conn
         else:
@@ -784,11 +1026,20 @@ class AWSAuthConnection(object):
         Google group by Larry Bates.  Thanks!
 
         """
-        boto.log.debug('Method: %s' % request.method)
-        boto.log.debug('Path: %s' % request.path)
-        boto.log.debug('Data: %s' % request.body)
-        boto.log.debug('Headers: %s' % request.headers)
-        boto.log.debug('Host: %s' % request.host)
+        record = self._start_request_record(request)
+        return self._call_recorded(record, self._mexe_attempts, request,
+                                   sender, override_num_retries,
+                                   retry_handler, record)
+
+    def _mexe_attempts(self, request, sender, override_num_retries,
+                       retry_handler, record):
+        # Let logging do the formatting, so that a large body isn't
+        # copied into a message that is then thrown away.
+        boto.log.debug('Method: %s', request.method)
+        boto.log.debug('Path: %s', request.path)
+        boto.log.debug('Data: %s', request.body)
+        boto.log.debug('Headers: %s', request.headers)
+        boto.log.debug('Host: %s', request.host)
         response = None
         body = None
         e = None
@@ -797,14 +1048,19 @@ class AWSAuthConnection(object):
         else:
             num_retries = override_num_retries
         i = 0
-        connection = self.get_http_connection(request.host, self.is_secure)
+        is_secure = self.is_secure
+        connection = self.get_http_connection(request.host, is_secure)
         while i <= num_retries:
             # Use binary exponential backoff to desynchronize client requests
             next_sleep = random.random() * (2 ** i)
             try:
+                self._before_attempt(request.host)
                 # we now re-sign each request before it is retried
                 boto.log.debug('Token: %s' % self.provider.security_token)
                 request.authorize(connection=self)
+                if record is not None:
+                    record.start_attempt(connection)
+                    self._fire_request_hook('before-send', record)
                 if callable(sender):
                     response = sender(connection, request.method, request.path,
                                       request.body, request.headers)
@@ -812,6 +1068,8 @@ class AWSAuthConnection(object):
                     connection.request(request.method, request.path,
                                        request.body, request.headers)
                     response = connection.getresponse()
+                if record is not None:
+                    record.got_response(response)
                 location = response.getheader('location')
                 # -- gross hack --
                 # httplib gets confused with chunked responses to HEAD requests
@@ -822,22 +1080,32 @@ class AWSAuthConnection(object):
                 if callable(retry_handler):
                     status = retry_handler(response, i, next_sleep)
                     if status:
+                        self._record_response(request.host, response.status,
+                                              self._is_throttled(response))
                         msg, i, next_sleep = status
                         if msg:
                             boto.log.debug(msg)
+                        self._record_retry(record, msg, next_sleep)
                         time.sleep(next_sleep)
                         continue
                 if response.status == 500 or response.status == 503:
+                    self._record_response(request.host, response.status)
                     msg = 'Received %d response.  ' % response.status
                     msg += 'Retrying in %3.1f seconds' % next_sleep
                     boto.log.debug(msg)
                     body = response.read()
+                    self._record_retry(record, 'HTTP %d' % response.status,
+                                       next_sleep)
                 elif response.status < 300 or response.status >= 400 or \
                         not location:
-                    self.put_http_connection(request.host, self.is_secure,
+                    self._record_response(request.host, response.status,
+                                          self._is_throttled(response))
+                    self.put_http_connection(request.host, is_secure,
                                              connection)
                     return response
                 else:
+                    self._pool.discard_http_connection(request.host,
+                                                       is_secure)
                     scheme, request.host, request.path, \
                         params, query, fragment = urlparse.urlparse(location)
                     if query:
@@ -845,8 +1113,9 @@ class AWSAuthConnection(object):
                     msg = 'Redirecting: %s' % scheme + '://'
                     msg += request.host + request.path
                     boto.log.debug(msg)
+                    is_secure = scheme == 'https'
                     connection = self.get_http_connection(request.host,
-                                                          scheme == 'https')
+                                                          is_secure)
                     response = None
                     continue
             except self.http_exceptions, e:
@@ -855,13 +1124,27 @@ class AWSAuthConnection(object):
                         boto.log.debug(
                             'encountered unretryable %s exception, re-raising' %
                             e.__class__.__name__)
+                        self._pool.discard_http_connection(request.host,
+                                                           is_secure)
                         raise e
                 boto.log.debug('encountered %s exception, reconnecting' % \
                                   e.__class__.__name__)
+                self._record_response(request.host, None)
+                self._record_retry(record, e.__class__.__name__, next_sleep)
+                # The new connection takes over the pool slot of the
+                # one it replaces.
                 connection = self.new_http_connection(request.host,
-                                                      self.is_secure)
+                                                      is_secure)
+            except ConnectionPoolTimeoutError:
+                # Raised while fetching a connection for a redirect, after
+                # the slot for the previous connection was already freed.
+                raise
+            except:
+                self._pool.discard_http_connection(request.host, is_secure)
+                raise
             time.sleep(next_sleep)
             i += 1
+        self._pool.discard_http_connection(request.host, is_secure)
         # If we made it here, it's because we have exhausted our retries
         # and stil haven't succeeded.  So, if we have a response object,
         # use it to raise an exception.
@@ -874,6 +1157,320 @@ class AWSAuthConnection(object):
             msg = 'Please report this exception as a Boto Issue!'
             raise BotoClientError(msg)
 
+    def add_request_hook(self, event, fn):
+        """
+        Calls fn(record) with a :class:`boto.metrics.RequestRecord` at
+        event for every request made through this connection.  event is
+        one of ``before-send``, ``on-retry`` or ``after-response``.
+        Hooks for all connections are added with
+        :func:`boto.metrics.add_request_hook`.
+        """
+        boto.metrics.check_event(event)
+        self._request_hooks.setdefault(event, []).append(fn)
+
+    def remove_request_hook(self, event, fn):
+        boto.metrics.check_event(event)
+        self._request_hooks.get(event, []).remove(fn)
+
+    def _get_service_name(self):
+        # boto.ec2.connection -> ec2
+        parts = self.__class__.__module__.split('.')
+        if parts[0] == 'boto' and len(parts) > 2:
+            return parts[1]
+        return self.__class__.__name__
+
+    def _start_request_record(self, request):
+        # Requests aren't timed unless somebody is listening.
+        for event in boto.metrics.EVENTS:
+            if (self._request_hooks.get(event) or
+                    boto.metrics.get_request_hooks(event)):
+                return boto.metrics.RequestRecord(self._get_service_name(),
+                                                  request)
+        return None
+
+    def _fire_request_hook(self, event, record):
+        hooks = (boto.metrics.get_request_hooks(event) +
+                 self._request_hooks.get(event, []))
+        for fn in hooks:
+            try:
+                fn(record)
+            except Exception:
+                boto.log.exception('exception in %s hook %r', event, fn)
+
+    def _record_retry(self, record, reason, delay):
+        if record is not None:
+            record.retrying(reason, delay)
+            self._fire_request_hook('on-retry', record)
+
+    def _call_recorded(self, record, fn, *args):
+        # Calls fn(*args) to send a request, completing its record with
+        # the response or exception.
+        if record is None:
+            return fn(*args)
+        try:
+            response = fn(*args)
+        except Exception, e:
+            exc_info = sys.exc_info()
+            record.finish(error=e)
+            self._fire_request_hook('after-response', record)
+            raise exc_info[0], exc_info[1], exc_info[2]
+        record.finish(response)
+        self._fire_request_hook('after-response', record)
+        return response
+
+    def get_rate_limiter(self, host=None):
+        """
+        Returns the :class:`boto.ratelimit.AdaptiveRateLimiter` that
+        paces requests to host (by default this connection's host), or
+        None if adaptive_rate_limit is off.
+        """
+        if not self.adaptive_rate_limit:
+            return None
+        return boto.ratelimit.get_rate_limiter(host or self.host)
+
+    def get_circuit_breaker(self, host=None):
+        """
+        Returns the :class:`boto.ratelimit.CircuitBreaker` for host (by
+        default this connection's host), or None if
+        circuit_breaker_threshold is 0.
+        """
+        if not self.circuit_breaker_threshold:
+            return None
+        return boto.ratelimit.get_circuit_breaker(
+            host or self.host,
+            failure_threshold=self.circuit_breaker_threshold,
+            reset_timeout=self.circuit_breaker_timeout)
+
+    def record_throttle(self, response):
+        """
+        Marks response as throttled.  _mexe treats 500 and 503 responses
+        as throttled; retry handlers call this for service specific
+        throttling errors before returning, so that _mexe reports the
+        response to the rate limiter and circuit breaker as a throttle
+        rather than a success.
+        """
+        response.throttled = True
+
+    def _is_throttled(self, response):
+        return getattr(response, 'throttled', False)
+
+    def _before_attempt(self, host):
+        breaker = self.get_circuit_breaker(host)
+        if breaker is not None:
+            breaker.before_request(host)
+        limiter = self.get_rate_limiter(host)
+        if limiter is not None:
+            limiter.acquire()
+
+    def _record_response(self, host, status, throttled=False):
+        # status is None when no response was received at all.  Each
+        # response is recorded once, so the limiter and breaker see
+        # exactly one outcome for it.
+        failed = (throttled or status is None or status == 500 or
+                  status == 503)
+        breaker = self.get_circuit_breaker(host)
+        if breaker is not None:
+            if failed:
+                breaker.record_failure()
+            else:
+                breaker.record_success()
+        if status is not None:
+            limiter = self.get_rate_limiter(host)
+            if limiter is not None:
+                if failed:
+                    limiter.throttled()
+                else:
+                    limiter.succeeded()
+
+    def get_executor(self):
+        """
+        Returns the thread pool used by submit and map_requests,
+        creating it on first use.  Its size is max_concurrent_requests,
+        which can be set in the Boto section of the config file.
+
+        The workers share this connection's pool, so a bounded
+        ConnectionPool still caps the number of connections each host
+        sees, with surplus workers waiting for a free connection.
+        """
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = boto.executor.Executor(config.getint(
+                    'Boto', 'max_concurrent_requests',
+                    self.max_concurrent_requests))
+            return self._executor
+
+    def submit(self, fn, *args, **kwargs):
+        """
+        Runs fn(*args, **kwargs) on this connection's thread pool and
+        returns a :class:`boto.executor.Future` for the result.  fn is
+        usually a bound method of this connection, e.g.
+        ``conn.submit(conn.get_bucket, 'mybucket')``.
+        """
+        return self.get_executor().submit(fn, *args, **kwargs)
+
+    def submit_request(self, request, sender=None,
+                       override_num_retries=None, retry_handler=None):
+        """
+        Sends an HTTPRequest from the thread pool, with the usual retry,
+        redirect and re-signing behaviour of _mexe, and returns a
+        :class:`boto.executor.Future` for the response.
+        """
+        return self.submit(self._mexe, request, sender,
+                           override_num_retries, retry_handler)
+
+    def map_requests(self, requests, sender=None, override_num_retries=None,
+                     retry_handler=None):
+        """
+        Sends several HTTPRequests concurrently and returns their
+        responses in the same order as the requests.  If any request
+        fails, the first failure is raised after all of them finish.
+        """
+        futures = [self.submit_request(request, sender, override_num_retries,
+                                       retry_handler)
+                   for request in requests]
+        return boto.executor.results(futures)
+
+    def _mexe_many(self, requests, max_in_flight=None):
+        """
+        Sends a batch of requests and returns their responses, in the
+        same order as the requests.
+
+        Rather than waiting for each response before sending the next
+        request, up to max_in_flight requests are written to separate
+        pooled connections before any response is read, so the server
+        works on all of them at once while only the calling thread is
+        used.  The body of every response is read before its connection
+        is returned to the pool, and is available from response.read().
+
+        Requests that fail to send, hit a transient error or get
+        redirected are handed to _mexe, which applies the usual retry
+        and redirect handling to them one at a time.
+
+        Only the first request of each window waits for a connection
+        from a bounded pool; the rest take one only if it is free at
+        once, and are otherwise sent through _mexe after the window's
+        connections have been returned.  Waiting while holding
+        connections would let concurrent batches deadlock on the pool.
+        """
+        if max_in_flight is None:
+            max_in_flight = config.getint('Boto', 'max_requests_in_flight',
+                                          self.max_requests_in_flight)
+        pool_max = self._pool.max_connections_per_host
+        if pool_max is not None:
+            max_in_flight = min(max_in_flight, pool_max)
+        max_in_flight = max(1, max_in_flight)
+        responses = [None] * len(requests)
+        for start in range(0, len(requests), max_in_flight):
+            end = min(start + max_in_flight, len(requests))
+            records = {}
+            in_flight = []
+            try:
+                for index in range(start, end):
+                    records[index] = self._start_request_record(
+                        requests[index])
+                    connection = self._send_request(
+                        requests[index], records[index],
+                        blocking=not in_flight)
+                    if connection is not None:
+                        in_flight.append((index, connection))
+                while in_flight:
+                    index, connection = in_flight.pop(0)
+                    responses[index] = self._receive_response(
+                        requests[index], connection, records[index])
+            finally:
+                # If a request raised, the connections that were never
+                # read can't be reused, but must still give up their
+                # slots in a bounded pool.
+                for index, connection in in_flight:
+                    connection.close()
+                    self._pool.discard_http_connection(requests[index].host,
+                                                       self.is_secure)
+            for index in range(start, end):
+                record = records[index]
+                if responses[index] is None:
+                    responses[index] = self._call_recorded(
+                        record, self._mexe_attempts, requests[index],
+                        None, None, None, record)
+                elif record is not None:
+                    record.finish(responses[index])
+                    self._fire_request_hook('after-response', record)
+        return responses
+
+    def _send_request(self, request, record=None, blocking=True):
+        try:
+            connection = self.get_http_connection(request.host,
+                                                  self.is_secure, blocking)
+        except ConnectionPoolTimeoutError:
+            if blocking:
+                raise
+            return None
+        try:
+            self._before_attempt(request.host)
+        except CircuitOpenError:
+            # Leave it to _mexe to raise once the rest of the batch
+            # has been read.
+            self.put_http_connection(request.host, self.is_secure,
+                                     connection)
+            return None
+        try:
+            request.authorize(connection=self)
+            if record is not None:
+                record.start_attempt(connection)
+                self._fire_request_hook('before-send', record)
+            connection.request(request.method, request.path,
+                               request.body, request.headers)
+        except self.http_exceptions, e:
+            boto.log.debug('encountered %s exception sending batched '
+                           'request' % e.__class__.__name__)
+            self._record_retry(record, e.__class__.__name__, 0)
+            self._pool.discard_http_connection(request.host, self.is_secure)
+            return None
+        except:
+            self._pool.discard_http_connection(request.host, self.is_secure)
+            raise
+        return connection
+
+    def _receive_response(self, request, connection, record=None):
+        try:
+            response = connection.getresponse()
+            if record is not None:
+                record.got_response(response)
+            # See the comment in _mexe about chunked HEAD responses.
+            if request.method == 'HEAD' and getattr(response,
+                                                    'chunked', False):
+                response.chunked = 0
+            response.read()
+        except self.http_exceptions, e:
+            boto.log.debug('encountered %s exception reading batched '
+                           'response' % e.__class__.__name__)
+            self._record_response(request.host, None)
+            self._record_retry(record, e.__class__.__name__, 0)
+            self._pool.discard_http_connection(request.host, self.is_secure)
+            return None
+        except:
+            self._pool.discard_http_connection(request.host, self.is_secure)
+            raise
+        self.put_http_connection(request.host, self.is_secure, connection)
+        self._record_response(request.host, response.status)
+        if response.status == 500 or response.status == 503:
+            boto.log.debug('Received %d response to batched request, '
+                           'retrying' % response.status)
+            self._record_retry(record, 'HTTP %d' % response.status, 0)
+            return None
+        if 300 <= response.status < 400 and response.getheader('location'):
+            return None
+        return response
+
+    def should_stream_response(self, response):
+        """
+        Returns True if the XML in the body of response should be parsed
+        with boto.handler.parse_stream.  This is the case when
+        stream_xml_responses is set and the body is still unread.
+        """
+        return (self.stream_xml_responses and
+                isinstance(response, HTTPResponse) and
+                not response._cached_response)
+
     def build_base_http_request(self, method, path, auth_path,
                                 params=None, headers=None, data='', host=None):
         path = self.get_path(path)
@@ -915,6 +1512,10 @@ class AWSAuthConnection(object):
 
         boto.log.debug('closing all HTTP connections')
         self._connection = None  # compat field
+        with self._executor_lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False)
+                self._executor = None
 
 
 class AWSQueryConnection(AWSAuthConnection):
@@ -941,7 +1542,7 @@ class AWSQueryConnection(AWSAuthConnection):
     def get_utf8_value(self, value):
         return boto.utils.get_utf8_value(value)
 
-    def make_request(self, action, params=None, path='/', verb='GET'):
+    def build_query_request(self, action, params=None, path='/', verb='GET'):
         http_request = self.build_base_http_request(verb, path, None,
                                                     params, {}, '',
                                                     self.server_name())
@@ -949,7 +1550,21 @@ class AWSQueryConnection(AWSAuthConnection):
             http_request.params['Action'] = action
         if self.APIVersion:
             http_request.params['Version'] = self.APIVersion
-        return self._mexe(http_request)
+        return http_request
+
+    def make_request(self, action, params=None, path='/', verb='GET'):
+        return self._mexe(self.build_query_request(action, params, path, verb))
+
+    def make_requests(self, action, params_list, path='/', verb='GET',
+                      max_in_flight=None):
+        """
+        Makes one request for each dict of parameters in params_list,
+        keeping up to max_in_flight of them outstanding at once, and
+        returns the responses in the same order.  See _mexe_many.
+        """
+        requests = [self.build_query_request(action, params, path, verb)
+                    for params in params_list]
+        return self._mexe_many(requests, max_in_flight)
 
     def build_list_params(self, params, items, label):
         if isinstance(items, basestring):
@@ -959,61 +1574,86 @@ class AWSQueryConnection(AWSAuthConnection):
 
     # generics
 
-    def get_list(self, action, params, markers, path='/',
-                 parent=None, verb='GET'):
-        if not parent:
-            parent = self
-        response = self.make_request(action, params, path, verb)
+    def _check_response(self, response):
         body = response.read()
         boto.log.debug(body)
         if not body:
             boto.log.error('Null body %s' % body)
             raise self.ResponseError(response.status, response.reason, body)
-        elif response.status == 200:
-            rs = ResultSet(markers)
-            h = boto.handler.XmlHandler(rs, parent)
-            xml.sax.parseString(body, h)
-            return rs
-        else:
+        elif response.status != 200:
             boto.log.error('%s %s' % (response.status, response.reason))
             boto.log.error('%s' % body)
             raise self.ResponseError(response.status, response.reason, body)
+        return body
+
+    def _parse(self, response, node, parent):
+        h = boto.handler.XmlHandler(node, parent)
+        if response.status == 200 and self.should_stream_response(response):
+            if not boto.handler.parse_stream(response, h):
+                boto.log.error('Null body')
+                raise self.ResponseError(response.status, response.reason,
+                                         '')
+        else:
+            body = self._check_response(response)
+            boto.handler.parse_string(body, h)
+        return node
+
+    def _parse_list(self, response, markers, parent):
+        return self._parse(response, ResultSet(markers), parent)
+
+    def _parse_object(self, response, cls, parent):
+        return self._parse(response, cls(parent), parent)
+
+    def _parse_status(self, response, parent):
+        return self._parse(response, ResultSet(), parent).status
+
+    def get_list(self, action, params, markers, path='/',
+                 parent=None, verb='GET'):
+        if not parent:
+            parent = self
+        response = self.make_request(action, params, path, verb)
+        return self._parse_list(response, markers, parent)
 
     def get_object(self, action, params, cls, path='/',
                    parent=None, verb='GET'):
         if not parent:
             parent = self
         response = self.make_request(action, params, path, verb)
-        body = response.read()
-        boto.log.debug(body)
-        if not body:
-            boto.log.error('Null body %s' % body)
-            raise self.ResponseError(response.status, response.reason, body)
-        elif response.status == 200:
-            obj = cls(parent)
-            h = boto.handler.XmlHandler(obj, parent)
-            xml.sax.parseString(body, h)
-            return obj
-        else:
-            boto.log.error('%s %s' % (response.status, response.reason))
-            boto.log.error('%s' % body)
-            raise self.ResponseError(response.status, response.reason, body)
+        return self._parse_object(response, cls, parent)
 
     def get_status(self, action, params, path='/', parent=None, verb='GET'):
         if not parent:
             parent = self
         response = self.make_request(action, params, path, verb)
-        body = response.read()
-        boto.log.debug(body)
-        if not body:
-            boto.log.error('Null body %s' % body)
-            raise self.ResponseError(response.status, response.reason, body)
-        elif response.status == 200:
-            rs = ResultSet()
-            h = boto.handler.XmlHandler(rs, parent)
-            xml.sax.parseString(body, h)
-            return rs.status
-        else:
-            boto.log.error('%s %s' % (response.status, response.reason))
-            boto.log.error('%s' % body)
-            raise self.ResponseError(response.status, response.reason, body)
+        return self._parse_status(response, parent)
+
+    # batched generics
+    #
+    # These issue the same action once for every dict in params_list,
+    # with several requests in flight at a time (see _mexe_many), and
+    # return the parsed results in order.  An error response to any of
+    # the requests raises ResponseError.
+
+    def get_lists(self, action, params_list, markers, path='/',
+                  parent=None, verb='GET', max_in_flight=None):
+        if not parent:
+            parent = self
+        responses = self.make_requests(action, params_list, path, verb,
+                                       max_in_flight)
+        return [self._parse_list(r, markers, parent) for r in responses]
+
+    def get_objects(self, action, params_list, cls, path='/',
+                    parent=None, verb='GET', max_in_flight=None):
+        if not parent:
+            parent = self
+        responses = self.make_requests(action, params_list, path, verb,
+                                       max_in_flight)
+        return [self._parse_object(r, cls, parent) for r in responses]
+
+    def get_statuses(self, action, params_list, path='/', parent=None,
+                     verb='GET', max_in_flight=None):
+        if not parent:
+            parent = self
+        responses = self.make_requests(action, params_list, path, verb,
+                                       max_in_flight)
+        return [self._parse_status(r, parent) for r in responses]
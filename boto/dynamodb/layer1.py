@@ -137,6 +137,7 @@ class Layer1(AWSAuthConnection):
             data = json.loads(response_body)
             if self.ThruputError in data.get('__type'):
                 self.throughput_exceeded_events += 1
+                self.record_throttle(response)
                 msg = "%s, retry attempt %s" % (self.ThruputError, i)
                 next_sleep = self._exponential_time(i)
                 i += 1
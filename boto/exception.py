@@ -384,6 +384,18 @@ class AWSConnectionError(BotoClientError):
     """
     pass
 
+class ConnectionPoolTimeoutError(AWSConnectionError):
+    """
+    Timed out waiting for a free connection in a bounded connection pool.
+    """
+    pass
+
+class CircuitOpenError(AWSConnectionError):
+    """
+    A request wasn't sent because the endpoint's circuit breaker is open.
+    """
+    pass
+
 class StorageDataError(BotoClientError):
     """
     Error receiving data from a storage service.
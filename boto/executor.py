@@ -0,0 +1,202 @@
+# Copyright (c) 2013 Amazon.com, Inc. or its affiliates.  All Rights Reserved
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish, dis-
+# tribute, sublicense, and/or sell copies of the Software, and to permit
+# persons to whom the Software is furnished to do so, subject to the fol-
+# lowing conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABIL-
+# ITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT
+# SHALL THE AUTHOR BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
+# IN THE SOFTWARE.
+#
+
+"""
+A small bounded thread pool for running boto calls concurrently.
+
+This covers the part of the futures API that boto needs, for the
+versions of Python that don't ship concurrent.futures.
+"""
+
+from __future__ import with_statement
+import sys
+import threading
+from Queue import Queue
+
+import boto
+
+_SHUTDOWN = object()
+
+
+class Future(object):
+    """
+    The pending result of a call submitted to an Executor.
+    """
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._done = False
+        self._result = None
+        self._exc_info = None
+        self._callbacks = []
+
+    def done(self):
+        return self._done
+
+    def result(self, timeout=None):
+        """
+        Waits for the call to finish and returns its result, re-raising
+        any exception it raised.  Raises TimeoutError if the call hasn't
+        finished after timeout seconds.
+        """
+        self._wait(timeout)
+        if self._exc_info is not None:
+            raise self._exc_info[0], self._exc_info[1], self._exc_info[2]
+        return self._result
+
+    def exception(self, timeout=None):
+        """
+        Waits for the call to finish and returns the exception it
+        raised, or None if it succeeded.
+        """
+        self._wait(timeout)
+        if self._exc_info is not None:
+            return self._exc_info[1]
+        return None
+
+    def add_done_callback(self, fn):
+        """
+        Arranges for fn(future) to be called when the call finishes.  If
+        it already has, fn is called right away.
+        """
+        with self._condition:
+            if not self._done:
+                self._callbacks.append(fn)
+                return
+        fn(self)
+
+    def _wait(self, timeout):
+        with self._condition:
+            if not self._done:
+                self._condition.wait(timeout)
+            if not self._done:
+                raise TimeoutError()
+
+    def _finish(self, result=None, exc_info=None):
+        with self._condition:
+            self._result = result
+            self._exc_info = exc_info
+            self._done = True
+            self._condition.notifyAll()
+            callbacks, self._callbacks = self._callbacks, []
+        for fn in callbacks:
+            try:
+                fn(self)
+            except Exception:
+                boto.log.exception('exception calling callback for %r', self)
+
+
+def results(futures):
+    """
+    Waits for every future to finish and returns their results, in
+    order.  If any of the calls failed, the exception of the first one
+    in order is raised, but only once all of them have finished.
+    """
+    for future in futures:
+        future.exception()
+    return [future.result() for future in futures]
+
+
+class TimeoutError(Exception):
+    """
+    A Future's result wasn't ready within the given timeout.
+    """
+    pass
+
+
+class Executor(object):
+    """
+    Runs callables on a fixed number of worker threads.
+
+    Workers are started on first use and are daemon threads, so an
+    Executor that is never shut down doesn't keep the process alive.
+    """
+
+    def __init__(self, max_workers=10):
+        if max_workers < 1:
+            raise ValueError('max_workers must be at least 1')
+        self.max_workers = max_workers
+        self._queue = Queue()
+        self._threads = []
+        self._lock = threading.Lock()
+        self._shutdown = False
+
+    def submit(self, fn, *args, **kwargs):
+        """
+        Schedules fn(*args, **kwargs) to run on a worker thread and
+        returns a Future for its result.
+        """
+        with self._lock:
+            if self._shutdown:
+                raise RuntimeError('cannot submit to an executor that has '
+                                   'been shut down')
+            future = Future()
+            self._queue.put((future, fn, args, kwargs))
+            if len(self._threads) < self.max_workers:
+                self._start_worker()
+        return future
+
+    def map(self, fn, *iterables):
+        """
+        Like the builtin map, but the calls run concurrently.  Results
+        are returned in the order of the arguments; the first call to
+        fail raises its exception once all the calls have finished.
+        """
+        futures = [self.submit(fn, *args) for args in zip(*iterables)]
+        return results(futures)
+
+    def shutdown(self, wait=True):
+        """
+        Stops the workers once the calls already submitted have run.
+        """
+        with self._lock:
+            if self._shutdown:
+                threads = []
+            else:
+                self._shutdown = True
+                threads = list(self._threads)
+                for _ in threads:
+                    self._queue.put(_SHUTDOWN)
+        if wait:
+            for thread in threads:
+                thread.join()
+
+    def _start_worker(self):
+        thread = threading.Thread(target=self._work)
+        thread.setDaemon(True)
+        thread.start()
+        self._threads.append(thread)
+
+    def _work(self):
+        while True:
+            item = self._queue.get()
+            if item is _SHUTDOWN:
+                return
+            future, fn, args, kwargs = item
+            try:
+                result = fn(*args, **kwargs)
+            except BaseException:
+                future._finish(exc_info=sys.exc_info())
+            else:
+                future._finish(result)
+            # Don't keep the last call's arguments alive while idle.
+            del item, future, fn, args, kwargs
@@ -19,17 +19,23 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
 # IN THE SOFTWARE.
 #
+from __future__ import with_statement
 import os
 import math
 import threading
 import hashlib
 import time
 import logging
+import binascii
+import errno
+import mmap
+import stat
 from Queue import Queue, Empty
 
 from .writer import chunk_hashes, tree_hash, bytes_to_hex
 from .utils import DEFAULT_PART_SIZE, minimum_part_size
-from .exceptions import UploadArchiveError
+from .exceptions import UploadArchiveError, DownloadArchiveError
+from .exceptions import TreeHashDoesNotMatchError
 
 
 _END_SENTINEL = object()
@@ -45,9 +51,14 @@ class ConcurrentUploader(object):
     The threadpool is completely managed by this class and is
     transparent to the users of this class.
 
+    Parts of a file are memory mapped rather than read, and each
+    mapping is released as soon as its part is uploaded, so the
+    archive data held in memory is bounded by max_buffer_size however
+    many threads are used.
+
     """
     def __init__(self, api, vault_name, part_size=DEFAULT_PART_SIZE,
-                 num_threads=10):
+                 num_threads=10, max_buffer_size=None):
         """
         :type api: :class:`boto.glacier.layer1.Layer1`
         :param api: A layer1 glacier object.
@@ -60,11 +71,22 @@ class ConcurrentUploader(object):
             the archive parts.  The part size must be a megabyte multiplied by
             a power of two.
 
+        :type num_threads: int
+        :param num_threads: The number of threads hashing and uploading
+            parts.
+
+        :type max_buffer_size: int
+        :param max_buffer_size: The most bytes of the archive to hold
+            in memory at once, across all the parts waiting to be
+            uploaded or being uploaded.  At least one part is always
+            allowed.  Defaults to num_threads parts.
+
         """
         self._api = api
         self._vault_name = vault_name
         self._part_size = part_size
         self._num_threads = num_threads
+        self._max_buffer_size = max_buffer_size
         self._threads = []
 
     def upload(self, filename, description=None):
@@ -87,33 +109,89 @@ class ConcurrentUploader(object):
 
         """
         fileobj = open(filename, 'rb')
-        total_size = os.fstat(fileobj.fileno()).st_size
-        min_part_size_required = minimum_part_size(total_size)
-        if self._part_size >= min_part_size_required:
+        try:
+            return self.upload_fileobj(fileobj, description)
+        finally:
+            fileobj.close()
+
+    def upload_fileobj(self, fileobj, description=None):
+        """Concurrently create an archive from a file object.
+
+        A regular file is uploaded in its entirety, from its start, as
+        upload does.  Anything else, such as a pipe or a socket, is
+        read from its current position to its end a part at a time;
+        the size isn't known in advance, so the part size given when
+        the class was constructed is always used.
+
+        :type fileobj: file
+        :param fileobj: The file object to upload.
+
+        :type description: str
+        :param description: The description of the archive.
+
+        :rtype: str
+        :return: The archive id of the newly created archive.
+
+        """
+        if _is_regular_file(fileobj):
+            total_size = os.fstat(fileobj.fileno()).st_size
+            min_part_size_required = minimum_part_size(total_size)
+            if self._part_size >= min_part_size_required:
+                part_size = self._part_size
+            else:
+                part_size = min_part_size_required
+                log.debug("The part size specified (%s) is smaller than "
+                          "the minimum required part size.  Using a part "
+                          "size of: %s", self._part_size, part_size)
+            parts = _mapped_parts(fileobj, total_size, part_size)
+        else:
             part_size = self._part_size
+            parts = _read_parts(fileobj, part_size)
+        return self._upload_parts(parts, part_size, description)
+
+    def _upload_parts(self, parts, part_size, description):
+        if self._max_buffer_size is None:
+            slots = self._num_threads
         else:
-            part_size = min_part_size_required
-            log.debug("The part size specified (%s) is smaller than "
-                      "the minimum required part size.  Using a part "
-                      "size of: %s", self._part_size, part_size)
-        total_parts = int(math.ceil(total_size / float(part_size)))
-        hash_chunks = [None] * total_parts
+            slots = max(1, self._max_buffer_size // part_size)
+        # Taken before each part is mapped or read, and given back by
+        # the worker that uploads it.
+        buffer_slots = threading.Semaphore(slots)
         worker_queue = Queue()
         result_queue = Queue()
         response = self._api.initiate_multipart_upload(self._vault_name,
                                                        part_size,
                                                        description)
         upload_id = response['UploadId']
-        # The basic idea is to add the chunks (the offsets not the actual
-        # contents) to a work queue, start up a thread pool, let the crank
-        # through the items in the work queue, and then place their results
-        # in a result queue which we use to complete the multipart upload.
-        self._add_work_items_to_queue(total_parts, worker_queue, part_size)
-        self._start_upload_threads(result_queue, upload_id,
-                                   worker_queue, filename)
+        # The basic idea is to add the parts to a work queue as they are
+        # mapped or read, let a thread pool crank through the items in
+        # the work queue, and then place their results in a result queue
+        # which we use to complete the multipart upload.
+        self._start_upload_threads(result_queue, upload_id, worker_queue)
+        hash_chunks = {}
+        total_size = 0
         try:
-            self._wait_for_upload_threads(hash_chunks, result_queue,
-                                          total_parts)
+            try:
+                while True:
+                    buffer_slots.acquire()
+                    self._collect_results(hash_chunks, result_queue, block=False)
+                    try:
+                        part_number, start_byte, data, release = parts.next()
+                    except StopIteration:
+                        buffer_slots.release()
+                        break
+                    total_size += len(data)
+                    worker_queue.put((part_number, start_byte, data,
+                                      _Releaser(release, buffer_slots)))
+                    del data
+                total_parts = part_number + 1 if total_size else 0
+                for i in xrange(self._num_threads):
+                    worker_queue.put(_END_SENTINEL)
+                while len(hash_chunks) < total_parts:
+                    self._collect_results(hash_chunks, result_queue,
+                                          block=True)
+            finally:
+                self._shutdown_threads(worker_queue)
         except UploadArchiveError, e:
             log.debug("An error occurred while uploading an archive, aborting "
                       "multipart upload.")
@@ -121,18 +199,22 @@ class ConcurrentUploader(object):
             raise e
         log.debug("Completing upload.")
         response = self._api.complete_multipart_upload(
-            self._vault_name, upload_id, bytes_to_hex(tree_hash(hash_chunks)),
+            self._vault_name, upload_id,
+            bytes_to_hex(tree_hash(hash_chunks[i]
+                                   for i in xrange(total_parts))),
             total_size)
         log.debug("Upload finished.")
         return response['ArchiveId']
 
-    def _wait_for_upload_threads(self, hash_chunks, result_queue, total_parts):
-        for _ in xrange(total_parts):
-            result = result_queue.get()
+    def _collect_results(self, hash_chunks, result_queue, block):
+        while True:
+            try:
+                result = result_queue.get(block)
+            except Empty:
+                return
             if isinstance(result, Exception):
                 log.debug("An error was found in the result queue, terminating "
                           "threads: %s", result)
-                self._shutdown_threads()
                 raise UploadArchiveError("An error occurred while uploading "
                                          "an archive: %s" % result)
             # Each unit of work returns the tree hash for the given part
@@ -140,86 +222,184 @@ class ConcurrentUploader(object):
             # the entire archive.
             part_number, tree_sha256 = result
             hash_chunks[part_number] = tree_sha256
-        self._shutdown_threads()
+            if block:
+                return
 
-    def _shutdown_threads(self):
+    def _shutdown_threads(self, worker_queue):
         log.debug("Shutting down threads.")
         for thread in self._threads:
             thread.should_continue = False
         for thread in self._threads:
             thread.join()
+        self._threads = []
+        # Release any parts that were never uploaded.
+        while True:
+            try:
+                work = worker_queue.get_nowait()
+            except Empty:
+                break
+            if work is not _END_SENTINEL:
+                work[3]()
         log.debug("Threads have exited.")
 
-    def _start_upload_threads(self, result_queue, upload_id, worker_queue,
-                              filename):
+    def _start_upload_threads(self, result_queue, upload_id, worker_queue):
         log.debug("Starting threads.")
         for _ in xrange(self._num_threads):
-            thread = UploadWorkerThread(self._api, self._vault_name, filename,
+            thread = UploadWorkerThread(self._api, self._vault_name, None,
                                         upload_id, worker_queue, result_queue)
-            time.sleep(0.2)
             thread.start()
             self._threads.append(thread)
 
-    def _add_work_items_to_queue(self, total_parts, worker_queue, part_size):
-        log.debug("Adding work items to queue.")
-        for i in xrange(total_parts):
-            worker_queue.put((i, part_size))
-        for i in xrange(self._num_threads):
-            worker_queue.put(_END_SENTINEL)
+
+def _is_regular_file(fileobj):
+    try:
+        return stat.S_ISREG(os.fstat(fileobj.fileno()).st_mode)
+    except (AttributeError, IOError, OSError, ValueError):
+        return False
+
+
+def _mapped_parts(fileobj, total_size, part_size):
+    # Yields (part_number, start_byte, data, release) for each part of
+    # a file.  data is a read-only view of a memory map of just that
+    # part, which release unmaps.
+    for part_number, start_byte in enumerate(xrange(0, total_size,
+                                                    part_size)):
+        length = min(part_size, total_size - start_byte)
+        mapping = mmap.mmap(fileobj.fileno(), length, offset=start_byte,
+                            access=mmap.ACCESS_READ)
+        yield (part_number, start_byte, buffer(mapping), mapping.close)
+
+
+def _read_parts(fileobj, part_size):
+    # Yields (part_number, start_byte, data, release) for each part read
+    # from a stream, which may return less than it is asked for.
+    start_byte = 0
+    part_number = 0
+    while True:
+        pieces = []
+        remaining = part_size
+        while remaining:
+            piece = fileobj.read(remaining)
+            if not piece:
+                break
+            pieces.append(piece)
+            remaining -= len(piece)
+        data = ''.join(pieces)
+        del pieces
+        if not data:
+            return
+        size = len(data)
+        yield (part_number, start_byte, data, None)
+        # Drop this part before reading the next one.
+        del data
+        start_byte += size
+        part_number += 1
+        if remaining:
+            return
+
+
+class _Releaser(object):
+    # Frees a part's data and gives back its buffer slot, once.
+    def __init__(self, release, buffer_slots):
+        self._release = release
+        self._buffer_slots = buffer_slots
+        self._lock = threading.Lock()
+
+    def __call__(self):
+        with self._lock:
+            if self._buffer_slots is None:
+                return
+            if self._release is not None:
+                self._release()
+            self._buffer_slots.release()
+            self._release = self._buffer_slots = None
+
+
+class TransferThread(threading.Thread):
+    def __init__(self, worker_queue, result_queue):
+        threading.Thread.__init__(self)
+        self._worker_queue = worker_queue
+        self._result_queue = result_queue
+        self.should_continue = True
+
+    def run(self):
+        try:
+            while self.should_continue:
+                try:
+                    work = self._worker_queue.get(timeout=1)
+                except Empty:
+                    continue
+                if work is _END_SENTINEL:
+                    return
+                result = self._process_chunk(work)
+                # Don't hold on to the work item's data while waiting
+                # for the next one.
+                del work
+                self._result_queue.put(result)
+        finally:
+            self._cleanup()
+
+    def _process_chunk(self, work):
+        pass
+
+    def _cleanup(self):
+        pass
 
 
-class UploadWorkerThread(threading.Thread):
+class UploadWorkerThread(TransferThread):
     def __init__(self, api, vault_name, filename, upload_id,
                  worker_queue, result_queue, num_retries=5,
                  time_between_retries=5,
                  retry_exceptions=Exception):
-        threading.Thread.__init__(self)
+        TransferThread.__init__(self, worker_queue, result_queue)
         self._api = api
         self._vault_name = vault_name
+        # ConcurrentUploader passes each part's data with its work item
+        # and no filename.  Work items in the older (part_number,
+        # part_size) form are still read from filename.
         self._filename = filename
-        self._fileobj = open(filename, 'rb')
-        self._worker_queue = worker_queue
-        self._result_queue = result_queue
+        self._fileobj = None
         self._upload_id = upload_id
         self._num_retries = num_retries
         self._time_between_retries = time_between_retries
         self._retry_exceptions = retry_exceptions
-        self.should_continue = True
-
-    def run(self):
-        while self.should_continue:
-            try:
-                work = self._worker_queue.get(timeout=1)
-            except Empty:
-                continue
-            if work is _END_SENTINEL:
-                return
-            result = self._process_chunk(work)
-            self._result_queue.put(result)
 
     def _process_chunk(self, work):
+        if len(work) == 2:
+            work = self._read_part(*work)
         result = None
-        for _ in xrange(self._num_retries):
-            try:
-                result = self._upload_chunk(work)
-                break
-            except self._retry_exceptions, e:
-                log.error("Exception caught uploading part number %s for "
-                          "vault %s, filename: %s", work[0], self._vault_name,
-                          self._filename)
-                time.sleep(self._time_between_retries)
-                result = e
+        try:
+            for _ in xrange(self._num_retries):
+                try:
+                    result = self._upload_chunk(work)
+                    break
+                except self._retry_exceptions, e:
+                    log.error("Exception caught uploading part number %s "
+                              "for vault %s", work[0], self._vault_name)
+                    time.sleep(self._time_between_retries)
+                    result = e
+        finally:
+            release = work[3]
+            if release is not None:
+                release()
         return result
 
-    def _upload_chunk(self, work):
-        part_number, part_size = work
+    def _read_part(self, part_number, part_size):
+        if self._fileobj is None:
+            self._fileobj = open(self._filename, 'rb')
         start_byte = part_number * part_size
         self._fileobj.seek(start_byte)
-        contents = self._fileobj.read(part_size)
+        return (part_number, start_byte, self._fileobj.read(part_size), None)
+
+    def _upload_chunk(self, work):
+        part_number, start_byte, contents, release = work
+        # contents may be a buffer over a memory map; hashing and
+        # sending it don't copy it.
         linear_hash = hashlib.sha256(contents).hexdigest()
         tree_hash_bytes = tree_hash(chunk_hashes(contents))
         byte_range = (start_byte, start_byte + len(contents) - 1)
-        log.debug("Uploading chunk %s of size %s", part_number, part_size)
+        log.debug("Uploading chunk %s of size %s", part_number,
+                  len(contents))
         response = self._api.upload_part(self._vault_name, self._upload_id,
                                          linear_hash,
                                          bytes_to_hex(tree_hash_bytes),
@@ -227,3 +407,305 @@ class UploadWorkerThread(threading.Thread):
         # Reading the response allows the connection to be reused.
         response.read()
         return (part_number, tree_hash_bytes)
+
+
+class ConcurrentDownloader(object):
+    """Concurrently download an archive from glacier.
+
+    This class uses a thread pool to fetch the parts of an archive
+    retrieval job's output concurrently, writing each one at its
+    offset in the destination file once its tree hash checks out.
+
+    Completed parts are recorded in a journal file next to the
+    destination.  If a download is interrupted, downloading the same
+    job to the same file again fetches only the parts that are
+    missing; the journal is deleted once the download is complete.
+
+    """
+    def __init__(self, job, part_size=DEFAULT_PART_SIZE, num_threads=10):
+        """
+        :type job: :class:`boto.glacier.job.Job`
+        :param job: A completed archive retrieval job.
+
+        :type part_size: int
+        :param part_size: The size, in bytes, of the byte ranges to
+            download.  The part size must be a megabyte multiplied by a
+            power of two, so that glacier returns a tree hash for each
+            part.
+
+        :type num_threads: int
+        :param num_threads: The number of parts to download at once.
+
+        """
+        megabytes = part_size / float(1024 * 1024)
+        if megabytes < 1 or math.frexp(megabytes)[0] != 0.5:
+            raise ValueError("Part size must be a megabyte multiplied by "
+                             "a power of two: %s" % part_size)
+        self._job = job
+        self._part_size = part_size
+        self._num_threads = num_threads
+        self._threads = []
+
+    def download(self, filename, journal_file_name=None):
+        """Concurrently download the archive to a file.
+
+        :type filename: str
+        :param filename: The name of the file to write the archive to.
+
+        :type journal_file_name: str
+        :param journal_file_name: The file in which to record the
+            parts downloaded.  Defaults to filename with '.journal'
+            appended.
+
+        """
+        if journal_file_name is None:
+            journal_file_name = filename + '.journal'
+        total_size = self._job.archive_size
+        part_size = self._part_size
+        total_parts = int(math.ceil(total_size / float(part_size)))
+        journal = DownloadJournal(journal_file_name)
+        hash_chunks = [None] * total_parts
+        journaled = journal.resume(self._job.id, total_size, part_size,
+                                   filename)
+        if not journaled:
+            # Start afresh, with a file of the final size for the
+            # workers to write into.
+            fileobj = open(filename, 'wb')
+            fileobj.truncate(total_size)
+            fileobj.close()
+            journal.start(self._job.id, total_size, part_size)
+        log.debug("Downloading %s of %s parts.",
+                  total_parts - len(journaled), total_parts)
+        worker_queue = Queue()
+        result_queue = Queue()
+        # Journaled parts are handed to the workers too, which check
+        # them against the file and only download the ones that have
+        # changed.
+        for part_number in xrange(total_parts):
+            worker_queue.put((part_number, part_size,
+                              journaled.get(part_number)))
+        for i in xrange(self._num_threads):
+            worker_queue.put(_END_SENTINEL)
+        self._start_download_threads(result_queue, worker_queue, filename,
+                                     total_size)
+        try:
+            for _ in xrange(total_parts):
+                result = result_queue.get()
+                if isinstance(result, Exception):
+                    log.debug("An error was found in the result queue, "
+                              "terminating threads: %s", result)
+                    raise DownloadArchiveError(
+                        "An error occurred while downloading an "
+                        "archive: %s" % result)
+                part_number, tree_hash_hex = result
+                if journaled.get(part_number) != tree_hash_hex:
+                    journal.add_part(part_number, tree_hash_hex)
+                hash_chunks[part_number] = tree_hash_hex
+        finally:
+            self._shutdown_threads()
+        expected = self._job.sha256_treehash
+        if expected and total_parts:
+            actual = bytes_to_hex(tree_hash(
+                [binascii.unhexlify(h) for h in hash_chunks]))
+            if actual != expected:
+                raise TreeHashDoesNotMatchError(
+                    "The calculated tree hash %s does not match the "
+                    "expected tree hash %s for the archive" % (actual,
+                                                               expected))
+        journal.remove()
+
+    def _shutdown_threads(self):
+        log.debug("Shutting down threads.")
+        for thread in self._threads:
+            thread.should_continue = False
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+        log.debug("Threads have exited.")
+
+    def _start_download_threads(self, result_queue, worker_queue, filename,
+                                total_size):
+        log.debug("Starting threads.")
+        for _ in xrange(self._num_threads):
+            thread = DownloadWorkerThread(self._job, filename, total_size,
+                                          worker_queue, result_queue)
+            thread.start()
+            self._threads.append(thread)
+
+
+class DownloadWorkerThread(TransferThread):
+    def __init__(self, job, filename, total_size, worker_queue,
+                 result_queue, num_retries=5, time_between_retries=5,
+                 retry_exceptions=Exception):
+        TransferThread.__init__(self, worker_queue, result_queue)
+        self._job = job
+        self._filename = filename
+        self._fileobj = open(filename, 'r+b')
+        self._total_size = total_size
+        self._num_retries = num_retries
+        self._time_between_retries = time_between_retries
+        self._retry_exceptions = retry_exceptions
+
+    def _process_chunk(self, work):
+        result = None
+        for _ in xrange(self._num_retries):
+            try:
+                result = self._download_chunk(work)
+                break
+            except self._retry_exceptions, e:
+                log.error("Exception caught downloading part number %s for "
+                          "job %s, filename: %s: %s", work[0], self._job.id,
+                          self._filename, e)
+                time.sleep(self._time_between_retries)
+                result = e
+        return result
+
+    def _download_chunk(self, work):
+        part_number, part_size, journaled_tree_hash = work
+        start_byte = part_number * part_size
+        end_byte = min(start_byte + part_size, self._total_size) - 1
+        byte_range = (start_byte, end_byte)
+        if journaled_tree_hash is not None:
+            self._fileobj.seek(start_byte)
+            data = self._fileobj.read(end_byte - start_byte + 1)
+            if bytes_to_hex(tree_hash(chunk_hashes(data))) == \
+                    journaled_tree_hash:
+                return (part_number, journaled_tree_hash)
+            log.debug("Part %s of %s doesn't match the journal; "
+                      "downloading it again", part_number, self._filename)
+        log.debug("Downloading chunk %s of size %s", part_number, part_size)
+        response = self._job.get_output(byte_range)
+        data = response.read()
+        if len(data) != end_byte - start_byte + 1:
+            raise DownloadArchiveError(
+                "Got %s bytes for the byte range %s" % (len(data),
+                                                        byte_range))
+        actual_tree_hash = bytes_to_hex(tree_hash(chunk_hashes(data)))
+        expected_tree_hash = response['TreeHash']
+        if expected_tree_hash and expected_tree_hash != actual_tree_hash:
+            raise TreeHashDoesNotMatchError(
+                "The calculated tree hash %s does not match the "
+                "expected tree hash %s for the byte range %s" % (
+                    actual_tree_hash, expected_tree_hash, byte_range))
+        self._fileobj.seek(start_byte)
+        self._fileobj.write(data)
+        # The part is journaled once it has been written, so it must
+        # be on disk first.
+        self._fileobj.flush()
+        os.fsync(self._fileobj.fileno())
+        return (part_number, actual_tree_hash)
+
+    def _cleanup(self):
+        self._fileobj.close()
+
+
+class DownloadJournal(object):
+    """Records the parts of a ConcurrentDownloader download that have
+    been written, so that an interrupted download can be resumed.
+
+    The journal is a text file.  Its first line describes the download:
+    "download", the job id, the archive size and the part size,
+    separated by tabs.  Each completed part then adds a line of "part",
+    the part number and its tree hash.  Every line is flushed to disk
+    as it is written, and a last line cut short by a crash is ignored.
+
+    """
+    def __init__(self, journal_file_name):
+        self.journal_file_name = journal_file_name
+        self.job_id = None
+        self.size = None
+        self.part_size = None
+        self.parts = {}
+        self._load()
+
+    def _load(self):
+        try:
+            f = open(self.journal_file_name, 'r')
+        except IOError, e:
+            if e.errno != errno.ENOENT:
+                log.warning("Couldn't read journal file %s: %s",
+                            self.journal_file_name, e)
+            return
+        try:
+            lines = f.read().split('\n')
+        finally:
+            f.close()
+        # The last line is empty, or a part cut short by a crash.
+        lines.pop()
+        try:
+            fields = lines[0].split('\t')
+            if fields[0] != 'download' or len(fields) != 4:
+                raise ValueError(lines[0])
+            self.job_id = fields[1]
+            self.size = int(fields[2])
+            self.part_size = int(fields[3])
+            for line in lines[1:]:
+                kind, part_number, tree_hash_hex = line.split('\t')
+                self.parts[int(part_number)] = tree_hash_hex
+        except (IndexError, ValueError):
+            log.warning("Ignoring malformed journal file %s",
+                        self.journal_file_name)
+            self.job_id = None
+            self.parts = {}
+
+    def _append(self, line, mode='a'):
+        f = open(self.journal_file_name, mode)
+        try:
+            f.write(line + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        finally:
+            f.close()
+
+    def resume(self, job_id, size, part_size, filename):
+        """
+        Returns {part_number: tree_hash} for the parts of the download
+        of job_id to filename the journal records as done.  The journal
+        must be for the same job and part size, and the file must still
+        be the size of the archive.  The parts aren't checked against
+        the data in the file here; the download workers do that before
+        skipping a part.
+        """
+        if (self.job_id != job_id or self.size != size or
+                self.part_size != part_size):
+            if self.job_id is not None:
+                log.warning("Journal file %s is for another download; "
+                            "starting a new one", self.journal_file_name)
+            self.parts = {}
+            return {}
+        try:
+            file_size = os.stat(filename).st_size
+        except OSError:
+            file_size = None
+        if file_size != size:
+            self.parts = {}
+            return {}
+        return dict(self.parts)
+
+    def start(self, job_id, size, part_size):
+        """
+        Starts a new journal for a download of job_id.
+        """
+        self.job_id = job_id
+        self.size = size
+        self.part_size = part_size
+        self.parts = {}
+        self._append('\t'.join(['download', job_id, str(size),
+                                 str(part_size)]), 'w')
+
+    def add_part(self, part_number, tree_hash_hex):
+        """
+        Records that part part_number has been written.
+        """
+        self._append('part\t%d\t%s' % (part_number, tree_hash_hex))
+        self.parts[part_number] = tree_hash_hex
+
+    def remove(self):
+        """
+        Deletes the journal, once the download is complete.
+        """
+        try:
+            os.unlink(self.journal_file_name)
+        except OSError, e:
+            if e.errno != errno.ENOENT:
+                raise
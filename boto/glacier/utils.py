@@ -19,12 +19,20 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
 # IN THE SOFTWARE.
 #
+import binascii
+import hashlib
 import math
+import mmap
+import os
+
+from boto.executor import Executor
 
 
 _MEGABYTE = 1024 * 1024
 DEFAULT_PART_SIZE = 4 * _MEGABYTE
 MAXIMUM_NUMBER_OF_PARTS = 10000
+# How many chunks a worker hashes per task in chunk_hashes_from_file.
+_CHUNKS_PER_TASK = 64
 
 
 def minimum_part_size(size_in_bytes):
@@ -46,3 +54,149 @@ def minimum_part_size(size_in_bytes):
     else:
         part_size = DEFAULT_PART_SIZE
     return part_size
+
+
+def chunk_hashes(bytestring, chunk_size=_MEGABYTE):
+    chunk_count = int(math.ceil(len(bytestring) / float(chunk_size)))
+    hashes = []
+    for i in xrange(chunk_count):
+        start = i * chunk_size
+        # A buffer hashes the chunk where it is, rather than copying
+        # it out as a slice would.
+        chunk = buffer(bytestring, start, chunk_size)
+        hashes.append(hashlib.sha256(chunk).digest())
+    return hashes
+
+
+def tree_hash(fo):
+    """
+    Given a hash of each 1MB chunk (from chunk_hashes) this will hash
+    together adjacent hashes until it ends up with one big one. So a
+    tree of hashes.
+    """
+    hashes = list(fo)
+    # Each level has half as many hashes as the one below it, so this
+    # does n - 1 hashes in all.
+    while len(hashes) > 1:
+        new_hashes = [hashlib.sha256(hashes[i] + hashes[i + 1]).digest()
+                      for i in xrange(0, len(hashes) - 1, 2)]
+        if len(hashes) % 2:
+            new_hashes.append(hashes[-1])
+        hashes = new_hashes
+    return hashes[0]
+
+
+def compute_hashes_from_fileobj(fileobj, chunk_size=_MEGABYTE):
+    """Compute the linear and tree hash from a fileobj.
+
+    This function will compute the linear/tree hash of a fileobj
+    in a single pass through the fileobj.
+
+    :param fileobj: A file like object.
+
+    :param chunk_size: The size of the chunks to use for the tree
+        hash.  This is also the buffer size used to read from
+        `fileobj`.
+
+    :rtype: tuple
+    :return: A tuple of (linear_hash, tree_hash).  Both hashes
+        are returned in hex.
+
+    """
+    linear_hash = hashlib.sha256()
+    chunks = []
+    chunk = fileobj.read(chunk_size)
+    while chunk:
+        linear_hash.update(chunk)
+        chunks.append(hashlib.sha256(chunk).digest())
+        chunk = fileobj.read(chunk_size)
+    return linear_hash.hexdigest(), bytes_to_hex(tree_hash(chunks))
+
+
+def _hash_chunks(data, start, end, chunk_size):
+    hashes = []
+    for offset in xrange(start, end, chunk_size):
+        size = min(chunk_size, end - offset)
+        hashes.append(hashlib.sha256(buffer(data, offset, size)).digest())
+    return hashes
+
+
+def chunk_hashes_from_file(fileobj, chunk_size=_MEGABYTE, offset=0,
+                           size=None, max_workers=None):
+    """Compute the hash of each chunk of a file, using several threads.
+
+    The file is mapped into memory and its chunks are hashed by a pool
+    of threads.  hashlib releases the GIL while it hashes, so the
+    threads run on separate cores.  The result is the same as
+    chunk_hashes of the data.
+
+    :param fileobj: A real file, which must support fileno().
+
+    :param chunk_size: The size of the chunks to hash.
+
+    :param offset: Where in the file the data starts.
+
+    :param size: How many bytes to hash.  Defaults to the rest of the
+        file.
+
+    :param max_workers: How many threads to hash with.  Defaults to
+        the number of CPUs.
+
+    :rtype: list
+    :return: The binary hash of each chunk, in order.
+    """
+    file_size = os.fstat(fileobj.fileno()).st_size
+    if size is None:
+        size = file_size - offset
+    size = max(0, min(size, file_size - offset))
+    if size == 0:
+        return []
+    if max_workers is None:
+        max_workers = _cpu_count()
+    data = mmap.mmap(fileobj.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+        end = offset + size
+        step = chunk_size * _CHUNKS_PER_TASK
+        if max_workers <= 1 or size <= step:
+            return _hash_chunks(data, offset, end, chunk_size)
+        executor = Executor(max_workers)
+        try:
+            futures = [executor.submit(_hash_chunks, data, start,
+                                       min(start + step, end), chunk_size)
+                       for start in xrange(offset, end, step)]
+            hashes = []
+            for future in futures:
+                hashes.extend(future.result())
+            return hashes
+        finally:
+            executor.shutdown()
+    finally:
+        data.close()
+
+
+def tree_hash_from_file(fileobj, chunk_size=_MEGABYTE, offset=0, size=None,
+                        max_workers=None):
+    """Compute the tree hash of a file, using several threads.
+
+    See chunk_hashes_from_file for the parameters.
+
+    :rtype: str
+    :return: The tree hash, in hex.
+    """
+    hashes = chunk_hashes_from_file(fileobj, chunk_size, offset, size,
+                                    max_workers)
+    if not hashes:
+        hashes = [hashlib.sha256('').digest()]
+    return bytes_to_hex(tree_hash(hashes))
+
+
+def _cpu_count():
+    try:
+        import multiprocessing
+        return multiprocessing.cpu_count()
+    except (ImportError, NotImplementedError):
+        return 1
+
+
+def bytes_to_hex(str_as_bytes):
+    return binascii.hexlify(str_as_bytes)
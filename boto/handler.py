@@ -20,6 +20,13 @@
 # IN THE SOFTWARE.
 
 import xml.sax
+from StringIO import StringIO
+from xml.parsers import expat
+from xml.sax.xmlreader import AttributesImpl, Locator
+
+# How much of a response to read from the socket before handing it to
+# the parser when parsing incrementally.
+STREAM_CHUNK_SIZE = 64 * 1024
 
 class XmlHandler(xml.sax.ContentHandler):
 
@@ -42,5 +49,248 @@ class XmlHandler(xml.sax.ContentHandler):
 
     def characters(self, content):
         self.current_text += content
-            
 
+
+class _ChunkReader(object):
+    """
+    Presents a chunk that has already been read from fp, followed by
+    the rest of fp, as a single file-like object, and counts the bytes
+    that go through it.  No read returns more than the size asked for.
+    """
+
+    def __init__(self, chunk, fp):
+        self.chunk = chunk
+        self.fp = fp
+        self.size = 0
+
+    def read(self, size=-1):
+        if self.chunk:
+            # Callers such as pyexpat insist on getting no more than
+            # they asked for, so hand the chunk out size bytes at a time.
+            if 0 <= size < len(self.chunk):
+                data, self.chunk = self.chunk[:size], self.chunk[size:]
+            else:
+                data, self.chunk = self.chunk, None
+        else:
+            data = self.fp.read(size)
+        self.size += len(data)
+        return data
+
+
+class _ParseErrorLocator(Locator):
+
+    def __init__(self, error):
+        if hasattr(error, 'lineno'):
+            self.line, self.column = error.lineno, error.offset
+        else:
+            self.line, self.column = getattr(error, 'position', (None, None))
+
+    def getLineNumber(self):
+        return self.line
+
+    def getColumnNumber(self):
+        return self.column
+
+
+def _sax_parse(fp, handler, chunk_size):
+    parser = xml.sax.make_parser()
+    parser.setContentHandler(handler)
+    chunk = fp.read(chunk_size)
+    while chunk:
+        parser.feed(chunk)
+        chunk = fp.read(chunk_size)
+    parser.close()
+
+
+_NO_ATTRIBUTES = AttributesImpl({})
+
+
+def _expat_parse(fp, handler, chunk_size):
+    # Drives the handler straight from pyexpat, skipping the layers of
+    # Python code xml.sax puts between the two.  Names, attributes and
+    # text are reported exactly as xml.sax reports them.
+    parser = expat.ParserCreate()
+    parser.buffer_text = True
+    start = handler.startElement
+    def start_element(name, attrs):
+        if attrs:
+            start(name, AttributesImpl(attrs))
+        else:
+            start(name, _NO_ATTRIBUTES)
+    parser.StartElementHandler = start_element
+    parser.EndElementHandler = handler.endElement
+    parser.CharacterDataHandler = handler.characters
+    try:
+        parser.ParseFile(fp)
+    except expat.ExpatError, e:
+        raise xml.sax.SAXParseException(expat.ErrorString(e.code), e,
+                                        _ParseErrorLocator(e))
+
+
+def _make_iterparse_parser(iterparse, errors):
+    def parse(fp, handler, chunk_size):
+        # ElementTree reports namespaced names as {uri}local, but the
+        # SAX parser (without the namespaces feature) reports the name
+        # as written in the document, so map each uri back to its
+        # prefix.  Names are looked up in a cache, as the same few
+        # names repeat throughout a response.
+        prefixes = {}
+        names = {}
+        declarations = {}
+        stack = []
+        characters = handler.characters
+        def qname(name):
+            if name[0] == '{':
+                uri, local = name[1:].split('}', 1)
+                prefix = prefixes.get(uri)
+                if prefix:
+                    local = '%s:%s' % (prefix, local)
+            else:
+                local = name
+            names[name] = local
+            return local
+        try:
+            for event, elem in iterparse(
+                    fp, events=('start-ns', 'start', 'end')):
+                if event == 'start':
+                    # Report the text since the parent started or the
+                    # previous sibling ended, as SAX would.
+                    # iterparse hands over events in batches, so the
+                    # parent may already hold later children too.
+                    if stack:
+                        parent = stack[-1]
+                        index = parent[1]
+                        if index:
+                            text = parent[0][index - 1].tail
+                        else:
+                            text = parent[0].text
+                        parent[1] = index + 1
+                        if text:
+                            characters(text)
+                    stack.append([elem, 0])
+                    keys = elem.keys()
+                    if keys or declarations:
+                        # SAX reports namespace declarations as
+                        # attributes.
+                        attrs = declarations
+                        declarations = {}
+                        for key in keys:
+                            attrs[names.get(key) or qname(key)] = \
+                                elem.get(key)
+                        attrs = AttributesImpl(attrs)
+                    else:
+                        attrs = _NO_ATTRIBUTES
+                    tag = elem.tag
+                    handler.startElement(names.get(tag) or qname(tag), attrs)
+                elif event == 'end':
+                    stack.pop()
+                    # The text SAX would have reported since the last
+                    # start or end event is the element's own text if
+                    # it has no children, and the tail of its last
+                    # child otherwise.
+                    if len(elem):
+                        text = elem[-1].tail
+                        # The children have been handled, so free them.
+                        del elem[:]
+                    else:
+                        text = elem.text
+                    if text:
+                        characters(text)
+                    tag = elem.tag
+                    handler.endElement(names.get(tag) or qname(tag))
+                else:
+                    prefix, uri = elem
+                    prefixes[uri] = prefix
+                    names.clear()
+                    if prefix:
+                        declarations['xmlns:' + prefix] = uri
+                    else:
+                        declarations['xmlns'] = uri
+        except errors, e:
+            raise xml.sax.SAXParseException(str(e), e,
+                                            _ParseErrorLocator(e))
+    return parse
+
+
+def _load_etree():
+    import xml.etree.cElementTree as cElementTree
+    return _make_iterparse_parser(cElementTree.iterparse, (SyntaxError,))
+
+
+def _load_lxml():
+    import lxml.etree
+    return _make_iterparse_parser(lxml.etree.iterparse,
+                                  (lxml.etree.XMLSyntaxError,))
+
+
+PARSERS = {'sax': _sax_parse, 'expat': _expat_parse}
+
+# Parsers built on modules that are only imported when first asked for.
+_PARSER_LOADERS = {'etree': _load_etree, 'lxml': _load_lxml}
+
+# Every parser name, including those whose loader failed and was
+# dropped from _PARSER_LOADERS.
+_KNOWN_PARSERS = frozenset(PARSERS) | frozenset(_PARSER_LOADERS)
+
+
+def get_parser(name=None):
+    """
+    Returns the function used to parse XML responses.  The parser is
+    chosen by the xml_parser option in the Boto section of the config
+    file, which may be 'sax' (the default), 'expat' to drive the
+    handler from pyexpat without going through xml.sax, 'etree' to use
+    iterparse from the C accelerated ElementTree in the standard
+    library, or 'lxml' to use iterparse from lxml.  If the module the
+    chosen parser needs can't be imported, 'sax' is used instead.  Any
+    other name raises ValueError.
+
+    Every parser drives the handler with the same SAX callbacks, so
+    objects built from the responses are the same whichever is used.
+    """
+    if name is None:
+        from boto import config
+        name = config.get('Boto', 'xml_parser', 'sax')
+    if name not in PARSERS and name not in _KNOWN_PARSERS:
+        raise ValueError('Unknown XML parser: %r' % name)
+    for candidate in (name, 'sax'):
+        if candidate not in PARSERS and candidate in _PARSER_LOADERS:
+            try:
+                PARSERS[candidate] = _PARSER_LOADERS[candidate]()
+            except ImportError:
+                del _PARSER_LOADERS[candidate]
+        if candidate in PARSERS:
+            return PARSERS[candidate]
+
+
+def parse_string(body, handler, parser=None):
+    """
+    Parses the XML document in the string body with the SAX content
+    handler, using the parser selected by get_parser.
+    """
+    if parser is None:
+        parser = get_parser()
+    if parser is _sax_parse:
+        xml.sax.parseString(body, handler)
+    else:
+        parser(StringIO(body), handler, len(body))
+
+
+def parse_stream(fp, handler, chunk_size=STREAM_CHUNK_SIZE, parser=None):
+    """
+    Parses the XML document read from the file-like object fp, such as
+    an HTTP response, with the SAX content handler.  The document is
+    fed to an incremental parser chunk_size bytes at a time, so parsing
+    overlaps with receiving the rest of the document and the whole
+    document is never held in memory.
+
+    Returns the number of bytes read.  Nothing is parsed if fp is
+    empty, and 0 is returned.
+    """
+    chunk = fp.read(chunk_size)
+    if not chunk:
+        return 0
+    if parser is None:
+        parser = get_parser()
+    reader = _ChunkReader(chunk, fp)
+    parser(reader, handler, chunk_size)
+    return reader.size
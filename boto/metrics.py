@@ -0,0 +1,326 @@
+# Copyright (c) 2013 Amazon.com, Inc. or its affiliates.  All Rights Reserved
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish, dis-
+# tribute, sublicense, and/or sell copies of the Software, and to permit
+# persons to whom the Software is furnished to do so, subject to the fol-
+# lowing conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABIL-
+# ITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT
+# SHALL THE AUTHOR BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
+# IN THE SOFTWARE.
+#
+
+"""
+Timing and size measurements for the requests boto sends.
+
+Functions registered with add_request_hook (for every connection) or
+AWSAuthConnection.add_request_hook (for one connection) are called
+with a RequestRecord at these points in a request's life:
+
+``before-send``
+    Just before each attempt is sent.
+``on-retry``
+    When an attempt failed and the request is going to be retried.
+``after-response``
+    Once, when the request has finished, successfully or not.
+
+RequestStats is a ready-made ``after-response`` hook that keeps
+latency histograms per service and action::
+
+    stats = boto.metrics.RequestStats()
+    boto.metrics.add_request_hook('after-response', stats)
+    ...
+    print stats.report()
+"""
+
+from __future__ import with_statement
+import math
+import threading
+import time
+
+import boto
+
+EVENTS = ('before-send', 'on-retry', 'after-response')
+
+_hooks = dict((event, []) for event in EVENTS)
+
+
+def add_request_hook(event, fn):
+    """
+    Calls fn(record) at event for the requests of every connection.
+    """
+    check_event(event)
+    _hooks[event].append(fn)
+
+
+def remove_request_hook(event, fn):
+    check_event(event)
+    _hooks[event].remove(fn)
+
+
+def get_request_hooks(event):
+    return _hooks[event]
+
+
+def check_event(event):
+    if event not in EVENTS:
+        raise ValueError('Unknown request event %r, expected one of %s' %
+                         (event, ', '.join(EVENTS)))
+
+
+def log_request(record):
+    """
+    An ``after-response`` hook that logs every request to boto.perflog.
+    """
+    boto.perflog.debug('%s %s: status=%s time=%dms ttfb=%sms attempts=%d '
+                       'sent=%s received=%s reused=%s',
+                       record.service, record.action, record.status,
+                       record.total_time * 1000,
+                       _milliseconds(record.time_to_first_byte),
+                       record.attempts, record.bytes_sent,
+                       record.bytes_received, record.reused_connection)
+
+
+def _milliseconds(seconds):
+    if seconds is None:
+        return None
+    return int(seconds * 1000)
+
+
+class RequestRecord(object):
+    """
+    What happened to one request.  Times are in seconds.
+
+    :ivar service: The boto module of the connection, e.g. ``ec2``.
+    :ivar action: The API action, or the HTTP method for REST services.
+    :ivar request: The HTTPRequest being sent.
+    :ivar attempts: How many times the request has been sent.
+    :ivar retries: How many of those attempts failed and were retried.
+    :ivar retry_reason: Why the last retry happened.
+    :ivar retry_delay: How long boto slept before the last retry.
+    :ivar bytes_sent: Body bytes sent, over all attempts.
+    :ivar bytes_received: The Content-Length of the final response, if
+        it had one.
+    :ivar status: The HTTP status of the final response.
+    :ivar error: The exception the request failed with, if any.
+    :ivar reused_connection: Whether the last attempt was sent over a
+        connection that was already open.
+    :ivar time_to_first_byte: From sending the last attempt to
+        receiving its response headers.
+    :ivar total_time: From the start of the first attempt to the end of
+        the request, including retries.
+    """
+
+    def __init__(self, service, request, clock=time.time):
+        self.service = service
+        self.request = request
+        self.action = (request.params.get('Action') or
+                       request.headers.get('X-Amz-Target') or
+                       request.method)
+        self.attempts = 0
+        self.retries = 0
+        self.retry_reason = None
+        self.retry_delay = 0
+        self.bytes_sent = 0
+        self.bytes_received = None
+        self.status = None
+        self.error = None
+        self.reused_connection = None
+        self.time_to_first_byte = None
+        self.total_time = None
+        self._clock = clock
+        self.start_time = clock()
+        self._attempt_start = None
+
+    def __repr__(self):
+        return '<RequestRecord %s %s status=%s attempts=%d>' % (
+            self.service, self.action, self.status, self.attempts)
+
+    def start_attempt(self, connection):
+        self.attempts += 1
+        self._attempt_start = self._clock()
+        self.time_to_first_byte = None
+        self.reused_connection = getattr(connection, 'sock', None) is not None
+        self.bytes_sent += _body_size(self.request)
+
+    def got_response(self, response):
+        if self._attempt_start is not None:
+            self.time_to_first_byte = self._clock() - self._attempt_start
+        self.status = response.status
+
+    def retrying(self, reason, delay=0):
+        self.retries += 1
+        self.retry_reason = reason
+        self.retry_delay = delay
+
+    def finish(self, response=None, error=None):
+        self.total_time = self._clock() - self.start_time
+        self.error = error
+        if response is not None:
+            self.status = response.status
+            length = response.getheader('content-length')
+            if length is not None:
+                try:
+                    self.bytes_received = int(length)
+                except ValueError:
+                    pass
+
+
+def _body_size(request):
+    if isinstance(request.body, basestring):
+        return len(request.body)
+    length = request.headers.get('Content-Length')
+    if length is not None:
+        try:
+            return int(length)
+        except ValueError:
+            pass
+    return 0
+
+
+class Histogram(object):
+    """
+    Counts values in buckets that grow geometrically, so percentiles
+    are accurate to within the given relative precision however many
+    values are added, in constant memory.
+    """
+
+    def __init__(self, precision=0.05, smallest=1e-4):
+        self.smallest = smallest
+        self._log_base = math.log(1 + precision)
+        self._buckets = {}
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def add(self, value):
+        if value <= self.smallest:
+            index = 0
+        else:
+            index = int(math.ceil(math.log(value / self.smallest) /
+                                  self._log_base))
+        self._buckets[index] = self._buckets.get(index, 0) + 1
+        self.count += 1
+        self.total += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def mean(self):
+        if not self.count:
+            return None
+        return self.total / self.count
+
+    def percentile(self, percent):
+        """
+        Returns the smallest value that at least percent % of the
+        values are no greater than, or None if nothing was added.
+        """
+        if not self.count:
+            return None
+        rank = max(1, int(math.ceil(self.count * percent / 100.0)))
+        seen = 0
+        for index in sorted(self._buckets):
+            seen += self._buckets[index]
+            if seen >= rank:
+                value = self.smallest * math.exp(index * self._log_base)
+                return min(max(value, self.min), self.max)
+
+
+class _ActionStats(object):
+
+    def __init__(self):
+        self.total_time = Histogram()
+        self.time_to_first_byte = Histogram()
+        self.errors = 0
+        self.retries = 0
+        self.reused = 0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+
+    def add(self, record):
+        self.total_time.add(record.total_time)
+        if record.time_to_first_byte is not None:
+            self.time_to_first_byte.add(record.time_to_first_byte)
+        if record.error is not None or (record.status or 0) >= 400:
+            self.errors += 1
+        self.retries += record.retries
+        if record.reused_connection:
+            self.reused += 1
+        self.bytes_sent += record.bytes_sent
+        self.bytes_received += record.bytes_received or 0
+
+    def summary(self):
+        return {'count': self.total_time.count,
+                'errors': self.errors,
+                'retries': self.retries,
+                'reused_connections': self.reused,
+                'bytes_sent': self.bytes_sent,
+                'bytes_received': self.bytes_received,
+                'mean': self.total_time.mean(),
+                'p50': self.total_time.percentile(50),
+                'p99': self.total_time.percentile(99),
+                'max': self.total_time.max,
+                'ttfb_p50': self.time_to_first_byte.percentile(50),
+                'ttfb_p99': self.time_to_first_byte.percentile(99)}
+
+
+class RequestStats(object):
+    """
+    An ``after-response`` hook that aggregates requests by service and
+    action.  It is safe to share between threads.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def __call__(self, record):
+        key = (record.service, record.action)
+        with self._lock:
+            stats = self._stats.get(key)
+            if stats is None:
+                stats = self._stats[key] = _ActionStats()
+            stats.add(record)
+
+    def reset(self):
+        with self._lock:
+            self._stats = {}
+
+    def summary(self):
+        """
+        Returns a dict mapping (service, action) to a dict of counts,
+        byte totals and latency percentiles in seconds.
+        """
+        with self._lock:
+            return dict((key, stats.summary())
+                        for key, stats in self._stats.items())
+
+    def report(self):
+        """
+        Returns the summary as a table, slowest p99 first.
+        """
+        rows = sorted(self.summary().items(),
+                      key=lambda item: item[1]['p99'], reverse=True)
+        lines = ['%-40s %7s %6s %7s %9s %9s %9s' % (
+            'service/action', 'count', 'errors', 'retries',
+            'p50 (ms)', 'p99 (ms)', 'max (ms)')]
+        for (service, action), summary in rows:
+            lines.append('%-40s %7d %6d %7d %9.1f %9.1f %9.1f' % (
+                '%s/%s' % (service, action), summary['count'],
+                summary['errors'], summary['retries'],
+                summary['p50'] * 1000, summary['p99'] * 1000,
+                summary['max'] * 1000))
+        return '\n'.join(lines)
@@ -27,6 +27,8 @@ This class encapsulates the provider-specific header differences.
 """
 
 import os
+import threading
+import weakref
 from datetime import datetime
 
 import boto
@@ -163,9 +165,22 @@ class Provider(object):
         }
     }
 
+    # How many seconds before credentials from the metadata server
+    # expire that they are renewed on the request path, and by the
+    # background refresher.
+    RefreshWindow = 5 * 60
+    BackgroundRefreshWindow = 15 * 60
+    # The longest the background refresher waits before trying again
+    # after failing to get new credentials.
+    BackgroundRetryDelay = 60
+
     def __init__(self, name, access_key=None, secret_key=None,
                  security_token=None):
         self.host = None
+        # The access key, secret key and security token are replaced
+        # together, as one tuple.
+        self._credentials = (None, None, None)
+        self._refresh_lock = threading.Lock()
         self.access_key = access_key
         self.secret_key = secret_key
         self.security_token = security_token
@@ -180,56 +195,124 @@ class Provider(object):
         host_opt_name = '%s_host' % self.HostKeyMap[self.name]
         if config.has_option('Credentials', host_opt_name):
             self.host = config.get('Credentials', host_opt_name)
+        if config.getbool('Boto', 'refresh_credentials_in_background', False):
+            self.start_background_refresh()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['_refresh_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._refresh_lock = threading.Lock()
 
     def get_access_key(self):
-        if self._credentials_need_refresh():
-            self._populate_keys_from_metadata_server()
-        return self._access_key
+        self._refresh_if_needed()
+        return self._credentials[0]
 
     def set_access_key(self, value):
-        self._access_key = value
+        self._credentials = (value,) + self._credentials[1:]
 
     access_key = property(get_access_key, set_access_key)
 
     def get_secret_key(self):
-        if self._credentials_need_refresh():
-            self._populate_keys_from_metadata_server()
-        return self._secret_key
+        self._refresh_if_needed()
+        return self._credentials[1]
 
     def set_secret_key(self, value):
-        self._secret_key = value
+        self._credentials = self._credentials[:1] + (value,) + \
+            self._credentials[2:]
 
     secret_key = property(get_secret_key, set_secret_key)
 
     def get_security_token(self):
-        if self._credentials_need_refresh():
-            self._populate_keys_from_metadata_server()
-        return self._security_token
+        self._refresh_if_needed()
+        return self._credentials[2]
 
     def set_security_token(self, value):
-        self._security_token = value
+        self._credentials = self._credentials[:2] + (value,)
 
     security_token = property(get_security_token, set_security_token)
 
-    def _credentials_need_refresh(self):
+    def get_current_credentials(self):
+        """
+        Returns the access key, secret key and security token as one
+        tuple.  Reading the three properties one after another can mix
+        old and new credentials if they are refreshed in between, so
+        code that signs a request should use this instead.
+        """
+        self._refresh_if_needed()
+        return self._credentials
+
+    def _seconds_until_expiry(self):
         if self._credential_expiry_time is None:
+            return None
+        delta = self._credential_expiry_time - datetime.utcnow()
+        # python2.6 does not have timedelta.total_seconds() so we have
+        # to calculate this ourselves.  This is straight from the
+        # datetime docs.
+        return ((delta.microseconds + (delta.seconds + delta.days * 24 * 3600)
+                 * 10**6) / 10**6)
+
+    def _credentials_need_refresh(self):
+        seconds_left = self._seconds_until_expiry()
+        if seconds_left is None:
             return False
         else:
             # The credentials should be refreshed if they're going to expire
             # in less than 5 minutes.
-            delta = self._credential_expiry_time - datetime.utcnow()
-            # python2.6 does not have timedelta.total_seconds() so we have
-            # to calculate this ourselves.  This is straight from the
-            # datetime docs.
-            seconds_left = (
-                (delta.microseconds + (delta.seconds + delta.days * 24 * 3600)
-                 * 10**6) / 10**6)
-            if seconds_left < (5 * 60):
+            if seconds_left < self.RefreshWindow:
                 boto.log.debug("Credentials need to be refreshed.")
                 return True
             else:
                 return False
 
+    def _refresh_if_needed(self):
+        if not self._credentials_need_refresh():
+            return
+        # Only one thread fetches new credentials.  While it does, the
+        # others carry on with the current ones unless those have
+        # actually expired.
+        if self._refresh_lock.acquire(self._seconds_until_expiry() <= 0):
+            try:
+                if self._credentials_need_refresh():
+                    self._populate_keys_from_metadata_server()
+            finally:
+                self._refresh_lock.release()
+
+    def start_background_refresh(self):
+        """
+        Has credentials from the instance metadata server renewed well
+        before they expire, so that requests never wait for the metadata
+        server.  One daemon thread does this for every Provider in the
+        process, and holds only weak references to them.  Does nothing
+        if the credentials didn't come from the metadata server.  This
+        is also turned on by the refresh_credentials_in_background
+        config option.
+        """
+        if self._credential_expiry_time is None:
+            return
+        _refresher.add(self)
+
+    def stop_background_refresh(self):
+        _refresher.discard(self)
+
+    def _background_refresh_delay(self):
+        seconds_left = self._seconds_until_expiry()
+        if seconds_left is None:
+            return None
+        return seconds_left - self.BackgroundRefreshWindow
+
+    def _set_refreshed_credentials(self, credentials, expiry_time):
+        self._refresh_lock.acquire()
+        try:
+            if expiry_time != self._credential_expiry_time:
+                self._credentials = credentials
+                self._credential_expiry_time = expiry_time
+        finally:
+            self._refresh_lock.release()
+
 
     def get_credentials(self, access_key=None, secret_key=None):
         access_key_name, secret_key_name = self.CredentialMap[self.name]
@@ -247,36 +330,19 @@ class Provider(object):
         elif config.has_option('Credentials', secret_key_name):
             self.secret_key = config.get('Credentials', secret_key_name)
 
-        if ((self._access_key is None or self._secret_key is None) and
+        access_key, secret_key, security_token = self._credentials
+        if ((access_key is None or secret_key is None) and
                 self.MetadataServiceSupport[self.name]):
             self._populate_keys_from_metadata_server()
-        self._secret_key = self._convert_key_to_str(self._secret_key)
+        self.secret_key = self._convert_key_to_str(self._credentials[1])
 
     def _populate_keys_from_metadata_server(self):
-        # get_instance_metadata is imported here because of a circular
-        # dependency.
-        boto.log.debug("Retrieving credentials from metadata server.")
-        from boto.utils import get_instance_metadata
-        timeout = config.getfloat('Boto', 'metadata_service_timeout', 1.0)
-        metadata = get_instance_metadata(timeout=timeout, num_retries=1)
-        # I'm assuming there's only one role on the instance profile.
-        if metadata and 'iam' in metadata:
-            security = metadata['iam']['security-credentials'].values()[0]
-            self._access_key = security['AccessKeyId']
-            self._secret_key = self._convert_key_to_str(security['SecretAccessKey'])
-            self._security_token = security['Token']
-            expires_at = security['Expiration']
-            self._credential_expiry_time = datetime.strptime(
-                expires_at, "%Y-%m-%dT%H:%M:%SZ")
-            boto.log.debug("Retrieved credentials will expire in %s at: %s",
-                           self._credential_expiry_time - datetime.now(), expires_at)
+        fetched = _fetch_metadata_credentials()
+        if fetched is not None:
+            self._credentials, self._credential_expiry_time = fetched
 
     def _convert_key_to_str(self, key):
-        if isinstance(key, unicode):
-            # the secret key must be bytes and not unicode to work
-            #  properly with hmac.new (see http://bugs.python.org/issue5285)
-            return str(key)
-        return key
+        return _convert_key_to_str(key)
 
     def configure_headers(self):
         header_info_map = self.HeaderInfoMap[self.name]
@@ -318,3 +384,121 @@ class Provider(object):
 # Static utility method for getting default Provider.
 def get_default():
     return Provider('aws')
+
+
+def _convert_key_to_str(key):
+    if isinstance(key, unicode):
+        # the secret key must be bytes and not unicode to work
+        #  properly with hmac.new (see http://bugs.python.org/issue5285)
+        return str(key)
+    return key
+
+
+def _fetch_metadata_credentials():
+    """
+    Returns ((access_key, secret_key, security_token), expiry_time) for
+    the instance's IAM role, or None if the metadata server has none.
+    """
+    # get_instance_metadata is imported here because of a circular
+    # dependency.
+    boto.log.debug("Retrieving credentials from metadata server.")
+    from boto.utils import get_instance_metadata
+    timeout = config.getfloat('Boto', 'metadata_service_timeout', 1.0)
+    metadata = get_instance_metadata(timeout=timeout, num_retries=1)
+    # I'm assuming there's only one role on the instance profile.
+    if not metadata or 'iam' not in metadata:
+        return None
+    security = metadata['iam']['security-credentials'].values()[0]
+    expires_at = security['Expiration']
+    expiry_time = datetime.strptime(expires_at, "%Y-%m-%dT%H:%M:%SZ")
+    credentials = (security['AccessKeyId'],
+                   _convert_key_to_str(security['SecretAccessKey']),
+                   security['Token'])
+    boto.log.debug("Retrieved credentials will expire in %s at: %s",
+                   expiry_time - datetime.utcnow(), expires_at)
+    return credentials, expiry_time
+
+
+class _CredentialRefresher(object):
+    """
+    Renews metadata server credentials for every Provider that has
+    asked for background refresh, on a single daemon thread.  Providers
+    are held through weak references, so one that is no longer used
+    drops out on its own.  The thread exits when no Providers are left.
+    """
+
+    def __init__(self):
+        self._providers = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+
+    def add(self, provider):
+        self._lock.acquire()
+        try:
+            self._providers[provider] = True
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name='boto-credential-refresh')
+                self._thread.setDaemon(True)
+                self._thread.start()
+        finally:
+            self._lock.release()
+        self._wakeup.set()
+
+    def discard(self, provider):
+        self._lock.acquire()
+        try:
+            self._providers.pop(provider, None)
+        finally:
+            self._lock.release()
+        self._wakeup.set()
+
+    def _run(self):
+        failures = 0
+        while True:
+            self._lock.acquire()
+            try:
+                self._wakeup.clear()
+                providers = self._providers.keys()
+                if not providers:
+                    self._thread = None
+                    return
+            finally:
+                self._lock.release()
+            delay = self._refresh(providers)
+            # Don't keep the Providers alive while waiting.
+            del providers
+            if delay is None or delay > 0:
+                failures = 0
+            else:
+                # The metadata server doesn't have new credentials yet.
+                failures += 1
+                delay = min(2 ** failures, Provider.BackgroundRetryDelay)
+            self._wakeup.wait(delay)
+
+    def _refresh(self, providers):
+        """
+        Renews the credentials of the providers that are due, and
+        returns how many seconds until the next one is.
+        """
+        due = [p for p in providers if p._background_refresh_delay() <= 0]
+        if due:
+            # Every Provider on the instance gets the same role
+            # credentials, so one request renews them all.
+            try:
+                fetched = _fetch_metadata_credentials()
+            except Exception:
+                boto.log.exception('Error refreshing credentials')
+                fetched = None
+            if fetched is not None:
+                for provider in due:
+                    provider._set_refreshed_credentials(*fetched)
+        delays = [p._background_refresh_delay() for p in providers]
+        delays = [d for d in delays if d is not None]
+        if delays:
+            return min(delays)
+        return None
+
+
+_refresher = _CredentialRefresher()
@@ -0,0 +1,234 @@
+# Copyright (c) 2013 Amazon.com, Inc. or its affiliates.  All Rights Reserved
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish, dis-
+# tribute, sublicense, and/or sell copies of the Software, and to permit
+# persons to whom the Software is furnished to do so, subject to the fol-
+# lowing conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABIL-
+# ITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT
+# SHALL THE AUTHOR BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
+# IN THE SOFTWARE.
+#
+
+
+"""
+Client-side flow control shared by every connection in the process.
+
+An AdaptiveRateLimiter paces the requests sent to one endpoint and
+backs off when the endpoint reports throttling, and a CircuitBreaker
+fails requests to an endpoint fast while it keeps failing.  Both are
+kept per endpoint, so all the threads and connection objects talking
+to the same host slow down together instead of each retrying on its
+own schedule.
+"""
+
+from __future__ import with_statement
+import threading
+import time
+
+from boto.exception import CircuitOpenError
+
+
+class AdaptiveRateLimiter(object):
+    """
+    A token bucket whose fill rate adapts to how the endpoint copes.
+
+    The limiter doesn't hold anything back until the first throttled
+    response.  From then on requests are sent at no more than rate per
+    second: every throttled response multiplies the rate by decrease,
+    and every successful one adds enough for the rate to grow by about
+    increase requests per second, each second.  The bucket holds up to
+    a second's worth of tokens, so short bursts aren't delayed.
+    """
+
+    def __init__(self, min_rate=0.5, max_rate=None, increase=1.0,
+                 decrease=0.5, clock=time.time, sleep=None):
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase = increase
+        self.decrease = decrease
+        self.rate = None
+        self.throttles = 0
+        self._clock = clock
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self._tokens = 0.0
+        self._last_fill = clock()
+        # Requests sent in the current and the previous second, used to
+        # pick a starting rate at the first throttle.
+        self._second = int(self._last_fill)
+        self._sent = 0
+        self._sent_last_second = 0
+
+    def acquire(self):
+        """
+        Takes a token, sleeping until one is available.  Returns the
+        number of seconds spent waiting.
+        """
+        with self._lock:
+            now = self._clock()
+            self._count_send(now)
+            if self.rate is None:
+                return 0
+            self._fill(now)
+            self._tokens -= 1
+            if self._tokens >= 0:
+                return 0
+            # The token is reserved now, so threads that arrive later
+            # queue up behind this one.
+            wait = -self._tokens / self.rate
+        (self._sleep or time.sleep)(wait)
+        return wait
+
+    def throttled(self):
+        """
+        Records a throttled response and lowers the rate.
+        """
+        with self._lock:
+            self.throttles += 1
+            now = self._clock()
+            if self.rate is None:
+                self._count_send(now, 0)
+                self._last_fill = now
+                self._tokens = 0.0
+                rate = max(self._sent, self._sent_last_second)
+            else:
+                self._fill(now)
+                rate = self.rate
+            self.rate = max(self.min_rate, rate * self.decrease)
+            self._tokens = min(self._tokens, self.rate)
+
+    def succeeded(self):
+        """
+        Records a successful response and raises the rate a little.
+        """
+        with self._lock:
+            if self.rate is None:
+                return
+            self._fill(self._clock())
+            self.rate += self.increase / self.rate
+            if self.max_rate is not None:
+                self.rate = min(self.rate, self.max_rate)
+
+    def _fill(self, now):
+        elapsed = max(0, now - self._last_fill)
+        self._last_fill = now
+        self._tokens = min(max(1.0, self.rate),
+                           self._tokens + elapsed * self.rate)
+
+    def _count_send(self, now, count=1):
+        second = int(now)
+        if second != self._second:
+            if second == self._second + 1:
+                self._sent_last_second = self._sent
+            else:
+                self._sent_last_second = 0
+            self._second = second
+            self._sent = 0
+        self._sent += count
+
+
+class CircuitBreaker(object):
+    """
+    Stops sending requests to an endpoint that keeps failing.
+
+    After failure_threshold consecutive failures the breaker opens,
+    and for the next reset_timeout seconds every request fails
+    immediately with CircuitOpenError.  Once that time has passed one
+    request is let through as a trial: if it succeeds the breaker
+    closes again, if it fails the breaker stays open for another
+    reset_timeout seconds.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30,
+                 clock=time.time):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._trial = False
+
+    def is_open(self):
+        return self.opened_at is not None
+
+    def before_request(self, endpoint=None):
+        """
+        Raises CircuitOpenError if requests should not be sent now.
+        """
+        with self._lock:
+            if self.opened_at is None:
+                return
+            now = self._clock()
+            remaining = self.opened_at + self.reset_timeout - now
+            if remaining > 0:
+                raise CircuitOpenError(
+                    'Not sending request to %s after %d consecutive '
+                    'failures, retry in %.1f seconds' % (
+                        endpoint or 'endpoint', self.failures, remaining))
+            # Let this request through as the trial, and keep failing
+            # the others fast until it has finished.
+            self.opened_at = now
+            self._trial = True
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._trial or self.failures >= self.failure_threshold:
+                self.opened_at = self._clock()
+                self._trial = False
+
+
+_lock = threading.Lock()
+_limiters = {}
+_breakers = {}
+
+
+def get_rate_limiter(endpoint, **kwargs):
+    """
+    Returns the AdaptiveRateLimiter shared by all requests to endpoint,
+    creating it with kwargs the first time.
+    """
+    with _lock:
+        limiter = _limiters.get(endpoint)
+        if limiter is None:
+            limiter = _limiters[endpoint] = AdaptiveRateLimiter(**kwargs)
+        return limiter
+
+
+def get_circuit_breaker(endpoint, **kwargs):
+    """
+    Returns the CircuitBreaker shared by all requests to endpoint,
+    creating it with kwargs the first time.
+    """
+    with _lock:
+        breaker = _breakers.get(endpoint)
+        if breaker is None:
+            breaker = _breakers[endpoint] = CircuitBreaker(**kwargs)
+        return breaker
+
+
+def reset():
+    """
+    Forgets every limiter and breaker.
+    """
+    with _lock:
+        _limiters.clear()
+        _breakers.clear()
@@ -27,6 +27,7 @@ from boto.resultset import ResultSet
 from boto.exception import BotoClientError
 from boto.s3.acl import Policy, CannedACLStrings, Grant
 from boto.s3.key import Key
+from boto.s3.keyentry import KeyEntry
 from boto.s3.prefix import Prefix
 from boto.s3.deletemarker import DeleteMarker
 from boto.s3.multipart import MultiPartUpload
@@ -34,6 +35,7 @@ from boto.s3.multipart import CompleteMultiPartUpload
 from boto.s3.multidelete import MultiDeleteResult
 from boto.s3.multidelete import Error
 from boto.s3.bucketlistresultset import BucketListResultSet
+from boto.s3.bucketlistresultset import ParallelBucketListResultSet
 from boto.s3.bucketlistresultset import VersionedBucketListResultSet
 from boto.s3.bucketlistresultset import MultiPartUploadListResultSet
 from boto.s3.lifecycle import Lifecycle
@@ -48,7 +50,8 @@ import StringIO
 import urllib
 import re
 import base64
-from collections import defaultdict
+import threading
+from collections import defaultdict, deque
 
 # as per http://goo.gl/BDuud (02/19/2011)
 
@@ -163,9 +166,22 @@ class Bucket(object):
             with the stored object in the response.  See
             http://goo.gl/EWOPb for details.
 
+        If the connection has a metadata_cache, lookups made without
+        headers or response_headers are answered from it while the
+        entry is fresh.
+
         :rtype: :class:`boto.s3.key.Key`
         :returns: A Key object from this bucket.
         """
+        cache = None
+        if not headers and not response_headers:
+            cache = getattr(self.connection, 'metadata_cache', None)
+        if cache is not None:
+            hit, k = cache.get(self.name, key_name, version_id)
+            if hit:
+                if k is not None:
+                    k.bucket = self
+                return k
         query_args = []
         if version_id:
             query_args.append('versionId=%s' % version_id)
@@ -205,15 +221,20 @@ class Bucket(object):
             k.name = key_name
             k.handle_version_headers(response)
             k.handle_encryption_headers(response)
+            if cache is not None:
+                cache.put(self.name, key_name, k, version_id)
             return k
         else:
             if response.status == 404:
+                if cache is not None:
+                    cache.put(self.name, key_name, None, version_id)
                 return None
             else:
                 raise self.connection.provider.storage_response_error(
                     response.status, response.reason, '')
 
-    def list(self, prefix='', delimiter='', marker='', headers=None):
+    def list(self, prefix='', delimiter='', marker='', headers=None,
+             parallel=False, split_points=None, ordered=True, compact=False):
         """
         List key objects within a bucket.  This returns an instance of an
         BucketListResultSet that automatically handles all of the result
@@ -247,10 +268,37 @@ class Bucket(object):
         :type marker: string
         :param marker: The "marker" of where you are in the result set
 
+        :type parallel: bool
+        :param parallel: If True, the key space is split into shards
+            that are listed concurrently, which is much faster for
+            large buckets.  See
+            :func:`boto.s3.bucketlistresultset.parallel_bucket_lister`.
+
+        :type split_points: list
+        :param split_points: (optional) For a parallel listing, the key
+            names to split the key space at.  By default they are found
+            by probing the bucket with '/' delimited listings.
+
+        :type ordered: bool
+        :param ordered: For a parallel listing, whether keys are yielded
+            in key order (the default) or as soon as they arrive.
+
+        :type compact: bool
+        :param compact: If True, keys are returned as
+            :class:`boto.s3.keyentry.KeyEntry` objects, which take much
+            less memory than Keys and can be turned into one with
+            to_key.
+
         :rtype: :class:`boto.s3.bucketlistresultset.BucketListResultSet`
         :return: an instance of a BucketListResultSet that handles paging, etc
         """
-        return BucketListResultSet(self, prefix, delimiter, marker, headers)
+        if parallel:
+            return ParallelBucketListResultSet(self, prefix, delimiter,
+                                               marker, headers,
+                                               split_points, ordered,
+                                               compact=compact)
+        return BucketListResultSet(self, prefix, delimiter, marker, headers,
+                                   compact)
 
     def list_versions(self, prefix='', delimiter='', key_marker='',
                       version_id_marker='', headers=None):
@@ -322,12 +370,18 @@ class Bucket(object):
         response = self.connection.make_request('GET', self.name,
                                                 headers=headers,
                                                 query_args=s)
+        if response.status == 200 and \
+                self.connection.should_stream_response(response):
+            rs = ResultSet(element_map)
+            h = handler.XmlHandler(rs, self)
+            if handler.parse_stream(response, h):
+                return rs
         body = response.read()
         boto.log.debug(body)
         if response.status == 200:
             rs = ResultSet(element_map)
             h = handler.XmlHandler(rs, self)
-            xml.sax.parseString(body, h)
+            handler.parse_string(body, h)
             return rs
         else:
             raise self.connection.provider.storage_response_error(
@@ -366,6 +420,18 @@ class Bucket(object):
                               ('CommonPrefixes', Prefix)],
                              '', headers, **params)
 
+    def get_all_key_entries(self, headers=None, **params):
+        """
+        Like get_all_keys, but the keys are returned as compact
+        :class:`boto.s3.keyentry.KeyEntry` objects.
+
+        :rtype: ResultSet
+        :return: The result from S3 listing the keys requested
+        """
+        return self._get_all([('Contents', KeyEntry),
+                              ('CommonPrefixes', Prefix)],
+                             '', headers, **params)
+
     def get_all_versions(self, headers=None, **params):
         """
         A lower-level, version-aware method for listing contents of a
@@ -495,73 +561,148 @@ class Bucket(object):
 
         :returns: An instance of MultiDeleteResult
         """
-        ikeys = iter(keys)
         result = MultiDeleteResult(self)
-        provider = self.connection.provider
-        query_args = 'delete'
-
-        def delete_keys2(hdrs):
-            hdrs = hdrs or {}
-            data = u"""<?xml version="1.0" encoding="UTF-8"?>"""
-            data += u"<Delete>"
-            if quiet:
-                data += u"<Quiet>true</Quiet>"
-            count = 0
-            while count < 1000:
+        for batch, errors in self._delete_batches(keys):
+            result.errors.extend(errors)
+            self._delete_batch(batch, quiet, mfa_token, headers, result)
+        return result
+
+    def delete_keys_in_batches(self, keys, quiet=False, mfa_token=None,
+                               headers=None, max_workers=None):
+        """
+        Like delete_keys, but several Multi-object delete requests are
+        kept in flight at once, and a MultiDeleteResult is yielded for
+        each batch of up to 1000 keys as it completes, in order.  keys
+        is only read as fast as the batches are sent, so it can be a
+        generator such as the result of :meth:`list`, and neither the
+        keys nor the results are held on to.
+
+        For example, to empty a bucket::
+
+            for result in bucket.delete_keys_in_batches(bucket.list()):
+                print len(result.deleted), len(result.errors)
+
+        :type max_workers: int
+        :param max_workers: (optional) How many requests to keep in
+            flight.  Defaults to the connection's
+            max_concurrent_requests.
+
+        The other parameters are as for delete_keys.  If a request
+        fails its exception is raised and no more batches are sent.
+
+        :returns: A generator of MultiDeleteResult instances
+        """
+        import boto.executor
+        if max_workers is None:
+            max_workers = boto.config.getint(
+                'Boto', 'max_concurrent_requests',
+                self.connection.max_concurrent_requests)
+        failed = threading.Event()
+
+        def delete_batch(batch, errors):
+            result = MultiDeleteResult(self)
+            result.errors.extend(errors)
+            if not failed.isSet():
                 try:
-                    key = ikeys.next()
-                except StopIteration:
-                    break
-                if isinstance(key, basestring):
-                    key_name = key
-                    version_id = None
-                elif isinstance(key, tuple) and len(key) == 2:
-                    key_name, version_id = key
-                elif (isinstance(key, Key) or isinstance(key, DeleteMarker)) and key.name:
+                    self._delete_batch(batch, quiet, mfa_token, headers,
+                                       result)
+                except:
+                    failed.set()
+                    raise
+            return result
+
+        executor = boto.executor.Executor(max_workers)
+        pending = deque()
+        try:
+            for batch, errors in self._delete_batches(keys):
+                pending.append(executor.submit(delete_batch, batch, errors))
+                # Keep a couple of batches per worker in flight.
+                if len(pending) >= 2 * max_workers:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+        finally:
+            failed.set()
+            executor.shutdown()
+
+    def _delete_batches(self, keys):
+        # Yields ([(key_name, version_id), ...], [Error, ...]) batches
+        # of up to 1000 keys to delete, along with Errors for anything
+        # in keys that can't be deleted.
+        batch = []
+        errors = []
+        for key in keys:
+            if isinstance(key, basestring):
+                key_name = key
+                version_id = None
+            elif isinstance(key, tuple) and len(key) == 2:
+                key_name, version_id = key
+            elif (isinstance(key, Key) or isinstance(key, DeleteMarker)) and key.name:
+                key_name = key.name
+                version_id = key.version_id
+            elif isinstance(key, KeyEntry) and key.name:
+                key_name = key.name
+                version_id = None
+            else:
+                if isinstance(key, Prefix):
                     key_name = key.name
-                    version_id = key.version_id
+                    code = 'PrefixSkipped'   # Don't delete Prefix
                 else:
-                    if isinstance(key, Prefix):
-                        key_name = key.name
-                        code = 'PrefixSkipped'   # Don't delete Prefix
-                    else:
-                        key_name = repr(key)   # try get a string
-                        code = 'InvalidArgument'  # other unknown type
-                    message = 'Invalid. No delete action taken for this object.'
-                    error = Error(key_name, code=code, message=message)
-                    result.errors.append(error)
-                    continue
-                count += 1
-                data += u"<Object><Key>%s</Key>" % xml.sax.saxutils.escape(key_name)
-                if version_id:
-                    data += u"<VersionId>%s</VersionId>" % version_id
-                data += u"</Object>"
-            data += u"</Delete>"
-            if count <= 0:
-                return False  # no more
-            data = data.encode('utf-8')
-            fp = StringIO.StringIO(data)
-            md5 = boto.utils.compute_md5(fp)
-            hdrs['Content-MD5'] = md5[1]
-            hdrs['Content-Type'] = 'text/xml'
-            if mfa_token:
-                hdrs[provider.mfa_header] = ' '.join(mfa_token)
+                    key_name = repr(key)   # try get a string
+                    code = 'InvalidArgument'  # other unknown type
+                message = 'Invalid. No delete action taken for this object.'
+                errors.append(Error(key_name, code=code, message=message))
+                continue
+            batch.append((key_name, version_id))
+            if len(batch) == 1000:
+                yield batch, errors
+                batch = []
+                errors = []
+        if batch or errors:
+            yield batch, errors
+
+    def _delete_batch(self, batch, quiet, mfa_token, headers, result):
+        # Sends one Multi-object delete request, adding what S3 returns
+        # to result.
+        if not batch:
+            return
+        provider = self.connection.provider
+        hdrs = headers and headers.copy() or {}
+        data = u"""<?xml version="1.0" encoding="UTF-8"?>"""
+        data += u"<Delete>"
+        if quiet:
+            data += u"<Quiet>true</Quiet>"
+        for key_name, version_id in batch:
+            data += u"<Object><Key>%s</Key>" % xml.sax.saxutils.escape(key_name)
+            if version_id:
+                data += u"<VersionId>%s</VersionId>" % version_id
+            data += u"</Object>"
+        data += u"</Delete>"
+        data = data.encode('utf-8')
+        fp = StringIO.StringIO(data)
+        md5 = boto.utils.compute_md5(fp)
+        hdrs['Content-MD5'] = md5[1]
+        hdrs['Content-Type'] = 'text/xml'
+        if mfa_token:
+            hdrs[provider.mfa_header] = ' '.join(mfa_token)
+        try:
             response = self.connection.make_request('POST', self.name,
                                                     headers=hdrs,
-                                                    query_args=query_args,
+                                                    query_args='delete',
                                                     data=data)
-            body = response.read()
-            if response.status == 200:
-                h = handler.XmlHandler(result, self)
-                xml.sax.parseString(body, h)
-                return count >= 1000  # more?
-            else:
-                raise provider.storage_response_error(response.status,
-                                                      response.reason,
-                                                      body)
-        while delete_keys2(headers):
-            pass
-        return result
+        finally:
+            cache = getattr(self.connection, 'metadata_cache', None)
+            if cache is not None:
+                for key_name, version_id in batch:
+                    cache.invalidate(self.name, key_name)
+        body = response.read()
+        if response.status == 200:
+            h = handler.XmlHandler(result, self)
+            xml.sax.parseString(body, h)
+        else:
+            raise provider.storage_response_error(response.status,
+                                                  response.reason,
+                                                  body)
 
     def delete_key(self, key_name, headers=None,
                    version_id=None, mfa_token=None):
@@ -614,7 +755,8 @@ class Bucket(object):
     def copy_key(self, new_key_name, src_bucket_name,
                  src_key_name, metadata=None, src_version_id=None,
                  storage_class='STANDARD', preserve_acl=False,
-                 encrypt_key=False, headers=None, query_args=None):
+                 encrypt_key=False, headers=None, query_args=None,
+                 parallel=False, part_size=None):
         """
         Create a new key in the bucket by copying another existing key.
 
@@ -665,9 +807,29 @@ class Bucket(object):
         :param query_args: A string of additional querystring arguments
             to append to the request
 
+        :type parallel: bool
+        :param parallel: If True and the source is larger than one
+            part, it is copied as a multipart upload whose parts are
+            copied concurrently.  This is much faster for large keys,
+            and the only way to copy keys over 5 GB.  The source's
+            metadata and content headers are carried over unless
+            metadata is given, as with a single copy.
+
+        :type part_size: int
+        :param part_size: (optional) The part size for a parallel copy.
+            By default one is picked from the size of the source.
+
         :rtype: :class:`boto.s3.key.Key` or subclass
         :returns: An instance of the newly created key object
         """
+        if parallel and not query_args:
+            key = self._copy_key_in_parts(new_key_name, src_bucket_name,
+                                          src_key_name, metadata,
+                                          src_version_id, storage_class,
+                                          preserve_acl, encrypt_key,
+                                          headers, part_size)
+            if key is not None:
+                return key
         headers = headers or {}
         provider = self.connection.provider
         src_key_name = boto.utils.get_utf8_value(src_key_name)
@@ -709,6 +871,75 @@ class Bucket(object):
             raise provider.storage_response_error(response.status,
                                                   response.reason, body)
 
+    def _copy_key_in_parts(self, new_key_name, src_bucket_name,
+                           src_key_name, metadata, src_version_id,
+                           storage_class, preserve_acl, encrypt_key,
+                           headers, part_size):
+        # Returns None if the source fits in one part, leaving it to
+        # copy_key to do a single copy.
+        from boto.s3.multipart import choose_part_size
+        provider = self.connection.provider
+        if self.name == src_bucket_name:
+            src_bucket = self
+        else:
+            src_bucket = self.connection.get_bucket(src_bucket_name,
+                                                    validate=False)
+        src_key = src_bucket.get_key(src_key_name, version_id=src_version_id)
+        if src_key is None:
+            raise provider.storage_response_error(404, 'Not Found', '')
+        part_size = choose_part_size(src_key.size, part_size)
+        if src_key.size <= part_size:
+            return None
+        headers = headers and headers.copy() or {}
+        if metadata is None:
+            # Do what a single copy's COPY directive would.
+            metadata = src_key.metadata
+            for header, value in (('Content-Type', src_key.content_type),
+                                  ('Content-Encoding',
+                                   src_key.content_encoding),
+                                  ('Content-Disposition',
+                                   src_key.content_disposition),
+                                  ('Content-Language',
+                                   src_key.content_language),
+                                  ('Cache-Control', src_key.cache_control)):
+                if value and header not in headers:
+                    headers[header] = value
+        if provider.storage_class_header and storage_class:
+            headers[provider.storage_class_header] = storage_class
+        if preserve_acl:
+            acl = src_bucket.get_xml_acl(src_key_name,
+                                         version_id=src_version_id)
+        # Copy the same object into every part, even if the source is
+        # overwritten meanwhile.
+        part_headers = {}
+        if src_key.version_id and not src_version_id:
+            src_version_id = src_key.version_id
+        elif src_key.etag:
+            part_headers[provider.copy_source_header + '-if-match'] = \
+                src_key.etag
+        mp = self.initiate_multipart_upload(new_key_name, headers=headers,
+                                            metadata=metadata,
+                                            encrypt_key=encrypt_key)
+        try:
+            mp.copy_parts_from_key(src_bucket_name, src_key_name,
+                                   src_key.size, part_size=part_size,
+                                   src_version_id=src_version_id,
+                                   headers=part_headers)
+            completed = mp.complete_upload()
+        except:
+            try:
+                mp.cancel_upload()
+            except Exception:
+                boto.log.exception('Error cancelling upload %s', mp.id)
+            raise
+        if preserve_acl:
+            self.set_xml_acl(acl, new_key_name)
+        key = self.new_key(new_key_name)
+        key.size = src_key.size
+        key.etag = completed.etag
+        key.version_id = completed.version_id
+        return key
+
     def set_canned_acl(self, acl_str, key_name='', headers=None,
                        version_id=None):
         assert acl_str in CannedACLStrings
@@ -19,15 +19,32 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
 # IN THE SOFTWARE.
 
-def bucket_lister(bucket, prefix='', delimiter='', marker='', headers=None):
+from __future__ import with_statement
+import sys
+import threading
+from Queue import Queue, Full
+
+import boto
+import boto.executor
+from boto.s3.prefix import Prefix
+
+def _get_all_keys(bucket, compact):
+    if compact:
+        return bucket.get_all_key_entries
+    return bucket.get_all_keys
+
+def bucket_lister(bucket, prefix='', delimiter='', marker='', headers=None,
+                  compact=False):
     """
-    A generator function for listing keys in a bucket.
+    A generator function for listing keys in a bucket.  If compact is
+    True, keys are listed as :class:`boto.s3.keyentry.KeyEntry` objects.
     """
+    get_all_keys = _get_all_keys(bucket, compact)
     more_results = True
     k = None
     while more_results:
-        rs = bucket.get_all_keys(prefix=prefix, marker=marker,
-                                 delimiter=delimiter, headers=headers)
+        rs = get_all_keys(prefix=prefix, marker=marker,
+                          delimiter=delimiter, headers=headers)
         for k in rs:
             yield k
         if k:
@@ -43,17 +60,220 @@ class BucketListResultSet:
     keys in a reasonably efficient manner.
     """
 
-    def __init__(self, bucket=None, prefix='', delimiter='', marker='', headers=None):
+    def __init__(self, bucket=None, prefix='', delimiter='', marker='', headers=None,
+                 compact=False):
         self.bucket = bucket
         self.prefix = prefix
         self.delimiter = delimiter
         self.marker = marker
         self.headers = headers
+        self.compact = compact
 
     def __iter__(self):
         return bucket_lister(self.bucket, prefix=self.prefix,
                              delimiter=self.delimiter, marker=self.marker,
-                             headers=self.headers)
+                             headers=self.headers, compact=self.compact)
+
+def _sort_key(name):
+    # S3 lists keys in the byte order of their UTF-8 encoding, which
+    # is what we compare against split points.
+    if isinstance(name, unicode):
+        return name.encode('utf-8')
+    return name
+
+
+def find_split_points(bucket, prefix='', delimiter='/', min_shards=16,
+                      max_depth=3, headers=None):
+    """
+    Probes the key space under prefix with delimiter listings and
+    returns a sorted list of common prefixes to split a listing at.
+    If a level yields fewer than min_shards prefixes, the next level
+    down is probed as well, up to max_depth levels.  Only the first
+    page of each probe is used; keys past it just end up in the last
+    shard, so a poor guess costs speed, never correctness.
+
+    Key names without the delimiter, such as hashed or UUID names,
+    have no common prefixes.  If the probes find fewer than min_shards
+    and there is more than a page of keys, the key space is also split
+    on the characters that follow prefix, guessed from the names of
+    the keys in the first page.
+    """
+    points = set()
+    sample = []
+    truncated = False
+    level = [prefix]
+    depth = 0
+    while level and depth < max_depth:
+        children = []
+        for probe in level:
+            rs = bucket.get_all_keys(prefix=probe, delimiter=delimiter,
+                                     headers=headers)
+            children.extend(p.name for p in rs if isinstance(p, Prefix))
+            if depth == 0:
+                sample = [k.name for k in rs if not isinstance(k, Prefix)]
+                truncated = rs.is_truncated
+        points.update(children)
+        if len(points) >= min_shards:
+            break
+        level = children
+        depth += 1
+    if len(points) < min_shards and truncated:
+        points.update(_character_split_points(prefix, sample, min_shards))
+    return sorted(points, key=_sort_key)
+
+
+def _character_split_points(prefix, names, min_shards):
+    # Takes the ASCII characters used in names after prefix as the
+    # alphabet of the key space, and returns prefix followed by every
+    # string of them just long enough to make min_shards shards.
+    prefix = _sort_key(prefix)
+    alphabet = set()
+    for name in names:
+        alphabet.update(c for c in _sort_key(name)[len(prefix):]
+                        if c < '\x80')
+    alphabet = sorted(alphabet)
+    if len(alphabet) < 2:
+        return []
+    points = [prefix]
+    while len(points) < min_shards:
+        points = [point + c for point in points for c in alphabet]
+    return points
+
+
+def _list_shard(bucket, prefix, delimiter, start, end, headers, stopped,
+                compact=False):
+    # Yields pages of the entries whose names fall in (start, end];
+    # end is None for the last shard.
+    start_key = _sort_key(start)
+    end_key = end is not None and _sort_key(end)
+    get_all_keys = _get_all_keys(bucket, compact)
+    marker = start
+    more_results = True
+    while more_results and not stopped.isSet():
+        rs = get_all_keys(prefix=prefix, marker=marker,
+                          delimiter=delimiter, headers=headers)
+        page = []
+        k = None
+        for k in rs:
+            name = _sort_key(k.name)
+            if end is not None and name > end_key:
+                more_results = False
+                break
+            # A common prefix that straddles the start of the shard
+            # belongs to the shard before.
+            if name > start_key:
+                page.append(k)
+        if page:
+            yield page
+        if k is None:
+            break
+        marker = rs.next_marker or k.name
+        more_results = more_results and rs.is_truncated
+
+
+def parallel_bucket_lister(bucket, prefix='', delimiter='', marker='',
+                           headers=None, split_points=None, ordered=True,
+                           max_workers=None, queue_size=4, compact=False):
+    """
+    A generator function for listing keys in a bucket with several
+    requests in flight.  The key space is cut into shards at
+    split_points (found with find_split_points if not given), which
+    are listed concurrently.  A shard holds the keys greater than one
+    split point and not greater than the next.
+
+    If ordered is True the keys are yielded in the same order as
+    bucket_lister yields them; because the shards are disjoint and
+    sorted, this is a merge that only has to wait on one shard at a
+    time.  Otherwise keys are yielded in whatever order the pages
+    arrive.  Each shard buffers at most queue_size pages ahead of the
+    consumer.  If compact is True, keys are listed as
+    :class:`boto.s3.keyentry.KeyEntry` objects.
+    """
+    if split_points is None:
+        split_points = find_split_points(bucket, prefix, headers=headers)
+    marker_key = _sort_key(marker)
+    bounds = [marker]
+    for point in sorted(set(split_points), key=_sort_key):
+        if _sort_key(point) > marker_key:
+            bounds.append(point)
+    bounds.append(None)
+    shards = zip(bounds[:-1], bounds[1:])
+    if max_workers is None:
+        max_workers = boto.config.getint(
+            'Boto', 'max_concurrent_requests',
+            bucket.connection.max_concurrent_requests)
+    max_workers = max(1, min(max_workers, len(shards)))
+
+    stopped = threading.Event()
+    if ordered:
+        queues = [Queue(queue_size) for shard in shards]
+    else:
+        queues = [Queue(queue_size * max_workers)] * len(shards)
+
+    def put(queue, item):
+        while not stopped.isSet():
+            try:
+                queue.put(item, timeout=0.1)
+                return
+            except Full:
+                pass
+
+    def list_shard(queue, start, end):
+        try:
+            for page in _list_shard(bucket, prefix, delimiter, start, end,
+                                    headers, stopped, compact):
+                put(queue, ('page', page))
+            put(queue, ('done', None))
+        except Exception:
+            put(queue, ('error', sys.exc_info()))
+
+    executor = boto.executor.Executor(max_workers)
+    try:
+        for queue, (start, end) in zip(queues, shards):
+            executor.submit(list_shard, queue, start, end)
+        if ordered:
+            pending = [(queue, 1) for queue in queues]
+        else:
+            pending = [(queues[0], len(shards))]
+        for queue, count in pending:
+            while count:
+                kind, value = queue.get()
+                if kind == 'page':
+                    for k in value:
+                        yield k
+                elif kind == 'done':
+                    count -= 1
+                else:
+                    raise value[0], value[1], value[2]
+    finally:
+        stopped.set()
+        executor.shutdown()
+
+
+class ParallelBucketListResultSet(BucketListResultSet):
+    """
+    A resultset for listing keys within a bucket with several requests
+    in flight.  Uses the parallel_bucket_lister generator function.
+    """
+
+    def __init__(self, bucket=None, prefix='', delimiter='', marker='',
+                 headers=None, split_points=None, ordered=True,
+                 max_workers=None, compact=False):
+        BucketListResultSet.__init__(self, bucket, prefix, delimiter,
+                                     marker, headers, compact)
+        self.split_points = split_points
+        self.ordered = ordered
+        self.max_workers = max_workers
+
+    def __iter__(self):
+        return parallel_bucket_lister(self.bucket, prefix=self.prefix,
+                                      delimiter=self.delimiter,
+                                      marker=self.marker,
+                                      headers=self.headers,
+                                      split_points=self.split_points,
+                                      ordered=self.ordered,
+                                      max_workers=self.max_workers,
+                                      compact=self.compact)
 
 def versioned_bucket_lister(bucket, prefix='', delimiter='',
                             key_marker='', version_id_marker='', headers=None):
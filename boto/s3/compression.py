@@ -0,0 +1,214 @@
+# Copyright (c) 2013 Amazon.com, Inc. or its affiliates.  All Rights Reserved
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish, dis-
+# tribute, sublicense, and/or sell copies of the Software, and to permit
+# persons to whom the Software is furnished to do so, subject to the fol-
+# lowing conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABIL-
+# ITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT
+# SHALL THE AUTHOR BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
+# IN THE SOFTWARE.
+#
+
+"""
+Streaming gzip and deflate (zlib format) codecs for compressing data
+on its way to S3 and decompressing it on its way back.
+
+Data is processed a buffer at a time, so memory use doesn't depend on
+the size of the object.
+"""
+
+import tempfile
+import zlib
+
+from boto.exception import BotoClientError
+
+# The Content-Encoding values understood, and the zlib window bits
+# that select their framing.
+CONTENT_ENCODINGS = {
+    'gzip': 16 + zlib.MAX_WBITS,
+    'deflate': zlib.MAX_WBITS,
+}
+
+DefaultLevel = 6
+BufferSize = 8192
+# Compressed data larger than this is spooled to disk rather than held
+# in memory by compress_to_tempfile.
+SpoolSize = 8 * 1024 * 1024
+
+
+def get_wbits(encoding):
+    try:
+        return CONTENT_ENCODINGS[encoding]
+    except KeyError:
+        raise BotoClientError('Unsupported content encoding: %s' % encoding)
+
+
+class CompressingReader(object):
+    """
+    A read-only, non-seekable file whose contents are the compressed
+    contents of another file.
+
+    :type fp: file
+    :param fp: The file to compress, read from its current position.
+
+    :type encoding: string
+    :param encoding: 'gzip' or 'deflate'.
+
+    :type level: int
+    :param level: The compression level, from 1 (fastest) to 9 (best).
+
+    :type size: int
+    :param size: (optional) The most bytes to read from fp.
+    """
+
+    def __init__(self, fp, encoding='gzip', level=DefaultLevel, size=None):
+        self.fp = fp
+        self.encoding = encoding
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED,
+                                            get_wbits(encoding))
+        self._remaining = size
+        self._buffer = ''
+        self._eof = False
+        self.bytes_read = 0
+
+    def tell(self):
+        raise IOError('CompressingReader is not seekable')
+
+    def read(self, size=-1):
+        while not self._eof and (size < 0 or len(self._buffer) < size):
+            chunk = self._read_chunk()
+            if chunk:
+                self.bytes_read += len(chunk)
+                self._buffer += self._compressor.compress(chunk)
+            else:
+                self._buffer += self._compressor.flush()
+                self._eof = True
+        if size < 0:
+            size = len(self._buffer)
+        data = self._buffer[:size]
+        self._buffer = self._buffer[size:]
+        return data
+
+    def _read_chunk(self):
+        if self._remaining is None:
+            return self.fp.read(BufferSize)
+        chunk = self.fp.read(min(BufferSize, self._remaining))
+        self._remaining -= len(chunk)
+        return chunk
+
+
+def compress_to_tempfile(fp, encoding='gzip', level=DefaultLevel, size=None):
+    """
+    Compresses fp into a temporary file, which is kept in memory until
+    it grows past SpoolSize bytes.  Returns the temporary file, rewound.
+    """
+    reader = CompressingReader(fp, encoding, level, size)
+    spool = tempfile.SpooledTemporaryFile(SpoolSize)
+    data = reader.read(BufferSize)
+    while data:
+        spool.write(data)
+        data = reader.read(BufferSize)
+    spool.seek(0)
+    return spool
+
+
+class Inflater(object):
+    """
+    Incrementally decompresses gzip or deflate data.  Concatenated
+    gzip members, as produced by appending to a .gz file, are all
+    decompressed.
+    """
+
+    def __init__(self, encoding):
+        self._wbits = get_wbits(encoding)
+        self._decompressor = zlib.decompressobj(self._wbits)
+        self._input = ''
+
+    def feed(self, data):
+        self._input += data
+
+    def inflate(self, max_length=BufferSize):
+        """
+        Returns up to max_length bytes decompressed from the data fed
+        so far, or '' once more data is needed.
+        """
+        while self._input:
+            data = self._decompressor.decompress(self._input, max_length)
+            if self._decompressor.unused_data:
+                # The member ended and another one follows.
+                self._input = self._decompressor.unused_data
+                self._decompressor = zlib.decompressobj(self._wbits)
+            else:
+                self._input = self._decompressor.unconsumed_tail
+            if data:
+                return data
+        return ''
+
+    def finish(self):
+        return self._decompressor.flush()
+
+
+class DecompressingReader(object):
+    """
+    A read-only file whose contents are the decompressed contents of
+    another file, such as an HTTP response.
+    """
+
+    def __init__(self, fp, encoding):
+        self.fp = fp
+        self._inflater = Inflater(encoding)
+        self._eof = False
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            parts = []
+            data = self.read(BufferSize)
+            while data:
+                parts.append(data)
+                data = self.read(BufferSize)
+            return ''.join(parts)
+        while True:
+            data = self._inflater.inflate(size)
+            if data or self._eof:
+                return data
+            chunk = self.fp.read(BufferSize)
+            if chunk:
+                self._inflater.feed(chunk)
+            else:
+                self._eof = True
+                return self._inflater.finish()
+
+
+class DecompressingWriter(object):
+    """
+    Decompresses the data written to it and writes the result to fp.
+    close() must be called to write out the end of the data; it
+    doesn't close fp.
+    """
+
+    def __init__(self, fp, encoding):
+        self.fp = fp
+        self._inflater = Inflater(encoding)
+
+    def write(self, data):
+        self._inflater.feed(data)
+        data = self._inflater.inflate()
+        while data:
+            self.fp.write(data)
+            data = self._inflater.inflate()
+
+    def close(self):
+        data = self._inflater.finish()
+        if data:
+            self.fp.write(data)
@@ -28,10 +28,12 @@ import base64
 import time
 
 import boto.utils
+from boto.auth import HmacAuthV1Handler
 from boto.connection import AWSAuthConnection
 from boto import handler
 from boto.s3.bucket import Bucket
 from boto.s3.key import Key
+from boto.s3.metadatacache import KeyMetadataCache
 from boto.resultset import ResultSet
 from boto.exception import BotoClientError, S3ResponseError
 
@@ -169,6 +171,15 @@ class S3Connection(AWSAuthConnection):
                 path=path, provider=provider, security_token=security_token,
                 suppress_consec_slashes=suppress_consec_slashes,
                 validate_certs=validate_certs)
+        # Bucket.get_key answers repeated lookups from here when the
+        # cache is enabled; see KeyMetadataCache.
+        self.metadata_cache = None
+        cache_size = boto.config.getint('Boto', 'metadata_cache_size', 0)
+        if cache_size > 0:
+            self.metadata_cache = KeyMetadataCache(
+                cache_size,
+                boto.config.getint('Boto', 'metadata_cache_ttl', 60),
+                boto.config.getint('Boto', 'metadata_cache_negative_ttl', 0))
 
     def _required_auth_capability(self):
         if self.anon:
@@ -372,6 +383,99 @@ class S3Connection(AWSAuthConnection):
                                                   self.server_name(port),
                                                   bucket, key) + query_part
 
+    def generate_urls(self, keys, method='GET', force_http=False,
+                      expires_in_absolute=False):
+        """
+        Generate query-authenticated URLs for many keys at once.
+
+        The result is the same as calling generate_url for each key,
+        but the parts shared by every URL are only worked out once: the
+        HMAC is prepared from the secret key a single time and copied
+        for each signature, and the host and path prefixes are built
+        once per bucket.
+
+        :type keys: iterable
+        :param keys: (bucket_name, key_name, expires_in) tuples.
+
+        :type method: string
+        :param method: The HTTP method the URLs are for (default GET).
+
+        :type force_http: bool
+        :param force_http: If True, http will be used instead of https.
+
+        :type expires_in_absolute: bool
+        :param expires_in_absolute: If True, each expires_in is the time
+            the URL expires, in seconds since the epoch, rather than how
+            long the URL is valid for.
+
+        :rtype: list
+        :return: The URLs, in the order of keys.
+        """
+        if not isinstance(self._auth_handler, HmacAuthV1Handler):
+            return [self.generate_url(expires_in, method, bucket, key,
+                                      force_http=force_http,
+                                      expires_in_absolute=expires_in_absolute)
+                    for bucket, key, expires_in in keys]
+        if force_http:
+            protocol = 'http'
+            port = 80
+        else:
+            protocol = self.protocol
+            port = self.port
+        server = self.server_name(port)
+        # Sign every URL with one snapshot of the credentials, so a
+        # refresh can't mix old and new ones.
+        access_key, secret_key, security_token = \
+            self.provider.get_current_credentials()
+        headers = {}
+        query_suffix = ''
+        if security_token:
+            headers['x-amz-security-token'] = security_token
+            if 'x-amz-security-token'.startswith(self.provider.header_prefix):
+                query_suffix = '&x-amz-security-token=%s' % urllib.quote(
+                    security_token)
+        # With no Content-MD5, Content-Type or Date to sign, the string
+        # to sign is the method, two empty lines, the expiry time, any
+        # provider headers and the resource.
+        signed_headers = boto.utils.canonical_string(
+            method, '', headers, None, self.provider).split('\n', 3)[3]
+        sign_format = method + '\n\n\n%d\n' + signed_headers + '%s'
+        query_string = '?' + self.QueryString
+        prepared_hmac = self._auth_handler._get_hmac(secret_key)
+        quote = urllib.quote
+        b64encode = base64.b64encode
+        time_now = time.time
+        prefixes = {}
+        urls = []
+        for bucket, key, expires_in in keys:
+            quoted_key = quote(boto.utils.get_utf8_value(key))
+            if (not quoted_key or quoted_key.startswith('/') or
+                    '//' in quoted_key):
+                # get_path would rewrite slashes in the key itself.
+                urls.append(self.generate_url(
+                    expires_in, method, bucket, key, force_http=force_http,
+                    expires_in_absolute=expires_in_absolute))
+                continue
+            if bucket in prefixes:
+                auth_prefix, url_prefix = prefixes[bucket]
+            else:
+                auth_prefix = self.get_path(
+                    self.calling_format.build_auth_path(bucket))
+                url_prefix = self.calling_format.build_url_base(
+                    self, protocol, server, bucket)
+                prefixes[bucket] = (auth_prefix, url_prefix)
+            if expires_in_absolute:
+                expires = int(expires_in)
+            else:
+                expires = int(time_now() + expires_in)
+            signer = prepared_hmac.copy()
+            signer.update(sign_format % (expires, auth_prefix + quoted_key))
+            signature = quote(b64encode(signer.digest()), safe='')
+            urls.append(url_prefix + quoted_key +
+                        query_string % (signature, expires, access_key) +
+                        query_suffix)
+        return urls
+
     def get_all_buckets(self, headers=None):
         response = self.make_request('GET', headers=headers)
         body = response.read()
@@ -479,6 +583,16 @@ class S3Connection(AWSAuthConnection):
             boto.log.debug('path=%s' % path)
             auth_path += '?' + query_args
             boto.log.debug('auth_path=%s' % auth_path)
-        return AWSAuthConnection.make_request(self, method, path, headers,
-                data, host, auth_path, sender,
-                override_num_retries=override_num_retries)
+        try:
+            return AWSAuthConnection.make_request(self, method, path, headers,
+                    data, host, auth_path, sender,
+                    override_num_retries=override_num_retries)
+        finally:
+            # Drop cached metadata for anything this request may have
+            # changed, whether or not it succeeded.
+            cache = getattr(self, 'metadata_cache', None)
+            if cache is not None and method not in ('GET', 'HEAD'):
+                if key:
+                    cache.invalidate(bucket, key)
+                elif method == 'DELETE':
+                    cache.invalidate(bucket)
@@ -28,10 +28,14 @@ import rfc822
 import StringIO
 import base64
 import math
+import threading
+import time
 import urllib
+from collections import deque
 import boto.utils
 from boto.exception import BotoClientError
 from boto.provider import Provider
+from boto.s3 import compression
 from boto.s3.user import User
 from boto import UserAgent
 from boto.utils import compute_md5
@@ -156,7 +160,8 @@ class Key(object):
             self.delete_marker = False
 
     def open_read(self, headers=None, query_args='',
-                  override_num_retries=None, response_headers=None):
+                  override_num_retries=None, response_headers=None,
+                  decompress=False):
         """
         Open this key for reading
 
@@ -176,6 +181,10 @@ class Key(object):
             headers/values that will override any headers associated
             with the stored object in the response.  See
             http://goo.gl/EWOPb for details.
+
+        :type decompress: bool
+        :param decompress: If True and the object's Content-Encoding is
+            gzip or deflate, read and next return the decompressed data.
         """
         if self.resp == None:
             self.mode = 'r'
@@ -218,6 +227,10 @@ class Key(object):
                     self.content_disposition = value
             self.handle_version_headers(self.resp)
             self.handle_encryption_headers(self.resp)
+            encoding = self.resp.getheader('content-encoding')
+            if decompress and encoding in compression.CONTENT_ENCODINGS:
+                self._decompressor = compression.DecompressingReader(
+                    self.resp, encoding)
 
     def open_write(self, headers=None, override_num_retries=None):
         """
@@ -234,11 +247,12 @@ class Key(object):
         raise BotoClientError('Not Implemented')
 
     def open(self, mode='r', headers=None, query_args=None,
-             override_num_retries=None):
+             override_num_retries=None, decompress=False):
         if mode == 'r':
             self.mode = 'r'
             self.open_read(headers=headers, query_args=query_args,
-                           override_num_retries=override_num_retries)
+                           override_num_retries=override_num_retries,
+                           decompress=decompress)
         elif mode == 'w':
             self.mode = 'w'
             self.open_write(headers=headers,
@@ -247,11 +261,14 @@ class Key(object):
             raise BotoClientError('Invalid mode: %s' % mode)
 
     closed = False
+    # Set by open_read when the data it returns is being decompressed.
+    _decompressor = None
 
     def close(self):
         if self.resp:
             self.resp.read()
         self.resp = None
+        self._decompressor = None
         self.mode = None
         self.closed = True
 
@@ -266,7 +283,7 @@ class Key(object):
         All of the HTTP connection stuff is handled for you.
         """
         self.open_read()
-        data = self.resp.read(self.BufferSize)
+        data = (self._decompressor or self.resp).read(self.BufferSize)
         if not data:
             self.close()
             raise StopIteration
@@ -274,10 +291,11 @@ class Key(object):
 
     def read(self, size=0):
         self.open_read()
+        reader = self._decompressor or self.resp
         if size == 0:
-            data = self.resp.read()
+            data = reader.read()
         else:
-            data = self.resp.read(size)
+            data = reader.read(size)
         if not data:
             self.close()
         return data
@@ -320,7 +338,8 @@ class Key(object):
 
     def copy(self, dst_bucket, dst_key, metadata=None,
              reduced_redundancy=False, preserve_acl=False,
-             encrypt_key=False, validate_dst_bucket=True):
+             encrypt_key=False, validate_dst_bucket=True, parallel=False,
+             part_size=None):
         """
         Copy this Key to another bucket.
 
@@ -362,6 +381,14 @@ class Key(object):
         :param validate_dst_bucket: If True, will validate the dst_bucket
             by using an extra list request.
 
+        :type parallel: bool
+        :param parallel: If True, a large key is copied as a multipart
+            upload whose parts are copied concurrently.  See
+            :meth:`boto.s3.bucket.Bucket.copy_key`.
+
+        :type part_size: int
+        :param part_size: The part size for a parallel copy.
+
         :rtype: :class:`boto.s3.key.Key` or subclass
         :returns: An instance of the newly created key object
         """
@@ -375,7 +402,8 @@ class Key(object):
                                    self.name, metadata,
                                    storage_class=storage_class,
                                    preserve_acl=preserve_acl,
-                                   encrypt_key=encrypt_key)
+                                   encrypt_key=encrypt_key,
+                                   parallel=parallel, part_size=part_size)
 
     def startElement(self, name, attrs, connection):
         if name == 'Owner':
@@ -812,7 +840,8 @@ class Key(object):
     def set_contents_from_stream(self, fp, headers=None, replace=True,
                                  cb=None, num_cb=10, policy=None,
                                  reduced_redundancy=False, query_args=None,
-                                 size=None):
+                                 size=None, compress=None,
+                                 compress_level=compression.DefaultLevel):
         """
         Store an object using the name of the Key object as the key in
         cloud and the contents of the data stream pointed to by 'fp' as
@@ -868,6 +897,14 @@ class Key(object):
             into different ranges to be uploaded. If not specified,
             the default behaviour is to read all bytes from the file
             pointer. Less bytes may be available.
+
+        :type compress: string
+        :param compress: (optional) 'gzip' or 'deflate' to compress the
+            stream as it is sent and store it with that Content-Encoding.
+
+        :type compress_level: int
+        :param compress_level: (optional) The compression level, from 1
+            (fastest) to 9 (smallest).
         """
 
         provider = self.bucket.connection.provider
@@ -890,6 +927,13 @@ class Key(object):
             if provider.storage_class_header:
                 headers[provider.storage_class_header] = self.storage_class
 
+        if compress:
+            headers = headers.copy()
+            headers['Content-Encoding'] = compress
+            fp = compression.CompressingReader(fp, compress, compress_level,
+                                               size)
+            size = None
+
         if self.bucket != None:
             if not replace:
                 if self.bucket.lookup(self.name):
@@ -900,7 +944,11 @@ class Key(object):
     def set_contents_from_file(self, fp, headers=None, replace=True,
                                cb=None, num_cb=10, policy=None, md5=None,
                                reduced_redundancy=False, query_args=None,
-                               encrypt_key=False, size=None, rewind=False):
+                               encrypt_key=False, size=None, rewind=False,
+                               parallel=False, part_size=None,
+                               single_pass=None, tracker_file_name=None,
+                               compress=None,
+                               compress_level=compression.DefaultLevel):
         """
         Store an object in S3 using the name of the Key object as the
         key in S3 and the contents of the file pointed to by 'fp' as the
@@ -973,6 +1021,47 @@ class Key(object):
             it. The default behaviour is False which reads from the
             current position of the file pointer (fp).
 
+        :type parallel: bool
+        :param parallel: (optional) If True and the data is larger than
+            one part, it is uploaded as a multipart upload whose parts
+            are sent several at a time, each retried on its own.  fp
+            must be seekable.  The md5 parameter is ignored, and the
+            key's etag is not the MD5 of its contents.
+
+        :type part_size: int
+        :param part_size: (optional) The part size for a parallel
+            upload.  By default one is picked from the size of the data.
+
+        :type single_pass: bool
+        :param single_pass: (optional) If True and md5 isn't given, the
+            file is read only once: its MD5 is computed while it is
+            sent and checked against the ETag S3 returns, rather than
+            computed beforehand and sent as Content-MD5.  A mismatch
+            still raises an error, but only after S3 has stored the
+            data.  Defaults to the single_pass_upload config option.
+
+        :type tracker_file_name: string
+        :param tracker_file_name: (optional) For a parallel upload, a
+            file in which to journal the upload's progress.  If it
+            describes an unfinished upload of the same data to this
+            key, that upload is resumed and only the missing parts are
+            sent.  A failed upload is left in place to be resumed,
+            rather than cancelled; the file is deleted once the upload
+            completes.
+
+        :type compress: string
+        :param compress: (optional) 'gzip' or 'deflate' to compress the
+            data as it is read and store it with that Content-Encoding.
+            Where the provider supports chunked transfer the compressed
+            data is streamed; otherwise it is first written to a
+            temporary file, which stays in memory while it is small.
+            The md5 parameter is ignored, and the size returned and the
+            key's size and etag are those of the compressed data.
+
+        :type compress_level: int
+        :param compress_level: (optional) The compression level, from 1
+            (fastest) to 9 (smallest).
+
         :rtype: int
         :return: The number of bytes written to the key.
         """
@@ -1009,6 +1098,26 @@ class Key(object):
         if hasattr(fp, 'name'):
             self.path = fp.name
 
+        if compress:
+            return self._set_compressed_contents(
+                fp, headers, replace, cb, num_cb, size, query_args,
+                parallel, part_size, tracker_file_name, compress,
+                compress_level)
+
+        if parallel and self.bucket != None and self.name != None:
+            from boto.s3.multipart import choose_part_size
+            spos = fp.tell()
+            fp.seek(0, os.SEEK_END)
+            total = fp.tell() - spos
+            fp.seek(spos)
+            if size is not None:
+                total = min(size, total)
+            part_size = choose_part_size(total, part_size)
+            if total > part_size:
+                return self._set_contents_in_parts(fp, headers, replace, cb,
+                                                   num_cb, total, part_size,
+                                                   tracker_file_name)
+
         if self.bucket != None:
             if not md5 and provider.supports_chunked_transfer():
                 # defer md5 calculation to on the fly and
@@ -1017,24 +1126,42 @@ class Key(object):
                 self.size = None
             else:
                 chunked_transfer = False
-                if not md5:
-                    # compute_md5() and also set self.size to actual
-                    # size of the bytes read computing the md5.
-                    md5 = self.compute_md5(fp, size)
-                    # adjust size if required
-                    size = self.size
-                elif size:
-                    self.size = size
-                else:
-                    # If md5 is provided, still need to size so
-                    # calculate based on bytes to end of content
+                if single_pass is None:
+                    single_pass = boto.config.getbool(
+                        'Boto', 'single_pass_upload', False)
+                if not md5 and single_pass and self.name != None:
+                    # Don't read the file twice: send_file hashes the
+                    # data as it sends it and checks the result against
+                    # the ETag S3 returns, instead of sending
+                    # Content-MD5 up front.
                     spos = fp.tell()
                     fp.seek(0, os.SEEK_END)
                     self.size = fp.tell() - spos
                     fp.seek(spos)
+                    if size:
+                        self.size = min(size, self.size)
                     size = self.size
-                self.md5 = md5[0]
-                self.base64md5 = md5[1]
+                    self.md5 = None
+                    self.base64md5 = None
+                else:
+                    if not md5:
+                        # compute_md5() and also set self.size to actual
+                        # size of the bytes read computing the md5.
+                        md5 = self.compute_md5(fp, size)
+                        # adjust size if required
+                        size = self.size
+                    elif size:
+                        self.size = size
+                    else:
+                        # If md5 is provided, still need to size so
+                        # calculate based on bytes to end of content
+                        spos = fp.tell()
+                        fp.seek(0, os.SEEK_END)
+                        self.size = fp.tell() - spos
+                        fp.seek(spos)
+                        size = self.size
+                    self.md5 = md5[0]
+                    self.base64md5 = md5[1]
 
             if self.name == None:
                 self.name = self.md5
@@ -1048,10 +1175,87 @@ class Key(object):
             # return number of bytes written.
             return self.size
 
+    def _set_compressed_contents(self, fp, headers, replace, cb, num_cb,
+                                 size, query_args, parallel, part_size,
+                                 tracker_file_name, encoding, level):
+        provider = self.bucket.connection.provider
+        headers = headers.copy()
+        headers['Content-Encoding'] = encoding
+        if 'Content-Type' not in headers and self.path:
+            # Describe the data, not its compressed form.
+            headers['Content-Type'] = (mimetypes.guess_type(self.path)[0] or
+                                       self.DefaultContentType)
+        if (provider.supports_chunked_transfer() and not parallel and
+                self.name):
+            if not replace:
+                if self.bucket.lookup(self.name):
+                    return
+            reader = compression.CompressingReader(fp, encoding, level, size)
+            self.send_file(reader, headers, cb, num_cb, query_args,
+                           chunked_transfer=True)
+            return self.size
+        # Without chunked transfer the length has to be sent up front.
+        spool = compression.compress_to_tempfile(fp, encoding, level, size)
+        path = self.path
+        try:
+            return self.set_contents_from_file(
+                spool, headers, replace, cb, num_cb, query_args=query_args,
+                parallel=parallel, part_size=part_size,
+                tracker_file_name=tracker_file_name)
+        finally:
+            spool.close()
+            self.path = path
+
+    def _set_contents_in_parts(self, fp, headers, replace, cb, num_cb,
+                               size, part_size, tracker_file_name=None):
+        if not replace:
+            if self.bucket.lookup(self.name):
+                return
+        headers = headers.copy()
+        if 'Content-Type' not in headers:
+            if self.path:
+                self.content_type = (mimetypes.guess_type(self.path)[0] or
+                                     self.DefaultContentType)
+            headers['Content-Type'] = self.content_type
+        elif headers['Content-Type'] is None:
+            del headers['Content-Type']
+        mp = tracker = None
+        if tracker_file_name:
+            from boto.s3.multipart import MultiPartUploadTracker
+            tracker = MultiPartUploadTracker(tracker_file_name)
+            mp = tracker.resume(self.bucket, self.name, size, part_size)
+        if mp is None:
+            mp = self.bucket.initiate_multipart_upload(
+                self.name, headers=headers, metadata=self.metadata)
+            if tracker is not None:
+                tracker.start(mp, size, part_size)
+        try:
+            mp.upload_parts_from_file(fp, size, part_size=part_size, cb=cb,
+                                      num_cb=num_cb, tracker=tracker)
+            completed = mp.complete_upload()
+        except:
+            if tracker is None:
+                try:
+                    mp.cancel_upload()
+                except Exception:
+                    boto.log.exception('Error cancelling upload %s', mp.id)
+            raise
+        if tracker is not None:
+            tracker.remove()
+        self.size = size
+        self.etag = completed.etag
+        self.version_id = completed.version_id
+        self.md5 = None
+        self.base64md5 = None
+        return size
+
     def set_contents_from_filename(self, filename, headers=None, replace=True,
                                    cb=None, num_cb=10, policy=None, md5=None,
                                    reduced_redundancy=False,
-                                   encrypt_key=False):
+                                   encrypt_key=False, parallel=False,
+                                   part_size=None, single_pass=None,
+                                   tracker_file_name=None, compress=None,
+                                   compress_level=compression.DefaultLevel):
         """
         Store an object in S3 using the name of the Key object as the
         key in S3 and the contents of the file named by 'filename'.
@@ -1105,17 +1309,47 @@ class Key(object):
             :param encrypt_key: If True, the new copy of the object
             will be encrypted on the server-side by S3 and will be
             stored in an encrypted form while at rest in S3.
+
+        :type parallel: bool
+        :param parallel: If True, a large file is uploaded as a
+            multipart upload whose parts are sent several at a time.
+            See set_contents_from_file.
+
+        :type part_size: int
+        :param part_size: The part size for a parallel upload.
+
+        :type single_pass: bool
+        :param single_pass: If True, the file is read once, hashing it
+            as it is sent.  See set_contents_from_file.
+
+        :type tracker_file_name: string
+        :param tracker_file_name: For a parallel upload, a file to
+            journal it in so it can be resumed.  See
+            set_contents_from_file.
+
+        :type compress: string
+        :param compress: 'gzip' or 'deflate' to store the file
+            compressed.  See set_contents_from_file.
+
+        :type compress_level: int
+        :param compress_level: The compression level, from 1 to 9.
         """
         fp = open(filename, 'rb')
         self.set_contents_from_file(fp, headers, replace, cb, num_cb,
                                     policy, md5, reduced_redundancy,
-                                    encrypt_key=encrypt_key)
+                                    encrypt_key=encrypt_key,
+                                    parallel=parallel, part_size=part_size,
+                                    single_pass=single_pass,
+                                    tracker_file_name=tracker_file_name,
+                                    compress=compress,
+                                    compress_level=compress_level)
         fp.close()
 
     def set_contents_from_string(self, s, headers=None, replace=True,
                                  cb=None, num_cb=10, policy=None, md5=None,
                                  reduced_redundancy=False,
-                                 encrypt_key=False):
+                                 encrypt_key=False, compress=None,
+                                 compress_level=compression.DefaultLevel):
         """
         Store an object in S3 using the name of the Key object as the
         key in S3 and the string 's' as the contents.
@@ -1168,19 +1402,29 @@ class Key(object):
         :param encrypt_key: If True, the new copy of the object will
             be encrypted on the server-side by S3 and will be stored
             in an encrypted form while at rest in S3.
+
+        :type compress: string
+        :param compress: 'gzip' or 'deflate' to store the string
+            compressed.  See set_contents_from_file.
+
+        :type compress_level: int
+        :param compress_level: The compression level, from 1 to 9.
         """
         if isinstance(s, unicode):
             s = s.encode("utf-8")
         fp = StringIO.StringIO(s)
         r = self.set_contents_from_file(fp, headers, replace, cb, num_cb,
                                         policy, md5, reduced_redundancy,
-                                        encrypt_key=encrypt_key)
+                                        encrypt_key=encrypt_key,
+                                        compress=compress,
+                                        compress_level=compress_level)
         fp.close()
         return r
 
     def get_file(self, fp, headers=None, cb=None, num_cb=10,
                  torrent=False, version_id=None, override_num_retries=None,
-                 response_headers=None):
+                 response_headers=None, parallel=False, range_size=None,
+                 decompress=False):
         """
         Retrieves a file from an S3 Key
 
@@ -1216,32 +1460,45 @@ class Key(object):
             headers/values that will override any headers associated
             with the stored object in the response.  See
             http://goo.gl/EWOPb for details.
+
+        :type parallel: bool
+        :param parallel: If True, the object is fetched as several byte
+            ranges at once.  See _get_file_in_ranges.
+
+        :type range_size: int
+        :param range_size: The size of the ranges fetched by a parallel
+            download.
+
+        :type decompress: bool
+        :param decompress: If True and the object's Content-Encoding is
+            gzip or deflate, the decompressed data is written to fp.
+            The key's md5 and size, and the progress reported to cb,
+            are still those of the stored data.  The object is then
+            fetched in a single request even if parallel is True.
         """
         if headers is None:
             headers = {}
+        if parallel and not torrent and not decompress:
+            return self._get_file_in_ranges(fp, headers, cb, num_cb,
+                                            version_id, override_num_retries,
+                                            response_headers, range_size)
         save_debug = self.bucket.connection.debug
         if self.bucket.connection.debug == 1:
             self.bucket.connection.debug = 0
 
-        query_args = []
         if torrent:
-            query_args.append('torrent')
             m = None
         else:
             m = md5()
-        # If a version_id is passed in, use that.  If not, check to see
-        # if the Key object has an explicit version_id and, if so, use that.
-        # Otherwise, don't pass a version_id query param.
-        if version_id is None:
-            version_id = self.version_id
-        if version_id:
-            query_args.append('versionId=%s' % version_id)
-        if response_headers:
-            for key in response_headers:
-                query_args.append('%s=%s' % (key, urllib.quote(response_headers[key])))
-        query_args = '&'.join(query_args)
+        query_args = self._get_query_args(torrent, version_id,
+                                          response_headers)
         self.open('r', headers, query_args=query_args,
                   override_num_retries=override_num_retries)
+        encoding = self.resp.getheader('content-encoding')
+        if decompress and encoding in compression.CONTENT_ENCODINGS:
+            out = compression.DecompressingWriter(fp, encoding)
+        else:
+            out = fp
 
         data_len = 0
         if cb:
@@ -1262,7 +1519,7 @@ class Key(object):
             i = 0
             cb(data_len, cb_size)
         for bytes in self:
-            fp.write(bytes)
+            out.write(bytes)
             data_len += len(bytes)
             if m:
                 m.update(bytes)
@@ -1273,6 +1530,8 @@ class Key(object):
                 if i == cb_count or cb_count == -1:
                     cb(data_len, cb_size)
                     i = 0
+        if out is not fp:
+            out.close()
         if cb and (cb_count <= 1 or i > 0) and data_len > 0:
             cb(data_len, cb_size)
         if m:
@@ -1282,6 +1541,164 @@ class Key(object):
         self.close()
         self.bucket.connection.debug = save_debug
 
+    def _get_query_args(self, torrent, version_id, response_headers):
+        query_args = []
+        if torrent:
+            query_args.append('torrent')
+        # If a version_id is passed in, use that.  If not, check to see
+        # if the Key object has an explicit version_id and, if so, use that.
+        # Otherwise, don't pass a version_id query param.
+        if version_id is None:
+            version_id = self.version_id
+        if version_id:
+            query_args.append('versionId=%s' % version_id)
+        if response_headers:
+            for key in response_headers:
+                query_args.append('%s=%s' % (key, urllib.quote(response_headers[key])))
+        return '&'.join(query_args)
+
+    def _get_file_in_ranges(self, fp, headers, cb, num_cb, version_id,
+                            override_num_retries, response_headers,
+                            range_size, num_retries=2):
+        """
+        Downloads the object (or the part of it in a "bytes=start-" or
+        "bytes=start-end" Range header) as range_size byte ranges,
+        several at a time over the connection's pool.  Every range after
+        the first is requested with If-Match on the first one's ETag, so
+        a download fails rather than mixing versions of an object that
+        changes underneath it.  Each range is retried on its own.
+
+        Ranges are written to fp in order as they arrive, holding at
+        most a few ranges per worker in memory.  fp therefore always
+        holds a complete prefix of the download, which is what
+        ResumableDownloadHandler relies on to resume, and the MD5 of a
+        whole object can be checked against a non-multipart ETag.
+        """
+        from boto.s3.multipart import DEFAULT_PART_SIZE
+        import boto.executor
+        provider = self.bucket.connection.provider
+        range_size = range_size or DEFAULT_PART_SIZE
+        headers = headers.copy()
+        start, end = 0, None
+        if 'Range' in headers:
+            match = re.match(r'bytes=(\d+)-(\d*)$', headers.pop('Range'))
+            if match is None:
+                raise BotoClientError('Parallel downloads only support '
+                                      '"bytes=start-[end]" ranges')
+            start = int(match.group(1))
+            if match.group(2):
+                end = int(match.group(2))
+        query_args = self._get_query_args(False, version_id, response_headers)
+
+        first_end = start + range_size - 1
+        if end is not None:
+            first_end = min(first_end, end)
+        first_headers = headers.copy()
+        first_headers['Range'] = 'bytes=%d-%d' % (start, first_end)
+        try:
+            self.open('r', first_headers, query_args=query_args,
+                      override_num_retries=override_num_retries)
+        except provider.storage_response_error, e:
+            if e.status != 416 or start != 0:
+                raise
+            # An empty object has no byte ranges at all.
+            return self.get_file(fp, headers, cb, num_cb,
+                                 version_id=version_id,
+                                 override_num_retries=override_num_retries,
+                                 response_headers=response_headers)
+        ranged = self.resp.status == 206
+        data = self.resp.read()
+        self.close()
+        if not ranged:
+            # The Range header was ignored and the whole object came
+            # back, so there is nothing left to fetch.
+            data = data[start:]
+            end = start + len(data) - 1
+        elif end is None:
+            end = self.size - 1
+        etag = self.etag
+        if start == 0 and etag and re.match('^"?[0-9a-f]{32}"?$', etag):
+            m = md5()
+        else:
+            m = None
+
+        ranges = [(i, min(i + range_size - 1, end))
+                  for i in range(first_end + 1, end + 1, range_size)]
+        progress = _DownloadProgress(cb, num_cb, self.size, len(ranges) + 1)
+        fp.write(data)
+        if m:
+            m.update(data)
+        progress.update(len(data))
+
+        if ranges:
+            connection = self.bucket.connection
+            max_workers = min(len(ranges), boto.config.getint(
+                'Boto', 'max_concurrent_requests',
+                connection.max_concurrent_requests))
+            range_headers = headers.copy()
+            range_headers['If-Match'] = etag
+            failed = threading.Event()
+            executor = boto.executor.Executor(max_workers)
+            pending = deque()
+            try:
+                for byte_range in ranges:
+                    pending.append(executor.submit(
+                        self._get_range, byte_range, range_headers,
+                        query_args, num_retries, failed))
+                    # Keep a couple of ranges per worker in flight.
+                    if len(pending) >= 2 * max_workers:
+                        self._write_range(fp, pending.popleft(), m, progress)
+                while pending:
+                    self._write_range(fp, pending.popleft(), m, progress)
+            finally:
+                failed.set()
+                executor.shutdown()
+        progress.finish()
+        if m:
+            self.md5 = m.hexdigest()
+            if self.md5 != etag.strip('"'):
+                raise provider.storage_data_error(
+                    'MD5 of downloaded data did not match ETag from S3')
+
+    def _write_range(self, fp, future, m, progress):
+        data = future.result()
+        fp.write(data)
+        if m:
+            m.update(data)
+        progress.update(len(data))
+
+    def _get_range(self, byte_range, headers, query_args, num_retries,
+                   failed):
+        provider = self.bucket.connection.provider
+        headers = headers.copy()
+        headers['Range'] = 'bytes=%d-%d' % byte_range
+        attempt = 0
+        while not failed.isSet():
+            try:
+                response = self.bucket.connection.make_request(
+                    'GET', self.bucket.name, self.name, headers,
+                    query_args=query_args)
+                body = response.read()
+                if response.status != 206:
+                    raise provider.storage_response_error(
+                        response.status, response.reason, body)
+                if len(body) != byte_range[1] - byte_range[0] + 1:
+                    raise provider.storage_data_error(
+                        'Expected %d bytes for range %d-%d, got %d' % (
+                            byte_range[1] - byte_range[0] + 1,
+                            byte_range[0], byte_range[1], len(body)))
+                return body
+            except Exception, e:
+                if (attempt >= num_retries or
+                        (isinstance(e, provider.storage_response_error) and
+                         e.status < 500)):
+                    raise
+            attempt += 1
+            boto.log.debug('Retrying range %d-%d of %s after %s: %s',
+                           byte_range[0], byte_range[1], self.name,
+                           e.__class__.__name__, e)
+            time.sleep(2 ** attempt)
+
     def get_torrent_file(self, fp, headers=None, cb=None, num_cb=10):
         """
         Get a torrent file (see to get_file)
@@ -1314,7 +1731,9 @@ class Key(object):
                              torrent=False,
                              version_id=None,
                              res_download_handler=None,
-                             response_headers=None):
+                             response_headers=None,
+                             parallel=False, range_size=None,
+                             decompress=False):
         """
         Retrieve an object from S3 using the name of the Key object as the
         key in S3.  Write the contents of the object to the file pointed
@@ -1354,23 +1773,47 @@ class Key(object):
             headers/values that will override any headers associated
             with the stored object in the response.  See
             http://goo.gl/EWOPb for details.
+
+        :type parallel: bool
+        :param parallel: If True, the object is downloaded as several
+            byte ranges at once, over separate connections.  This also
+            works with a res_download_handler.
+
+        :type range_size: int
+        :param range_size: The size of the byte ranges of a parallel
+            download.  Defaults to 8 MB.
+
+        :type decompress: bool
+        :param decompress: If True, gzip or deflate encoded data is
+            decompressed as it is written to fp.  See get_file.  This
+            doesn't apply to a res_download_handler.
         """
         if self.bucket != None:
             if res_download_handler:
-                res_download_handler.get_file(self, fp, headers, cb, num_cb,
-                                              torrent=torrent,
-                                              version_id=version_id)
+                if parallel:
+                    res_download_handler.get_file(
+                        self, fp, headers, cb, num_cb, torrent=torrent,
+                        version_id=version_id, parallel=parallel,
+                        range_size=range_size)
+                else:
+                    res_download_handler.get_file(self, fp, headers, cb,
+                                                  num_cb, torrent=torrent,
+                                                  version_id=version_id)
             else:
                 self.get_file(fp, headers, cb, num_cb, torrent=torrent,
                               version_id=version_id,
-                              response_headers=response_headers)
+                              response_headers=response_headers,
+                              parallel=parallel, range_size=range_size,
+                              decompress=decompress)
 
     def get_contents_to_filename(self, filename, headers=None,
                                  cb=None, num_cb=10,
                                  torrent=False,
                                  version_id=None,
                                  res_download_handler=None,
-                                 response_headers=None):
+                                 response_headers=None,
+                                 parallel=False, range_size=None,
+                                 decompress=False):
         """
         Retrieve an object from S3 using the name of the Key object as the
         key in S3.  Store contents of the object to a file named by 'filename'.
@@ -1410,12 +1853,27 @@ class Key(object):
             headers/values that will override any headers associated
             with the stored object in the response.  See
             http://goo.gl/EWOPb for details.
+
+        :type parallel: bool
+        :param parallel: If True, the object is downloaded as several
+            byte ranges at once, over separate connections.  This also
+            works with a res_download_handler.
+
+        :type range_size: int
+        :param range_size: The size of the byte ranges of a parallel
+            download.  Defaults to 8 MB.
+
+        :type decompress: bool
+        :param decompress: If True, gzip or deflate encoded data is
+            decompressed as it is written.  See get_file.
         """
         fp = open(filename, 'wb')
         self.get_contents_to_file(fp, headers, cb, num_cb, torrent=torrent,
                                   version_id=version_id,
                                   res_download_handler=res_download_handler,
-                                  response_headers=response_headers)
+                                  response_headers=response_headers,
+                                  parallel=parallel, range_size=range_size,
+                                  decompress=decompress)
         fp.close()
         # if last_modified date was sent from s3, try to set file's timestamp
         if self.last_modified != None:
@@ -1430,7 +1888,7 @@ class Key(object):
                                cb=None, num_cb=10,
                                torrent=False,
                                version_id=None,
-                               response_headers=None):
+                               response_headers=None, decompress=False):
         """
         Retrieve an object from S3 using the name of the Key object as the
         key in S3.  Return the contents of the object as a string.
@@ -1464,13 +1922,18 @@ class Key(object):
             with the stored object in the response.  See
             http://goo.gl/EWOPb for details.
 
+        :type decompress: bool
+        :param decompress: If True, gzip or deflate encoded data is
+            decompressed.  See get_file.
+
         :rtype: string
         :returns: The contents of the file as a string
         """
         fp = StringIO.StringIO()
         self.get_contents_to_file(fp, headers, cb, num_cb, torrent=torrent,
                                   version_id=version_id,
-                                  response_headers=response_headers)
+                                  response_headers=response_headers,
+                                  decompress=decompress)
         return fp.getvalue()
 
     def add_email_grant(self, permission, email_address, headers=None):
@@ -1604,3 +2067,30 @@ class Key(object):
             raise provider.storage_response_error(response.status,
                                                   response.reason,
                                                   response.read())
+
+
+class _DownloadProgress(object):
+    # Calls cb(bytes_downloaded, size) for a parallel download, at most
+    # about num_cb times over its count ranges.
+
+    def __init__(self, cb, num_cb, size, count):
+        self.cb = cb
+        self.size = size
+        self.done = 0
+        self.updates = 0
+        if num_cb < 0:
+            self.every = 1
+        else:
+            self.every = max(1, int(math.ceil(count / max(1.0, num_cb - 1.0))))
+        if cb:
+            cb(0, size)
+
+    def update(self, num_bytes):
+        self.done += num_bytes
+        self.updates += 1
+        if self.cb and self.updates % self.every == 0:
+            self.cb(self.done, self.size)
+
+    def finish(self):
+        if self.cb and self.updates % self.every != 0:
+            self.cb(self.done, self.size)
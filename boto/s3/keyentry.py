@@ -0,0 +1,103 @@
+# Copyright (c) 2013 Amazon.com, Inc. or its affiliates.  All Rights Reserved
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish, dis-
+# tribute, sublicense, and/or sell copies of the Software, and to permit
+# persons to whom the Software is furnished to do so, subject to the fol-
+# lowing conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABIL-
+# ITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT
+# SHALL THE AUTHOR BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
+# IN THE SOFTWARE.
+#
+
+"""
+A compact stand-in for Key in bucket listings, for jobs that hold on
+to millions of listed keys at once.
+"""
+
+from boto.s3.user import User
+
+# Storage classes and owner IDs repeat across a listing; every entry
+# shares one copy of each.
+_shared = {}
+
+
+def _share(value):
+    return _shared.setdefault(value, value)
+
+
+class KeyEntry(object):
+    """
+    One key from a bucket listing: its name, size, etag, last_modified,
+    storage_class and owner_id, and nothing else.  Entries use around a
+    tenth of the memory of the equivalent Key objects.  Use to_key to
+    get a full :class:`boto.s3.key.Key` for one.
+    """
+
+    __slots__ = ('bucket', 'name', 'size', 'etag', 'last_modified',
+                 'storage_class', 'owner_id')
+
+    def __init__(self, bucket=None, name=None):
+        self.bucket = bucket
+        self.name = name
+        self.size = None
+        self.etag = None
+        self.last_modified = None
+        self.storage_class = 'STANDARD'
+        self.owner_id = None
+
+    def __repr__(self):
+        if self.bucket:
+            return '<KeyEntry: %s,%s>' % (self.bucket.name, self.name)
+        else:
+            return '<KeyEntry: None,%s>' % self.name
+
+    @property
+    def key(self):
+        return self.name
+
+    def startElement(self, name, attrs, connection):
+        # The Owner's ID and DisplayName end up in our endElement.
+        return None
+
+    def endElement(self, name, value, connection):
+        if name == 'Key':
+            self.name = value
+        elif name == 'Size':
+            self.size = int(value)
+        elif name == 'ETag':
+            self.etag = str(value)
+        elif name == 'LastModified':
+            self.last_modified = str(value)
+        elif name == 'StorageClass':
+            self.storage_class = _share(value)
+        elif name == 'ID':
+            self.owner_id = _share(value)
+
+    def to_key(self):
+        """
+        Returns a :class:`boto.s3.key.Key` (or the bucket's key_class)
+        with everything the listing said about this key.
+        """
+        if self.bucket is not None:
+            key = self.bucket.new_key(self.name)
+        else:
+            from boto.s3.key import Key
+            key = Key(None, self.name)
+        key.size = self.size
+        key.etag = self.etag
+        key.last_modified = self.last_modified
+        key.storage_class = self.storage_class
+        if self.owner_id is not None:
+            key.owner = User(id=self.owner_id)
+        return key
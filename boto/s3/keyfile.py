@@ -0,0 +1,242 @@
+# Copyright (c) 2013 Amazon.com, Inc. or its affiliates.  All Rights Reserved
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish, dis-
+# tribute, sublicense, and/or sell copies of the Software, and to permit
+# persons to whom the Software is furnished to do so, subject to the fol-
+# lowing conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABIL-
+# ITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT
+# SHALL THE AUTHOR BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
+# IN THE SOFTWARE.
+#
+
+"""
+A read-only, seekable file object over an S3 key, for readers that
+jump around, such as zipfile and tarfile or Parquet footer parsers.
+"""
+
+from __future__ import with_statement
+import errno
+import os
+import threading
+
+import boto
+import boto.executor
+from boto.utils import LRUCache
+
+DEFAULT_BLOCK_SIZE = 256 * 1024
+
+
+class KeyFile(object):
+    """
+    Reads a key through Range GETs of block_size bytes, keeping the
+    last cache_blocks blocks.  While reads are sequential the number of
+    blocks fetched ahead of the current one doubles with each block, up
+    to max_read_ahead; a seek elsewhere resets it.  Without prefetch
+    the read-ahead blocks are fetched in the same request as the block
+    being read; with prefetch=True they are fetched one block per
+    request on background threads, so a sequential reader rarely waits.
+
+    Every request carries If-Match with the key's ETag, so if the
+    object changes while it is being read the next fetch fails instead
+    of mixing old and new data.
+
+    Like a regular file, a KeyFile shouldn't be used from several
+    threads at once.
+    """
+
+    def __init__(self, key, block_size=DEFAULT_BLOCK_SIZE, cache_blocks=64,
+                 max_read_ahead=16, prefetch=False, headers=None,
+                 num_retries=2):
+        if key.size is None or not key.etag:
+            found = key.bucket.get_key(key.name, headers=headers,
+                                       version_id=key.version_id)
+            if found is None:
+                provider = key.bucket.connection.provider
+                raise provider.storage_response_error(404, 'Not Found', '')
+            key.size = found.size
+            key.etag = found.etag
+        self.key = key
+        self.name = key.name
+        self.size = key.size
+        self.block_size = block_size
+        self.max_read_ahead = max_read_ahead
+        self.prefetch = prefetch
+        self.num_retries = num_retries
+        self.headers = headers and headers.copy() or {}
+        self.headers['If-Match'] = key.etag
+        self.query_args = None
+        if key.version_id:
+            self.query_args = 'versionId=%s' % key.version_id
+        self.requests = 0
+        self.hits = 0
+        self.misses = 0
+        self._num_blocks = (self.size + block_size - 1) // block_size
+        self._blocks = LRUCache(max(cache_blocks, max_read_ahead + 1))
+        self._pending = {}
+        self._executor = None
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._pos = 0
+        self._last_block = None
+        self._read_ahead = 0
+
+    def __repr__(self):
+        return '<KeyFile: %s,%s>' % (self.key.bucket.name, self.name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __iter__(self):
+        return self
+
+    def next(self):
+        data = self.read(self.block_size)
+        if not data:
+            raise StopIteration
+        return data
+
+    @property
+    def closed(self):
+        return self._stopped.isSet()
+
+    def close(self):
+        self._stopped.set()
+        self._pending.clear()
+        self._blocks.clear()
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def writable(self):
+        return False
+
+    def tell(self):
+        self._check_open()
+        return self._pos
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        self._check_open()
+        if whence == os.SEEK_CUR:
+            offset += self._pos
+        elif whence == os.SEEK_END:
+            offset += self.size
+        elif whence != os.SEEK_SET:
+            raise IOError(errno.EINVAL, 'Invalid whence (%r)' % whence)
+        if offset < 0:
+            raise IOError(errno.EINVAL, 'Invalid argument')
+        self._pos = offset
+
+    def read(self, size=-1):
+        self._check_open()
+        remaining = max(0, self.size - self._pos)
+        if size is None or size < 0 or size > remaining:
+            size = remaining
+        chunks = []
+        while size > 0:
+            index, offset = divmod(self._pos, self.block_size)
+            chunk = self._get_block(index)[offset:offset + size]
+            chunks.append(chunk)
+            self._pos += len(chunk)
+            size -= len(chunk)
+        return ''.join(chunks)
+
+    def readinto(self, b):
+        data = self.read(len(b))
+        b[:len(data)] = data
+        return len(data)
+
+    def _check_open(self):
+        if self._stopped.isSet():
+            raise ValueError('I/O operation on closed file')
+
+    def _get_block(self, index):
+        data = self._blocks.get(index)
+        if data is not None:
+            self.hits += 1
+        else:
+            self.misses += 1
+            future = self._pending.pop(index, None)
+            if future is not None:
+                data = future.result()[0]
+            else:
+                blocks = self._fetch(index, self._read_ahead_end(index))
+                for i, block in enumerate(blocks[1:]):
+                    self._blocks[index + 1 + i] = block
+                data = blocks[0]
+            self._blocks[index] = data
+        self._track_read_ahead(index)
+        if self.prefetch:
+            self._schedule_prefetch(index)
+        return data
+
+    def _track_read_ahead(self, index):
+        if self._last_block is not None and index == self._last_block + 1:
+            self._read_ahead = min(max(1, self._read_ahead * 2),
+                                   self.max_read_ahead)
+        elif index != self._last_block:
+            self._read_ahead = 0
+        self._last_block = index
+
+    def _read_ahead_end(self, index):
+        # The last block to fetch along with index, when fetching
+        # synchronously: as many as the read-ahead allows, stopping
+        # short of blocks we already have.
+        if self.prefetch:
+            return index
+        last = index
+        while (last < index + self._read_ahead and
+               last + 1 < self._num_blocks and
+               last + 1 not in self._blocks):
+            last += 1
+        return last
+
+    def _schedule_prefetch(self, index):
+        wanted = range(index + 1, min(index + 1 + self._read_ahead,
+                                      self._num_blocks))
+        for i in self._pending.keys():
+            if i not in wanted:
+                # We've moved on; let the fetch finish unheeded.
+                del self._pending[i]
+        if self._executor is None and wanted:
+            connection = self.key.bucket.connection
+            self._executor = boto.executor.Executor(
+                min(self.max_read_ahead, boto.config.getint(
+                    'Boto', 'max_concurrent_requests',
+                    connection.max_concurrent_requests)))
+        for i in wanted:
+            if i not in self._pending and i not in self._blocks:
+                self._pending[i] = self._executor.submit(self._fetch, i, i)
+
+    def _fetch(self, first, last):
+        # Returns the blocks first to last, fetched in one request.
+        start = first * self.block_size
+        end = min((last + 1) * self.block_size, self.size) - 1
+        body = self.key._get_range((start, end), self.headers,
+                                   self.query_args, self.num_retries,
+                                   self._stopped)
+        if body is None:
+            raise ValueError('I/O operation on closed file')
+        with self._lock:
+            self.requests += 1
+        return [body[i:i + self.block_size]
+                for i in range(0, len(body), self.block_size)]
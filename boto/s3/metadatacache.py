@@ -0,0 +1,157 @@
+# Copyright (c) 2013 Amazon.com, Inc. or its affiliates.  All Rights Reserved
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish, dis-
+# tribute, sublicense, and/or sell copies of the Software, and to permit
+# persons to whom the Software is furnished to do so, subject to the fol-
+# lowing conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABIL-
+# ITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT
+# SHALL THE AUTHOR BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
+# IN THE SOFTWARE.
+#
+
+"""
+A cache of the Keys returned by Bucket.get_key, so that repeated
+lookups of the same objects don't each cost a HEAD request.
+"""
+
+from __future__ import with_statement
+import copy
+import threading
+import time
+
+from boto.utils import LRUCache, get_utf8_value
+
+
+class KeyMetadataCache(object):
+    """
+    Holds up to capacity keys' HEAD results, least recently used first
+    out.  An entry is served for ttl seconds; a key that didn't exist
+    is remembered for negative_ttl seconds, and not at all if that is
+    0.  Entries are per version_id, and invalidating a key drops all
+    of its versions.
+
+    An S3Connection with a cache invalidates a key whenever it sends a
+    request that may change it, but it can't know about changes made
+    by other connections or processes; ttl bounds how stale an entry
+    can get.
+    """
+
+    def __init__(self, capacity=1000, ttl=60, negative_ttl=0,
+                 clock=time.time):
+        self.capacity = capacity
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._entries = LRUCache(capacity)
+        self._reset_stats()
+
+    def __getstate__(self):
+        return {'capacity': self.capacity, 'ttl': self.ttl,
+                'negative_ttl': self.negative_ttl}
+
+    def __setstate__(self, dct):
+        self.__init__(**dct)
+
+    def _reset_stats(self):
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get_stats(self):
+        """
+        Returns a dict of counters: the number of lookups answered from
+        the cache (hits) or not (misses), the number of keys dropped
+        because they were written or deleted (invalidations), and the
+        number of keys cached (size).
+        """
+        with self._lock:
+            return {'hits': self.hits,
+                    'misses': self.misses,
+                    'invalidations': self.invalidations,
+                    'size': len(self._entries)}
+
+    def reset_stats(self):
+        """
+        Zeroes the counters returned by get_stats.
+        """
+        with self._lock:
+            self._reset_stats()
+
+    def get(self, bucket_name, key_name, version_id=None):
+        """
+        Returns (True, key) on a hit, where key is a copy of the cached
+        Key or None if the key was found not to exist, and (False, None)
+        on a miss.
+        """
+        with self._lock:
+            versions = self._entries.get(_name(bucket_name, key_name))
+            entry = versions and versions.get(version_id)
+            if entry is not None and entry[0] > self.clock():
+                self.hits += 1
+                return True, self._copy(entry[1])
+            self.misses += 1
+            return False, None
+
+    def put(self, bucket_name, key_name, key, version_id=None):
+        """
+        Caches the result of a HEAD request, a Key or None for a 404.
+        """
+        ttl = self.ttl
+        if key is None:
+            ttl = self.negative_ttl
+        if ttl <= 0:
+            return
+        name = _name(bucket_name, key_name)
+        with self._lock:
+            versions = self._entries.get(name)
+            if versions is None:
+                versions = self._entries[name] = {}
+            versions[version_id] = (self.clock() + ttl, self._copy(key))
+
+    def invalidate(self, bucket_name, key_name=None):
+        """
+        Drops the cached versions of a key, or every key in the bucket
+        if key_name is None.
+        """
+        bucket_name = get_utf8_value(bucket_name)
+        with self._lock:
+            if key_name is None:
+                names = [name for name in self._entries
+                         if name[0] == bucket_name]
+            else:
+                names = [_name(bucket_name, key_name)]
+            for name in names:
+                if name in self._entries:
+                    del self._entries[name]
+                    self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def _copy(self, key):
+        # Callers are free to change the Keys they get back, so neither
+        # they nor the cache share one.
+        if key is None:
+            return None
+        key = copy.copy(key)
+        key.metadata = dict(key.metadata)
+        return key
+
+
+def _name(bucket_name, key_name):
+    # u'\xe9' and '\xc3\xa9' name the same key but are different dict
+    # keys, so entries are stored under the UTF-8 names.
+    return (get_utf8_value(bucket_name), get_utf8_value(key_name))
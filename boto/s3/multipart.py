@@ -22,11 +22,31 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
 # IN THE SOFTWARE.
 
+from __future__ import with_statement
+import errno
+import math
+import os
+import threading
+import time
+import urllib
+from functools import partial
+
 import user
 import key
+import boto
+import boto.executor
 from boto import handler
+from boto.exception import S3ResponseError
+from boto.utils import compute_md5, get_utf8_value
 import xml.sax
 
+# Part sizes for uploads split up by upload_parts_from_file.  S3 allows
+# at most MAX_PARTS parts, and every part but the last must be at least
+# MIN_PART_SIZE bytes.
+DEFAULT_PART_SIZE = 8 * 1024 * 1024
+MIN_PART_SIZE = 5 * 1024 * 1024
+MAX_PARTS = 10000
+
 
 class CompleteMultiPartUpload(object):
     """
@@ -111,6 +131,215 @@ class Part(object):
             setattr(self, name, value)
 
 
+def choose_part_size(size, part_size=None):
+    """
+    Returns the size of the parts to upload size bytes in: part_size
+    (DEFAULT_PART_SIZE if not given), or larger if that would take more
+    than MAX_PARTS parts.
+    """
+    part_size = part_size or DEFAULT_PART_SIZE
+    return max(part_size, int(math.ceil(size / float(MAX_PARTS))))
+
+
+class FileSection(object):
+    """
+    A read-only view of length bytes of a file starting at offset.
+
+    Several sections of the same file can be read from different
+    threads at once: every read seeks the underlying file while holding
+    the lock the sections share.
+    """
+
+    def __init__(self, fp, offset, length, lock):
+        self.fp = fp
+        self.offset = offset
+        self.length = length
+        self.lock = lock
+        self.pos = 0
+
+    def tell(self):
+        return self.pos
+
+    def seek(self, pos, whence=os.SEEK_SET):
+        if whence == os.SEEK_CUR:
+            pos += self.pos
+        elif whence == os.SEEK_END:
+            pos += self.length
+        self.pos = min(max(pos, 0), self.length)
+
+    def read(self, size=-1):
+        remaining = self.length - self.pos
+        if size < 0 or size > remaining:
+            size = remaining
+        if size <= 0:
+            return ''
+        with self.lock:
+            self.fp.seek(self.offset + self.pos)
+            data = self.fp.read(size)
+        self.pos += len(data)
+        return data
+
+
+class MultiPartUploadTracker(object):
+    """
+    A journal of a multipart upload made with upload_parts_from_file,
+    kept in tracker_file_name, from which another process can resume
+    the upload if this one dies.
+
+    The file records the upload id, what is being uploaded and the
+    part size, followed by the number and ETag of each part as it
+    finishes.  Lines are only ever appended, and each is flushed to
+    disk before the part is counted as done, so a crash can at worst
+    lose the last few parts, which S3 is asked about on resume.
+    """
+
+    def __init__(self, tracker_file_name):
+        self.tracker_file_name = tracker_file_name
+        self.upload_id = None
+        self.bucket_name = None
+        self.key_name = None
+        self.size = None
+        self.part_size = None
+        self.parts = {}
+        self._unconfirmed = {}
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        try:
+            f = open(self.tracker_file_name, 'r')
+        except IOError, e:
+            if e.errno != errno.ENOENT:
+                boto.log.warning('Couldn\'t read tracker file %s: %s',
+                                 self.tracker_file_name, e)
+            return
+        try:
+            lines = f.read().split('\n')
+        finally:
+            f.close()
+        # The last line is empty, or a part cut short by a crash.
+        lines.pop()
+        try:
+            fields = lines[0].split('\t')
+            if fields[0] != 'upload' or len(fields) != 6:
+                raise ValueError(lines[0])
+            self.upload_id = fields[1]
+            self.bucket_name = urllib.unquote(fields[2])
+            self.key_name = urllib.unquote(fields[3])
+            self.size = int(fields[4])
+            self.part_size = int(fields[5])
+            for line in lines[1:]:
+                kind, part_num, etag = line.split('\t')
+                self.parts[int(part_num)] = etag
+        except (IndexError, ValueError):
+            boto.log.warning('Ignoring malformed tracker file %s',
+                             self.tracker_file_name)
+            self.upload_id = None
+            self.parts = {}
+
+    def _append(self, line, mode='a'):
+        f = open(self.tracker_file_name, mode)
+        try:
+            f.write(line + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        finally:
+            f.close()
+
+    def resume(self, bucket, key_name, size, part_size):
+        """
+        Returns the MultiPartUpload recorded in the tracker file if it
+        is an upload of size bytes to key_name in bucket, in parts of
+        part_size, and S3 still has it; otherwise None.  The parts
+        recorded are checked against the parts S3 has.
+        """
+        if (self.upload_id is None or self.bucket_name != bucket.name or
+                self.key_name != get_utf8_value(key_name) or
+                self.size != size or
+                self.part_size != part_size):
+            if self.upload_id is not None:
+                boto.log.warning('Tracker file %s is for another upload; '
+                                 'starting a new one',
+                                 self.tracker_file_name)
+            return None
+        mp = MultiPartUpload(bucket)
+        mp.id = self.upload_id
+        mp.key_name = key_name
+        mp.bucket_name = bucket.name
+        try:
+            uploaded = dict((part.part_number, part.etag) for part in mp)
+        except S3ResponseError, e:
+            if e.status != 404:
+                raise
+            # The upload was completed or cancelled.
+            return None
+        self.parts = dict((part_num, etag)
+                          for part_num, etag in self.parts.items()
+                          if uploaded.get(part_num) == etag)
+        self._unconfirmed = dict((part_num, etag)
+                                 for part_num, etag in uploaded.items()
+                                 if part_num not in self.parts)
+        return mp
+
+    def start(self, mp, size, part_size):
+        """
+        Starts a new tracker file for mp.
+        """
+        self.upload_id = mp.id
+        self.bucket_name = mp.bucket.name
+        self.key_name = get_utf8_value(mp.key_name)
+        self.size = size
+        self.part_size = part_size
+        self.parts = {}
+        self._unconfirmed = {}
+        self._append('\t'.join(['upload', mp.id,
+                                urllib.quote(self.bucket_name),
+                                urllib.quote(self.key_name),
+                                str(size), str(part_size)]), 'w')
+
+    def part_uploaded(self, part_num, section):
+        """
+        Returns True if part part_num, whose data is in section, has
+        already been uploaded.  Every part S3 has, whether or not the
+        tracker file records it, is checked against the MD5 of section,
+        so a part of a file that has changed since is sent again.
+        """
+        recorded = self.parts.get(part_num)
+        etag = recorded or self._unconfirmed.pop(part_num, None)
+        if etag is None:
+            return False
+        section.seek(0)
+        if etag.strip('"') == compute_md5(section)[0]:
+            if recorded is None:
+                self.add_part(part_num, etag)
+            return True
+        if recorded is not None:
+            boto.log.warning('Part %d of %s has changed since it was '
+                             'uploaded; sending it again', part_num,
+                             self.key_name)
+            with self._lock:
+                self.parts.pop(part_num, None)
+        return False
+
+    def add_part(self, part_num, etag):
+        """
+        Records that part part_num has been uploaded.
+        """
+        with self._lock:
+            self._append('part\t%d\t%s' % (part_num, etag))
+            self.parts[part_num] = etag
+
+    def remove(self):
+        """
+        Deletes the tracker file, once the upload is complete.
+        """
+        try:
+            os.unlink(self.tracker_file_name)
+        except OSError, e:
+            if e.errno != errno.ENOENT:
+                raise
+
+
 def part_lister(mpupload, part_number_marker=None):
     """
     A generator function for listing parts of a multipart upload.
@@ -221,6 +450,9 @@ class MultiPartUpload(object):
             h = handler.XmlHandler(self, self)
             xml.sax.parseString(body, h)
             return self._parts
+        else:
+            raise self.bucket.connection.provider.storage_response_error(
+                response.status, response.reason, body)
 
     def upload_part_from_file(self, fp, part_num, headers=None, replace=True,
                               cb=None, num_cb=10, md5=None, size=None):
@@ -244,9 +476,117 @@ class MultiPartUpload(object):
                                    cb=cb, num_cb=num_cb, md5=md5,
                                    reduced_redundancy=False,
                                    query_args=query_args, size=size)
+        return key
+
+    def upload_parts_from_file(self, fp, size, part_size=None, headers=None,
+                               cb=None, num_cb=10, max_workers=None,
+                               num_retries=2, tracker=None):
+        """
+        Upload size bytes of fp, from its current position, as the parts
+        of this MultiPart Upload, several parts at a time.  This doesn't
+        complete the upload.
+
+        :type fp: file
+        :param fp: A seekable file object.  Parts are read from it by
+            several threads, which seek it as they go.
+
+        :type size: int
+        :param size: The number of bytes to upload.
+
+        :type part_size: int
+        :param part_size: The size of each part but the last.  Defaults
+            to a size chosen by :func:`choose_part_size`.
+
+        :type max_workers: int
+        :param max_workers: How many parts to upload at once.  Defaults
+            to the connection's max_concurrent_requests.
+
+        :type num_retries: int
+        :param num_retries: How many more times to try uploading a part
+            that failed, before giving up on the whole upload.
+
+        :type cb: function
+        :param cb: Called as cb(bytes_uploaded, size) to report the
+            progress of all the parts together, up to num_cb times per
+            part.
+
+        :type tracker: :class:`MultiPartUploadTracker`
+        :param tracker: (optional) Records each part as it is uploaded.
+            Parts it says are already uploaded are skipped.
+
+        :rtype: int
+        :return: The number of parts uploaded.
+        """
+        part_size = choose_part_size(size, part_size)
+        num_parts = max(1, int(math.ceil(size / float(part_size))))
+        connection = self.bucket.connection
+        if max_workers is None:
+            max_workers = boto.config.getint(
+                'Boto', 'max_concurrent_requests',
+                connection.max_concurrent_requests)
+        start = fp.tell()
+        lock = threading.Lock()
+        progress = _Progress(cb, size)
+        failed = threading.Event()
+        executor = boto.executor.Executor(min(max_workers, num_parts))
+        try:
+            futures = []
+            for i in range(num_parts):
+                offset = i * part_size
+                section = FileSection(fp, start + offset,
+                                      min(part_size, size - offset), lock)
+                futures.append(executor.submit(
+                    self._upload_part_with_retries, section, i + 1, headers,
+                    progress.part_callback(i + 1), num_cb, num_retries,
+                    failed, tracker))
+            for future in futures:
+                future.result()
+        finally:
+            executor.shutdown()
+            fp.seek(start + size)
+        return num_parts
+
+    def _upload_part_with_retries(self, section, part_num, headers, cb,
+                                  num_cb, num_retries, failed, tracker=None):
+        # Parts already uploaded are checked here rather than before
+        # they are submitted, so a resume hashes them on the workers
+        # alongside the uploads of the missing parts.
+        if (tracker is not None and not failed.isSet() and
+                tracker.part_uploaded(part_num, section)):
+            if cb:
+                cb(section.length, section.length)
+            return None
+        def upload():
+            section.seek(0)
+            key = self.upload_part_from_file(section, part_num,
+                                             headers=headers, cb=cb,
+                                             num_cb=num_cb,
+                                             size=section.length)
+            if tracker is not None:
+                tracker.add_part(part_num, key.etag)
+            return key
+        return self._retry_part(upload, part_num, num_retries, failed)
+
+    def _retry_part(self, fn, part_num, num_retries, failed):
+        # Once one part has failed for good, the parts that haven't
+        # started yet are skipped.
+        attempt = 0
+        while not failed.isSet():
+            try:
+                return fn()
+            except Exception, e:
+                if (attempt >= num_retries or
+                        (isinstance(e, S3ResponseError) and e.status < 500)):
+                    failed.set()
+                    raise
+            attempt += 1
+            boto.log.debug('Retrying part %d of upload %s after %s: %s',
+                           part_num, self.id, e.__class__.__name__, e)
+            time.sleep(2 ** attempt)
 
     def copy_part_from_key(self, src_bucket_name, src_key_name, part_num,
-                           start=None, end=None, src_version_id=None):
+                           start=None, end=None, src_version_id=None,
+                           headers=None):
         """
         Copy another part of this MultiPart Upload.
 
@@ -267,16 +607,19 @@ class MultiPartUpload(object):
 
         :type src_version_id: string
         :param src_version_id: version_id of source object to copy from
+
+        :type headers: dict
+        :param headers: (optional) Additional headers to send, such as
+            the copy source If-Match header.
         """
         if part_num < 1:
             raise ValueError('Part numbers must be greater than zero')
         query_args = 'uploadId=%s&partNumber=%d' % (self.id, part_num)
+        headers = headers and headers.copy() or {}
         if start is not None and end is not None:
             rng = 'bytes=%s-%s' % (start, end)
             provider = self.bucket.connection.provider
-            headers = {provider.copy_source_range_header: rng}
-        else:
-            headers = None
+            headers[provider.copy_source_range_header] = rng
         return self.bucket.copy_key(self.key_name, src_bucket_name,
                                     src_key_name,
                                     src_version_id=src_version_id,
@@ -284,6 +627,61 @@ class MultiPartUpload(object):
                                     headers=headers,
                                     query_args=query_args)
 
+    def copy_parts_from_key(self, src_bucket_name, src_key_name, size,
+                            part_size=None, src_version_id=None,
+                            headers=None, max_workers=None, num_retries=2):
+        """
+        Copy the first size bytes of another key as the parts of this
+        MultiPart Upload, several parts at a time.  This doesn't
+        complete the upload.
+
+        :type size: int
+        :param size: The number of bytes to copy, usually the size of
+            the source key.
+
+        :type part_size: int
+        :param part_size: The size of each part but the last.  Defaults
+            to a size chosen by :func:`choose_part_size`.
+
+        :type headers: dict
+        :param headers: (optional) Headers to send with every part,
+            such as the copy source If-Match header.
+
+        :type max_workers: int
+        :param max_workers: How many parts to copy at once.  Defaults
+            to the connection's max_concurrent_requests.
+
+        :type num_retries: int
+        :param num_retries: How many more times to try copying a part
+            that failed, before giving up on the whole copy.
+
+        :rtype: int
+        :return: The number of parts copied.
+        """
+        part_size = choose_part_size(size, part_size)
+        num_parts = max(1, int(math.ceil(size / float(part_size))))
+        if max_workers is None:
+            max_workers = boto.config.getint(
+                'Boto', 'max_concurrent_requests',
+                self.bucket.connection.max_concurrent_requests)
+        failed = threading.Event()
+        executor = boto.executor.Executor(min(max_workers, num_parts))
+        try:
+            futures = []
+            for i in range(num_parts):
+                start = i * part_size
+                end = min(start + part_size, size) - 1
+                copy = partial(self.copy_part_from_key, src_bucket_name,
+                               src_key_name, i + 1, start, end,
+                               src_version_id, headers)
+                futures.append(executor.submit(
+                    self._retry_part, copy, i + 1, num_retries, failed))
+            for future in futures:
+                future.result()
+        finally:
+            executor.shutdown()
+        return num_parts
+
     def complete_upload(self):
         """
         Complete the MultiPart Upload operation.  This method should
@@ -307,3 +705,23 @@ class MultiPartUpload(object):
         completely free all storage consumed by all parts.
         """
         self.bucket.cancel_multipart_upload(self.key_name, self.id)
+
+
+class _Progress(object):
+    # Adds up the progress callbacks of the parts of an upload.
+
+    def __init__(self, cb, size):
+        self.cb = cb
+        self.size = size
+        self.lock = threading.Lock()
+        self.done = {}
+
+    def part_callback(self, part_num):
+        if self.cb is None:
+            return None
+        def cb(bytes_done, part_size):
+            with self.lock:
+                self.done[part_num] = bytes_done
+                total = sum(self.done.values())
+            self.cb(total, self.size)
+        return cb
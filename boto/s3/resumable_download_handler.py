@@ -169,7 +169,8 @@ class ResumableDownloadHandler(object):
                 os.unlink(self.tracker_file_name)
 
     def _attempt_resumable_download(self, key, fp, headers, cb, num_cb,
-                                    torrent, version_id):
+                                    torrent, version_id, parallel=False,
+                                    range_size=None):
         """
         Attempts a resumable download.
 
@@ -195,7 +196,8 @@ class ResumableDownloadHandler(object):
                 print 'Resuming download.'
             headers = headers.copy()
             headers['Range'] = 'bytes=%d-%d' % (cur_file_size, key.size - 1)
-            cb = ByteTranslatingCallbackHandler(cb, cur_file_size).call
+            if cb:
+                cb = ByteTranslatingCallbackHandler(cb, cur_file_size).call
             self.download_start_point = cur_file_size
         else:
             if key.bucket.connection.debug >= 1:
@@ -209,11 +211,12 @@ class ResumableDownloadHandler(object):
         # Disable AWSAuthConnection-level retry behavior, since that would
         # cause downloads to restart from scratch.
         key.get_file(fp, headers, cb, num_cb, torrent, version_id,
-                     override_num_retries=0)
+                     override_num_retries=0, parallel=parallel,
+                     range_size=range_size)
         fp.flush()
 
     def get_file(self, key, fp, headers, cb=None, num_cb=10, torrent=False,
-                 version_id=None):
+                 version_id=None, parallel=False, range_size=None):
         """
         Retrieves a file from a Key
         :type key: :class:`boto.s3.key.Key` or subclass
@@ -245,6 +248,13 @@ class ResumableDownloadHandler(object):
         :type version_id: string
         :param version_id: The version ID (optional)
 
+        :type parallel: bool
+        :param parallel: Whether to download several byte ranges at
+            once.  See :meth:`boto.s3.key.Key.get_file`.
+
+        :type range_size: int
+        :param range_size: The size of the ranges of a parallel download.
+
         Raises ResumableDownloadException if a problem occurs during
             the transfer.
         """
@@ -263,7 +273,8 @@ class ResumableDownloadHandler(object):
             had_file_bytes_before_attempt = get_cur_file_size(fp)
             try:
                 self._attempt_resumable_download(key, fp, headers, cb, num_cb,
-                                                 torrent, version_id)
+                                                 torrent, version_id,
+                                                 parallel, range_size)
                 # Download succceded, so remove the tracker file (if have one).
                 self._remove_tracker_file()
                 # Previously, check_final_md5() was called here to validate 
@@ -41,24 +41,14 @@ Some handy utility functions used by several classes.
 
 import socket
 import urllib
-import urllib2
 import imp
-import subprocess
 import StringIO
 import time
 import logging.handlers
 import boto
 import boto.provider
-import tempfile
-import smtplib
 import datetime
 import re
-from email.MIMEMultipart import MIMEMultipart
-from email.MIMEBase import MIMEBase
-from email.MIMEText import MIMEText
-from email.Utils import formatdate
-from email import Encoders
-import gzip
 import base64
 try:
     from hashlib import md5
@@ -182,6 +172,7 @@ def get_aws_metadata(headers, provider=None):
     return metadata
 
 def retry_url(url, retry_on_404=True, num_retries=10):
+    import urllib2
     for i in range(0, num_retries):
         try:
             req = urllib2.Request(url)
@@ -297,6 +288,7 @@ def get_instance_metadata(version='latest', url='http://169.254.169.254',
     will time out after the specified number of seconds.
 
     """
+    import urllib2
     if timeout is not None:
         original = socket.getdefaulttimeout()
         socket.setdefaulttimeout(timeout)
@@ -314,6 +306,7 @@ def get_instance_identity(version='latest', url='http://169.254.169.254',
     """
     Returns the instance identity as a nested Python dictionary.
     """
+    import urllib2
     iid = {}
     base_url = 'http://169.254.169.254/latest/dynamic/instance-identity'
     if timeout is not None:
@@ -385,6 +378,7 @@ def update_dme(username, password, dme_id, ip_address):
     """
     Update your Dynamic DNS record with DNSMadeEasy.com
     """
+    import urllib2
     dme_url = 'https://www.dnsmadeeasy.com/servlet/updateip'
     dme_url += '?username=%s&password=%s&id=%s&ip=%s'
     s = urllib2.urlopen(dme_url % (username, password, dme_id, ip_address))
@@ -397,6 +391,8 @@ def fetch_file(uri, file=None, username=None, password=None):
     retrieved is returned.
     The URI can be either an HTTP url, or "s3://bucket_name/key_name"
     """
+    import tempfile
+    import urllib2
     boto.log.info('Fetching %s' % uri)
     if file == None:
         file = tempfile.NamedTemporaryFile()
@@ -434,6 +430,7 @@ class ShellCommand(object):
         self.run(cwd = cwd)
 
     def run(self, cwd=None):
+        import subprocess
         boto.log.info('running:%s' % self.command)
         self.process = subprocess.Popen(self.command, shell=True, stdin=subprocess.PIPE,
                                         stdout=subprocess.PIPE, stderr=subprocess.PIPE,
@@ -498,6 +495,8 @@ class AuthSMTPHandler(logging.handlers.SMTPHandler):
         It would be really nice if I could add authorization to this class
         without having to resort to cut and paste inheritance but, no.
         """
+        import smtplib
+        from email.Utils import formatdate
         try:
             port = self.mailport
             if not port:
@@ -599,6 +598,26 @@ class LRUCache(dict):
             self._update_item(item)
             self._manage_size()
 
+    def __delitem__(self, key):
+        item = self._dict.pop(key)
+        if item.previous is not None:
+            item.previous.next = item.next
+        else:
+            self.head = item.next
+        if item.next is not None:
+            item.next.previous = item.previous
+        else:
+            self.tail = item.previous
+
+    def get(self, key, default=None):
+        if key in self._dict:
+            return self[key]
+        return default
+
+    def clear(self):
+        self._dict.clear()
+        self.head = self.tail = None
+
     def __repr__(self):
         return repr(self._dict)
 
@@ -668,6 +687,12 @@ class Password(object):
             return 0
 
 def notify(subject, body=None, html_body=None, to_string=None, attachments=None, append_instance_id=True):
+    import smtplib
+    from email.MIMEMultipart import MIMEMultipart
+    from email.MIMEBase import MIMEBase
+    from email.MIMEText import MIMEText
+    from email.Utils import formatdate
+    from email import Encoders
     attachments = attachments or []
     if append_instance_id:
         subject = "[%s] %s" % (boto.config.get_value("Instance", "instance-id"), subject)
@@ -769,6 +794,11 @@ def write_mime_multipart(content, compress=False, deftype='text/plain', delimite
     :return: Final mime multipart
     :rtype: str:
     """
+    import gzip
+    from email.MIMEMultipart import MIMEMultipart
+    from email.MIMEBase import MIMEBase
+    from email.MIMEText import MIMEText
+    from email import Encoders
     wrapper = MIMEMultipart()
     for name, con in content:
         definite_type = guess_mime_type(con, deftype)
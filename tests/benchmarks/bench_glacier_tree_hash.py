@@ -0,0 +1,102 @@
+#!/usr/bin/env python
+# Copyright (c) 2013 Amazon.com, Inc. or its affiliates.  All Rights Reserved
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish, dis-
+# tribute, sublicense, and/or sell copies of the Software, and to permit
+# persons to whom the Software is furnished to do so, subject to the fol-
+# lowing conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABIL-
+# ITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT
+# SHALL THE AUTHOR BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
+# IN THE SOFTWARE.
+#
+"""
+Compares the Glacier tree hash code with the implementation it
+replaced: first building the tree from a given number of chunk
+hashes, then hashing the chunks of a temporary file on one thread and
+on one thread per CPU.  compute_hashes_from_fileobj also computes the
+linear hash, which tree_hash_from_file doesn't.
+
+    python tests/benchmarks/bench_glacier_tree_hash.py [chunks] [file MB]
+"""
+import hashlib
+import os
+import sys
+import tempfile
+import time
+
+from boto.glacier import utils
+
+
+def old_tree_hash(fo):
+    hashes = []
+    hashes.extend(fo)
+    while len(hashes) > 1:
+        new_hashes = []
+        while True:
+            if len(hashes) > 1:
+                first = hashes.pop(0)
+                second = hashes.pop(0)
+                new_hashes.append(hashlib.sha256(first + second).digest())
+            elif len(hashes) == 1:
+                only = hashes.pop(0)
+                new_hashes.append(only)
+            else:
+                break
+        hashes.extend(new_hashes)
+    return hashes[0]
+
+
+def timed(fn, *args, **kwargs):
+    start = time.time()
+    result = fn(*args, **kwargs)
+    return result, time.time() - start
+
+
+def main():
+    chunks = 200000
+    megabytes = 256
+    if len(sys.argv) > 1:
+        chunks = int(sys.argv[1])
+    if len(sys.argv) > 2:
+        megabytes = int(sys.argv[2])
+
+    hashes = [hashlib.sha256(str(i)).digest() for i in xrange(chunks)]
+    old, old_seconds = timed(old_tree_hash, hashes)
+    new, new_seconds = timed(utils.tree_hash, hashes)
+    assert old == new
+    print 'tree of %d chunk hashes' % chunks
+    print '  %-32s %8.3f s' % ('pop(0) levels', old_seconds)
+    print '  %-32s %8.3f s' % ('tree_hash', new_seconds)
+
+    fileobj = tempfile.TemporaryFile()
+    block = os.urandom(1024 * 1024)
+    for _ in xrange(megabytes):
+        fileobj.write(block)
+    fileobj.flush()
+    fileobj.seek(0)
+    (_, old), old_seconds = timed(utils.compute_hashes_from_fileobj, fileobj)
+    print 'hashing a %d MB file' % megabytes
+    print '  %-32s %8.3f s' % ('compute_hashes_from_fileobj', old_seconds)
+    for workers in sorted(set([1, utils._cpu_count()])):
+        new, seconds = timed(utils.tree_hash_from_file, fileobj,
+                             max_workers=workers)
+        assert old == new
+        print '  %-32s %8.3f s' % ('tree_hash_from_file, %d thread%s' %
+                                   (workers, workers > 1 and 's' or ''),
+                                   seconds)
+    fileobj.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,159 @@
+#!/usr/bin/env python
+# Copyright (c) 2013 Amazon.com, Inc. or its affiliates.  All Rights Reserved
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish, dis-
+# tribute, sublicense, and/or sell copies of the Software, and to permit
+# persons to whom the Software is furnished to do so, subject to the fol-
+# lowing conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABIL-
+# ITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT
+# SHALL THE AUTHOR BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
+# IN THE SOFTWARE.
+#
+"""
+Measures the peak memory use and throughput of ConcurrentUploader
+against a vault that accepts parts without sending them anywhere, so
+that what is measured is reading, hashing and buffering.
+
+"read" is the way parts used to be uploaded: each thread seeks and
+reads its whole part into a string and hashes 1 MB slices of it.
+"mmap" uploads the file through memory maps, and "stream" uploads it
+through a file object without a fileno, as for a pipe.  Each mode runs
+in its own process so that its peak RSS can be reported.
+
+    python tests/benchmarks/bench_glacier_upload.py [file MB] [part MB]
+"""
+import hashlib
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from Queue import Queue
+
+from boto.glacier.concurrent import ConcurrentUploader
+from boto.glacier.utils import bytes_to_hex, tree_hash
+
+MB = 1024 * 1024
+THREADS = 8
+
+
+class NullVaultAPI(object):
+    def initiate_multipart_upload(self, vault_name, part_size, description):
+        return {'UploadId': 'upload'}
+
+    def upload_part(self, vault_name, upload_id, linear_hash, tree_hash_hex,
+                    byte_range, data):
+        return self
+
+    def read(self):
+        return ''
+
+    def complete_multipart_upload(self, vault_name, upload_id, tree_hash_hex,
+                                  size):
+        return {'ArchiveId': tree_hash_hex}
+
+    def abort_multipart_upload(self, vault_name, upload_id):
+        pass
+
+
+class Pipe(object):
+    def __init__(self, fileobj):
+        self.fileobj = fileobj
+
+    def read(self, size):
+        return self.fileobj.read(size)
+
+
+def old_chunk_hashes(data):
+    return [hashlib.sha256(data[i:i + MB]).digest()
+            for i in xrange(0, len(data), MB)]
+
+
+def read_upload(filename, part_size):
+    api = NullVaultAPI()
+    size = os.path.getsize(filename)
+    work = Queue()
+    for part_number in xrange(0, (size + part_size - 1) // part_size):
+        work.put(part_number)
+    hashes = {}
+
+    def worker():
+        fileobj = open(filename, 'rb')
+        while True:
+            try:
+                part_number = work.get_nowait()
+            except Exception:
+                break
+            fileobj.seek(part_number * part_size)
+            contents = fileobj.read(part_size)
+            linear_hash = hashlib.sha256(contents).hexdigest()
+            hashes[part_number] = tree_hash(old_chunk_hashes(contents))
+            api.upload_part('vault', 'upload', linear_hash, '', None,
+                            contents)
+        fileobj.close()
+
+    threads = [threading.Thread(target=worker) for _ in xrange(THREADS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return bytes_to_hex(tree_hash(hashes[i] for i in sorted(hashes)))
+
+
+def run(mode, filename, part_size):
+    uploader = ConcurrentUploader(NullVaultAPI(), 'vault', part_size,
+                                  num_threads=THREADS,
+                                  max_buffer_size=2 * part_size)
+    start = time.time()
+    if mode == 'read':
+        result = read_upload(filename, part_size)
+    elif mode == 'mmap':
+        result = uploader.upload(filename)
+    else:
+        fileobj = open(filename, 'rb')
+        result = uploader.upload_fileobj(Pipe(fileobj))
+        fileobj.close()
+    elapsed = time.time() - start
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+    print '%-8s %8.1f MB/s %8.1f MB peak RSS  %s' % (
+        mode, os.path.getsize(filename) / MB / elapsed, peak, result[:12])
+
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == '--run':
+        run(sys.argv[2], sys.argv[3], int(sys.argv[4]))
+        return
+    megabytes = 512
+    part_mb = 16
+    if len(sys.argv) > 1:
+        megabytes = int(sys.argv[1])
+    if len(sys.argv) > 2:
+        part_mb = int(sys.argv[2])
+    fileobj = tempfile.NamedTemporaryFile()
+    block = os.urandom(MB)
+    for _ in xrange(megabytes):
+        fileobj.write(block)
+    fileobj.flush()
+    print '%d MB file, %d MB parts, %d threads, buffer of 2 parts' % (
+        megabytes, part_mb, THREADS)
+    for mode in ('read', 'mmap', 'stream'):
+        subprocess.check_call([sys.executable, __file__, '--run', mode,
+                               fileobj.name, str(part_mb * MB)])
+    fileobj.close()
+
+
+if __name__ == '__main__':
+    main()
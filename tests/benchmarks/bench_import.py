@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+# Copyright (c) 2013 Amazon.com, Inc. or its affiliates.  All Rights Reserved
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish, dis-
+# tribute, sublicense, and/or sell copies of the Software, and to permit
+# persons to whom the Software is furnished to do so, subject to the fol-
+# lowing conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABIL-
+# ITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT
+# SHALL THE AUTHOR BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
+# IN THE SOFTWARE.
+#
+"""
+Tracks how long short-lived processes spend getting boto ready: the
+time to ``import boto`` and the time to create the first connection
+with each of a few connect_* functions.  Every sample is taken in a
+fresh interpreter, so nothing is already imported.
+
+    python tests/benchmarks/bench_import.py [samples]
+"""
+import os
+import subprocess
+import sys
+
+SNIPPET = """
+import time
+start = time.time()
+import boto
+imported = time.time()
+%s
+connected = time.time()
+print imported - start, connected - imported
+"""
+
+CASES = [
+    ('import boto', ''),
+    ('connect_s3', "boto.connect_s3('access', 'secret')"),
+    ('connect_ec2', "boto.connect_ec2('access', 'secret')"),
+    ('connect_sqs', "boto.connect_sqs('access', 'secret')"),
+    ('connect_dynamodb', "boto.connect_dynamodb('access', 'secret')"),
+]
+
+
+def median(values):
+    values = sorted(values)
+    return values[len(values) // 2]
+
+
+def sample(statement):
+    env = dict(os.environ)
+    root = os.path.dirname(os.path.dirname(os.path.dirname(
+        os.path.abspath(__file__))))
+    env['PYTHONPATH'] = os.pathsep.join(
+        [root] + [p for p in [env.get('PYTHONPATH')] if p])
+    output = subprocess.Popen(
+        [sys.executable, '-c', SNIPPET % statement], env=env,
+        stdout=subprocess.PIPE).communicate()[0]
+    return [float(value) for value in output.split()]
+
+
+def main():
+    samples = 15
+    if len(sys.argv) > 1:
+        samples = int(sys.argv[1])
+    print '%-18s %12s %16s' % ('', 'import (ms)', 'first call (ms)')
+    for name, statement in CASES:
+        results = [sample(statement) for _ in range(samples)]
+        print '%-18s %12.1f %16.1f' % (
+            name, median([r[0] for r in results]) * 1000,
+            median([r[1] for r in results]) * 1000)
+
+
+if __name__ == '__main__':
+    main()
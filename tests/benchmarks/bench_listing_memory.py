@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+# Copyright (c) 2013 Amazon.com, Inc. or its affiliates.  All Rights Reserved
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish, dis-
+# tribute, sublicense, and/or sell copies of the Software, and to permit
+# persons to whom the Software is furnished to do so, subject to the fol-
+# lowing conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABIL-
+# ITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT
+# SHALL THE AUTHOR BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
+# IN THE SOFTWARE.
+"""
+Measures how much memory a listing takes per key when every listed
+key is kept, as reconciliation jobs do, for Key objects and for the
+compact KeyEntry objects returned by Bucket.list(compact=True).  Each
+case runs in a fresh interpreter and reports the growth of its peak
+RSS divided by the number of keys.
+
+    python tests/benchmarks/bench_listing_memory.py [pages]
+"""
+import os
+import subprocess
+import sys
+
+SNIPPET = """
+import gc
+import resource
+import sys
+from boto import handler
+from boto.resultset import ResultSet
+from boto.s3.key import Key
+from boto.s3.keyentry import KeyEntry
+from boto.s3.prefix import Prefix
+from bench_xml_parsing import list_bucket_result
+
+def peak_rss():
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == 'darwin':
+        return rss
+    return rss * 1024
+
+def parse(body):
+    rs = ResultSet([('Contents', %s), ('CommonPrefixes', Prefix)])
+    handler.parse_string(body, handler.XmlHandler(rs, None))
+    return rs
+
+body = list_bucket_result()
+parse(body)
+gc.collect()
+before = peak_rss()
+keys = []
+for page in range(%d):
+    keys.extend(parse(body))
+after = peak_rss()
+print len(keys), after - before
+"""
+
+
+def sample(key_class, pages):
+    env = dict(os.environ)
+    here = os.path.dirname(os.path.abspath(__file__))
+    root = os.path.dirname(os.path.dirname(here))
+    env['PYTHONPATH'] = os.pathsep.join(
+        [root, here] + [p for p in [env.get('PYTHONPATH')] if p])
+    output = subprocess.Popen(
+        [sys.executable, '-c', SNIPPET % (key_class, pages)], env=env,
+        stdout=subprocess.PIPE).communicate()[0]
+    count, growth = output.split()
+    return int(count), int(growth)
+
+
+def main():
+    pages = 100
+    if len(sys.argv) > 1:
+        pages = int(sys.argv[1])
+    print '%-10s %10s %14s' % ('', 'keys', 'bytes/key')
+    for key_class in ('Key', 'KeyEntry'):
+        count, growth = sample(key_class, pages)
+        print '%-10s %10d %14.0f' % (key_class, count,
+                                     float(growth) / count)
+
+
+if __name__ == '__main__':
+    main()
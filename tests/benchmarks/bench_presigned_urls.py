@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+# Copyright (c) 2013 Amazon.com, Inc. or its affiliates.  All Rights Reserved
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish, dis-
+# tribute, sublicense, and/or sell copies of the Software, and to permit
+# persons to whom the Software is furnished to do so, subject to the fol-
+# lowing conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABIL-
+# ITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT
+# SHALL THE AUTHOR BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
+# IN THE SOFTWARE.
+#
+"""
+Measures how many presigned GET URLs per second can be generated by
+calling S3Connection.generate_url once per key, and by passing all the
+keys to S3Connection.generate_urls.
+
+    python tests/benchmarks/bench_presigned_urls.py [keys]
+"""
+import sys
+import time
+
+from boto.s3.connection import S3Connection
+
+
+def main():
+    count = 100000
+    if len(sys.argv) > 1:
+        count = int(sys.argv[1])
+    conn = S3Connection('access_key', 'secret_key')
+    items = [('bucket-%d' % (i % 10), 'logs/2013/07/%08d.gz' % i, 3600)
+             for i in xrange(count)]
+
+    def one_at_a_time():
+        for bucket, key, expires_in in items:
+            conn.generate_url(expires_in, 'GET', bucket, key)
+
+    def batch():
+        conn.generate_urls(items)
+
+    for name, fn in (('generate_url', one_at_a_time),
+                     ('generate_urls', batch)):
+        best = None
+        for _ in range(3):
+            start = time.time()
+            fn()
+            elapsed = time.time() - start
+            if best is None or elapsed < best:
+                best = elapsed
+        print '%-14s %10.0f URLs/sec' % (name, count / best)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+# Copyright (c) 2013 Amazon.com, Inc. or its affiliates.  All Rights Reserved
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish, dis-
+# tribute, sublicense, and/or sell copies of the Software, and to permit
+# persons to whom the Software is furnished to do so, subject to the fol-
+# lowing conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABIL-
+# ITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT
+# SHALL THE AUTHOR BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
+# IN THE SOFTWARE.
+#
+"""
+Measures the cost of signing a DynamoDB style request with SigV4, with
+the derived signing key cached (the normal case) and with the cache
+cleared before every request (the behaviour before the cache existed).
+
+    python tests/benchmarks/bench_sigv4.py [iterations]
+"""
+import sys
+import timeit
+
+from boto.auth import HmacAuthV4Handler
+from boto.connection import HTTPRequest
+from boto.provider import Provider
+
+
+def make_handler():
+    provider = Provider('aws', 'access_key', 'secret_key')
+    return HmacAuthV4Handler('dynamodb.us-east-1.amazonaws.com', None,
+                             provider)
+
+
+def make_request():
+    return HTTPRequest(
+        'POST', 'https', 'dynamodb.us-east-1.amazonaws.com', 443, '/',
+        None, {}, {'X-Amz-Target': 'DynamoDB_20111205.GetItem',
+                   'Content-Type': 'application/x-amz-json-1.0'},
+        '{"TableName": "table", "Key": {"HashKeyElement": {"S": "k"}}}')
+
+
+def main():
+    iterations = 20000
+    if len(sys.argv) > 1:
+        iterations = int(sys.argv[1])
+    handler = make_handler()
+
+    def cached():
+        handler.add_auth(make_request())
+
+    def uncached():
+        handler._signing_key_cache = (None, None)
+        handler.add_auth(make_request())
+
+    for name, fn in (('uncached', uncached), ('cached', cached)):
+        seconds = min(timeit.repeat(fn, number=iterations, repeat=3))
+        print '%-10s %8.1f us/request' % (name,
+                                          seconds / iterations * 1e6)
+
+
+if __name__ == '__main__':
+    main()
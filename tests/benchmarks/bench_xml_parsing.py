@@ -0,0 +1,186 @@
+#!/usr/bin/env python
+# Copyright (c) 2013 Amazon.com, Inc. or its affiliates.  All Rights Reserved
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish, dis-
+# tribute, sublicense, and/or sell copies of the Software, and to permit
+# persons to whom the Software is furnished to do so, subject to the fol-
+# lowing conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABIL-
+# ITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT
+# SHALL THE AUTHOR BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
+# IN THE SOFTWARE.
+#
+"""
+Compares the XML parser backends in boto.handler on a 1000 key
+ListBucketResult and a 100 instance DescribeInstancesResponse, shaped
+like responses recorded from S3 and EC2.  Each backend must produce
+the same objects as the SAX parser before it is timed.
+
+    python tests/benchmarks/bench_xml_parsing.py [iterations]
+"""
+import sys
+import timeit
+
+from boto import handler
+from boto.ec2.instance import Reservation
+from boto.resultset import ResultSet
+from boto.s3.key import Key
+from boto.s3.prefix import Prefix
+
+
+LIST_BUCKET_CONTENTS = """  <Contents>
+    <Key>logs/2013/01/%(i)06d.log.gz</Key>
+    <LastModified>2013-01-01T00:%(m)02d:00.000Z</LastModified>
+    <ETag>&quot;%(i)032x&quot;</ETag>
+    <Size>%(size)d</Size>
+    <Owner>
+      <ID>75aa57f09aa0c8caeab4f8c24e99d10f8e7faeebf76c078efc7c6caea54ba06a</ID>
+      <DisplayName>webfile</DisplayName>
+    </Owner>
+    <StorageClass>STANDARD</StorageClass>
+  </Contents>
+"""
+
+INSTANCE_ITEM = """        <item>
+          <instanceId>i-%(i)08x</instanceId>
+          <imageId>ami-1a2b3c4d</imageId>
+          <instanceState><code>16</code><name>running</name></instanceState>
+          <privateDnsName>ip-10-0-%(a)d-%(b)d.ec2.internal</privateDnsName>
+          <dnsName>ec2-54-0-%(a)d-%(b)d.compute-1.amazonaws.com</dnsName>
+          <reason/>
+          <keyName>deploy</keyName>
+          <amiLaunchIndex>0</amiLaunchIndex>
+          <productCodes/>
+          <instanceType>m1.large</instanceType>
+          <launchTime>2013-01-01T00:00:00.000Z</launchTime>
+          <placement>
+            <availabilityZone>us-east-1a</availabilityZone>
+            <groupName/>
+            <tenancy>default</tenancy>
+          </placement>
+          <kernelId>aki-88aa75e1</kernelId>
+          <monitoring><state>disabled</state></monitoring>
+          <privateIpAddress>10.0.%(a)d.%(b)d</privateIpAddress>
+          <ipAddress>54.0.%(a)d.%(b)d</ipAddress>
+          <groupSet>
+            <item><groupId>sg-1a2b3c4d</groupId><groupName>web</groupName></item>
+          </groupSet>
+          <architecture>x86_64</architecture>
+          <rootDeviceType>ebs</rootDeviceType>
+          <rootDeviceName>/dev/sda1</rootDeviceName>
+          <blockDeviceMapping>
+            <item>
+              <deviceName>/dev/sda1</deviceName>
+              <ebs>
+                <volumeId>vol-%(i)08x</volumeId>
+                <status>attached</status>
+                <attachTime>2013-01-01T00:00:05.000Z</attachTime>
+                <deleteOnTermination>true</deleteOnTermination>
+              </ebs>
+            </item>
+          </blockDeviceMapping>
+          <virtualizationType>paravirtual</virtualizationType>
+          <tagSet>
+            <item><key>Name</key><value>web-%(i)d</value></item>
+          </tagSet>
+          <hypervisor>xen</hypervisor>
+          <networkInterfaceSet/>
+          <ebsOptimized>false</ebsOptimized>
+        </item>
+"""
+
+
+def list_bucket_result(count=1000):
+    contents = ''.join(LIST_BUCKET_CONTENTS % {'i': i, 'm': i % 60,
+                                               'size': i * 1024}
+                       for i in range(count))
+    return ('<?xml version="1.0" encoding="UTF-8"?>\n'
+            '<ListBucketResult '
+            'xmlns="http://s3.amazonaws.com/doc/2006-03-01/">\n'
+            '  <Name>bucket</Name><Prefix>logs/</Prefix><Marker/>\n'
+            '  <MaxKeys>1000</MaxKeys><IsTruncated>true</IsTruncated>\n'
+            '%s</ListBucketResult>' % contents)
+
+
+def describe_instances_response(count=100):
+    reservations = []
+    for i in range(count):
+        instance = INSTANCE_ITEM % {'i': i, 'a': i / 256, 'b': i % 256}
+        reservations.append(
+            '    <item>\n'
+            '      <reservationId>r-%08x</reservationId>\n'
+            '      <ownerId>123456789012</ownerId>\n'
+            '      <groupSet/>\n'
+            '      <instancesSet>\n%s      </instancesSet>\n'
+            '    </item>\n' % (i, instance))
+    return ('<?xml version="1.0" encoding="UTF-8"?>\n'
+            '<DescribeInstancesResponse '
+            'xmlns="http://ec2.amazonaws.com/doc/2012-12-01/">\n'
+            '  <requestId>59dbff89-35bd-4eac-99ed-be587EXAMPLE</requestId>\n'
+            '  <reservationSet>\n%s  </reservationSet>\n'
+            '</DescribeInstancesResponse>' % ''.join(reservations))
+
+
+def parse_keys(body, parser):
+    rs = ResultSet([('Contents', Key), ('CommonPrefixes', Prefix)])
+    handler.parse_string(body, handler.XmlHandler(rs, None), parser)
+    return rs
+
+
+def parse_reservations(body, parser):
+    rs = ResultSet([('item', Reservation)])
+    handler.parse_string(body, handler.XmlHandler(rs, None), parser)
+    return rs
+
+
+def key_summary(rs):
+    return [(k.name, k.size, k.etag, k.last_modified, k.owner.id)
+            for k in rs]
+
+
+def reservation_summary(rs):
+    return [(r.id, [(i.id, i.state, i.private_ip_address, i.tags,
+                     sorted(i.block_device_mapping.keys()))
+                    for i in r.instances])
+            for r in rs]
+
+
+def main():
+    iterations = 20
+    if len(sys.argv) > 1:
+        iterations = int(sys.argv[1])
+    fixtures = [
+        ('ListBucketResult', list_bucket_result(), parse_keys,
+         key_summary),
+        ('DescribeInstances', describe_instances_response(),
+         parse_reservations, reservation_summary),
+    ]
+    sax = handler.get_parser('sax')
+    for fixture_name, body, parse, summary in fixtures:
+        expected = summary(parse(body, sax))
+        print '%s (%d bytes)' % (fixture_name, len(body))
+        for name in ('sax', 'expat', 'etree', 'lxml'):
+            parser = handler.get_parser(name)
+            if parser is not handler.PARSERS.get(name):
+                continue
+            if summary(parse(body, parser)) != expected:
+                print '  %-6s produced different objects' % name
+                continue
+            seconds = min(timeit.repeat(lambda: parse(body, parser),
+                                        number=iterations, repeat=3))
+            print '  %-6s %8.2f ms/response' % (name,
+                                                seconds / iterations * 1e3)
+
+
+if __name__ == '__main__':
+    main()
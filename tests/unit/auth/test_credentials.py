@@ -0,0 +1,115 @@
+# Copyright (c) 2013 Amazon.com, Inc. or its affiliates.  All Rights Reserved
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish, dis-
+# tribute, sublicense, and/or sell copies of the Software, and to permit
+# persons to whom the Software is furnished to do so, subject to the fol-
+# lowing conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABIL-
+# ITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT
+# SHALL THE AUTHOR BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
+# IN THE SOFTWARE.
+#
+from tests.unit import unittest
+from mock import Mock
+
+from boto import auth
+from boto.connection import HTTPRequest
+
+
+class RefreshingProvider(object):
+    """
+    A provider whose credentials are replaced by every property read,
+    as if another thread refreshed them in between.
+    """
+    auth_header = 'AWS'
+    security_token_header = 'x-amz-security-token'
+    header_prefix = 'x-amz-'
+    metadata_prefix = 'x-amz-meta-'
+    date_header = 'x-amz-date'
+
+    def __init__(self):
+        self.generation = 0
+
+    def _next(self, name):
+        self.generation += 1
+        return '%s_%d' % (name, self.generation)
+
+    @property
+    def access_key(self):
+        return self._next('access_key')
+
+    @property
+    def secret_key(self):
+        return self._next('secret_key')
+
+    @property
+    def security_token(self):
+        return self._next('token')
+
+    def get_current_credentials(self):
+        return ('access_key_0', 'secret_key_0', 'token_0')
+
+
+class TestCredentialSnapshot(unittest.TestCase):
+    host = 'service.us-east-1.amazonaws.com'
+
+    def make_request(self):
+        return HTTPRequest('GET', 'https', self.host, 443, '/', None,
+                           {'Action': 'Describe'}, {}, '')
+
+    def sign(self, handler_class):
+        provider = RefreshingProvider()
+        handler = handler_class(self.host, Mock(), provider)
+        # Ignore the reads made while setting up the handler.
+        provider.generation = 0
+        request = self.make_request()
+        handler.add_auth(request)
+        return request
+
+    def assert_signed_with_one_snapshot(self, request):
+        signed = ' '.join(
+            [request.path, request.body or ''] +
+            ['%s=%s' % item for item in request.headers.items()] +
+            ['%s=%s' % item for item in request.params.items()])
+        self.assertIn('access_key_0', signed)
+        self.assertNotIn('access_key_1', signed)
+        self.assertNotIn('token_1', signed)
+
+    def test_header_handlers(self):
+        for handler_class in (auth.HmacAuthV1Handler, auth.HmacAuthV2Handler,
+                              auth.HmacAuthV3Handler,
+                              auth.HmacAuthV3HTTPHandler,
+                              auth.HmacAuthV4Handler):
+            request = self.sign(handler_class)
+            self.assert_signed_with_one_snapshot(request)
+
+    def test_query_handlers(self):
+        for handler_class in (auth.QuerySignatureV0AuthHandler,
+                              auth.QuerySignatureV1AuthHandler,
+                              auth.QuerySignatureV2AuthHandler):
+            request = self.sign(handler_class)
+            self.assert_signed_with_one_snapshot(request)
+            self.assertEqual(request.params['AWSAccessKeyId'], 'access_key_0')
+
+    def test_signature_uses_snapshot_secret(self):
+        request = self.sign(auth.HmacAuthV2Handler)
+        handler = auth.HmacAuthV2Handler(self.host, Mock(),
+                                         RefreshingProvider())
+        expected = handler.sign_string(request.headers['Date'],
+                                       'secret_key_0')
+        self.assertEqual(request.headers['Authorization'],
+                         'AWS access_key_0:%s' % expected)
+
+
+if __name__ == '__main__':
+    unittest.main()
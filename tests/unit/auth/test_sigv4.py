@@ -61,3 +61,60 @@ class TestSigV4Handler(unittest.TestCase):
         request.params['Foo.10'] = 'zzz'
         query_string = auth.canonical_query_string(request)
         self.assertEqual(query_string, 'Foo.1=aaa&Foo.10=zzz')
+
+
+class TestSigV4SigningKeyCache(unittest.TestCase):
+    def setUp(self):
+        self.provider = Mock()
+        self.provider.access_key = 'access_key'
+        self.provider.secret_key = 'secret_key'
+        self.auth = HmacAuthV4Handler('glacier.us-east-1.amazonaws.com',
+                                      Mock(), self.provider)
+
+    def make_request(self, timestamp='20130101'):
+        request = HTTPRequest(
+            'GET', 'https', 'glacier.us-east-1.amazonaws.com', 443,
+            '/-/vaults/foo/archives', None, {}, {}, '')
+        request.timestamp = timestamp
+        request.region_name = 'us-east-1'
+        request.service_name = 'glacier'
+        return request
+
+    def uncached_signing_key(self, request):
+        k_date = self.auth._sign('AWS4' + self.provider.secret_key,
+                                 request.timestamp)
+        k_region = self.auth._sign(k_date, request.region_name)
+        k_service = self.auth._sign(k_region, request.service_name)
+        return self.auth._sign(k_service, 'aws4_request')
+
+    def test_signature_matches_uncached_derivation(self):
+        request = self.make_request()
+        expected = self.auth._sign(self.uncached_signing_key(request),
+                                   'string to sign', hex=True)
+        self.assertEqual(self.auth.signature(request, 'string to sign'),
+                         expected)
+        # Second time around the key comes from the cache.
+        self.assertEqual(self.auth.signature(request, 'string to sign'),
+                         expected)
+
+    def test_key_derived_once_per_scope(self):
+        self.auth._sign = Mock(wraps=self.auth._sign)
+        for i in range(10):
+            self.auth.signature(self.make_request(), 'sts %d' % i)
+        # Four HMACs to derive the key, then one per signature.
+        self.assertEqual(self.auth._sign.call_count, 4 + 10)
+
+    def test_key_rolls_over_with_date(self):
+        first = self.auth.signing_key(self.make_request('20130101'))
+        second = self.auth.signing_key(self.make_request('20130102'))
+        self.assertNotEqual(first, second)
+        self.assertEqual(
+            second, self.uncached_signing_key(self.make_request('20130102')))
+
+    def test_key_changes_when_credentials_refresh(self):
+        request = self.make_request()
+        first = self.auth.signing_key(request)
+        self.provider.secret_key = 'new_secret_key'
+        second = self.auth.signing_key(request)
+        self.assertNotEqual(first, second)
+        self.assertEqual(second, self.uncached_signing_key(request))
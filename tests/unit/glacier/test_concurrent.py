@@ -0,0 +1,313 @@
+# Copyright (c) 2013 Amazon.com, Inc. or its affiliates.  All Rights Reserved
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish, dis-
+# tribute, sublicense, and/or sell copies of the Software, and to permit
+# persons to whom the Software is furnished to do so, subject to the fol-
+# lowing conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABIL-
+# ITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT
+# SHALL THE AUTHOR BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
+# IN THE SOFTWARE.
+#
+from __future__ import with_statement
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+from Queue import Queue
+from StringIO import StringIO
+
+import mock
+
+from tests.unit import unittest
+
+from boto.glacier.concurrent import ConcurrentDownloader, ConcurrentUploader
+from boto.glacier.concurrent import UploadWorkerThread, _END_SENTINEL
+from boto.glacier.exceptions import DownloadArchiveError
+from boto.glacier.exceptions import TreeHashDoesNotMatchError
+from boto.glacier.exceptions import UploadArchiveError
+from boto.glacier.utils import bytes_to_hex, chunk_hashes, tree_hash
+from boto.glacier.utils import compute_hashes_from_fileobj
+
+MB = 1024 * 1024
+
+
+class FakeOutput(dict):
+    def __init__(self, data, tree_hash_hex):
+        self['TreeHash'] = tree_hash_hex
+        self.data = data
+
+    def read(self):
+        return self.data
+
+
+class FakeJob(object):
+    """
+    Serves byte ranges of data like an archive retrieval job.  Each
+    range start in fail_ranges maps to how many more times fetching
+    it raises an error; in corrupt_ranges, how many more times it
+    returns bad data.
+    """
+
+    def __init__(self, data):
+        self.id = 'job-1'
+        self.data = data
+        self.archive_size = len(data)
+        self.sha256_treehash = self.tree_hash(data)
+        self.fail_ranges = {}
+        self.corrupt_ranges = {}
+        self.requested = []
+        self.lock = threading.Lock()
+
+    def tree_hash(self, data):
+        return bytes_to_hex(tree_hash(chunk_hashes(data)))
+
+    def get_output(self, byte_range):
+        start, end = byte_range
+        with self.lock:
+            self.requested.append(start)
+            if self.fail_ranges.get(start):
+                self.fail_ranges[start] -= 1
+                raise IOError('connection reset')
+            data = self.data[start:end + 1]
+            expected = self.tree_hash(data)
+            if self.corrupt_ranges.get(start):
+                self.corrupt_ranges[start] -= 1
+                data = 'x' + data[1:]
+        return FakeOutput(data, expected)
+
+
+class TestConcurrentDownloader(unittest.TestCase):
+    def setUp(self):
+        sleep = mock.patch('time.sleep')
+        sleep.start()
+        self.addCleanup(sleep.stop)
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+        self.filename = os.path.join(self.tmpdir, 'archive')
+        self.journal = self.filename + '.journal'
+        self.data = os.urandom(5 * MB + 12345)
+        self.job = FakeJob(self.data)
+
+    def download(self, job=None):
+        job = job or self.job
+        job.requested = []
+        ConcurrentDownloader(job, part_size=MB, num_threads=3).download(
+            self.filename)
+
+    def contents(self):
+        with open(self.filename, 'rb') as f:
+            return f.read()
+
+    def fail_first_attempt(self):
+        self.job.fail_ranges[3 * MB] = 5
+        self.assertRaises(DownloadArchiveError, self.download)
+        self.assertTrue(os.path.exists(self.journal))
+        return sorted(set(range(0, 6 * MB, MB)) -
+                      set(self.downloaded_ranges()))
+
+    def downloaded_ranges(self):
+        with open(self.journal) as f:
+            return [int(line.split('\t')[1]) * MB
+                    for line in f.read().splitlines()[1:]]
+
+    def test_download(self):
+        self.download()
+        self.assertEqual(self.contents(), self.data)
+        self.assertEqual(sorted(self.job.requested), range(0, 6 * MB, MB))
+        self.assertFalse(os.path.exists(self.journal))
+
+    def test_bad_parts_are_fetched_again(self):
+        self.job.corrupt_ranges[MB] = 2
+        self.download()
+        self.assertEqual(self.contents(), self.data)
+        self.assertEqual(self.job.requested.count(MB), 3)
+
+    def test_resume(self):
+        missing = self.fail_first_attempt()
+        self.assertTrue(3 * MB in missing)
+        self.download()
+        self.assertEqual(self.contents(), self.data)
+        self.assertEqual(sorted(self.job.requested), missing)
+        self.assertFalse(os.path.exists(self.journal))
+
+    def test_resume_checks_parts_on_workers(self):
+        self.fail_first_attempt()
+        threads = []
+        def record_thread(data):
+            threads.append(threading.current_thread())
+            return chunk_hashes(data)
+        with mock.patch('boto.glacier.concurrent.chunk_hashes',
+                        record_thread):
+            self.download()
+        self.assertEqual(self.contents(), self.data)
+        # Each part, journaled or not, is hashed once, and never on the
+        # calling thread.
+        self.assertEqual(len(threads), 6)
+        self.assertFalse(threading.current_thread() in threads)
+
+    def test_resume_checks_the_data_on_disk(self):
+        missing = self.fail_first_attempt()
+        damaged = self.downloaded_ranges()[0]
+        with open(self.filename, 'r+b') as f:
+            f.seek(damaged + 10)
+            f.write('damage')
+        self.download()
+        self.assertEqual(self.contents(), self.data)
+        self.assertEqual(sorted(self.job.requested),
+                         sorted(missing + [damaged]))
+
+    def test_journal_for_another_job_is_ignored(self):
+        self.fail_first_attempt()
+        job = FakeJob(self.data)
+        job.id = 'job-2'
+        self.download(job)
+        self.assertEqual(self.contents(), self.data)
+        self.assertEqual(sorted(job.requested), range(0, 6 * MB, MB))
+
+    def test_archive_tree_hash_is_checked(self):
+        self.job.sha256_treehash = '0' * 64
+        self.assertRaises(TreeHashDoesNotMatchError, self.download)
+
+    def test_part_size(self):
+        for part_size in (MB / 2, 3 * MB):
+            self.assertRaises(ValueError, ConcurrentDownloader, self.job,
+                              part_size)
+        ConcurrentDownloader(self.job, 8 * MB)
+
+
+
+class FakeStream(object):
+    """
+    A file object without a fileno that returns short reads, like a
+    pipe.
+    """
+
+    def __init__(self, data):
+        self.data = data
+        self.bytes_read = 0
+
+    def read(self, size):
+        size = min(size, 100000)
+        data = self.data[self.bytes_read:self.bytes_read + size]
+        self.bytes_read += len(data)
+        return data
+
+
+class FakeVaultAPI(object):
+    def __init__(self, stream=None, fail=False):
+        self.parts = {}
+        self.completed = None
+        self.aborted = False
+        self.fail = fail
+        self.stream = stream
+        self.max_bytes_ahead = 0
+        self.lock = threading.Lock()
+
+    def initiate_multipart_upload(self, vault_name, part_size, description):
+        self.part_size = part_size
+        return {'UploadId': 'upload-1'}
+
+    def upload_part(self, vault_name, upload_id, linear_hash, tree_hash_hex,
+                    byte_range, data):
+        if self.fail:
+            raise IOError('connection reset')
+        with self.lock:
+            if self.stream is not None:
+                self.max_bytes_ahead = max(
+                    self.max_bytes_ahead, self.stream.bytes_read -
+                    len(self.parts) * self.part_size)
+        # Give the producer a chance to get ahead.
+        threading.Event().wait(0.01)
+        data = str(data)
+        assert hashlib.sha256(data).hexdigest() == linear_hash
+        assert bytes_to_hex(tree_hash(chunk_hashes(data))) == tree_hash_hex
+        with self.lock:
+            self.parts[byte_range] = data
+        return mock.Mock()
+
+    def complete_multipart_upload(self, vault_name, upload_id, tree_hash_hex,
+                                  size):
+        self.completed = (tree_hash_hex, size)
+        return {'ArchiveId': 'archive-1'}
+
+    def abort_multipart_upload(self, vault_name, upload_id):
+        self.aborted = True
+
+    def archive(self):
+        return ''.join(self.parts[r] for r in sorted(self.parts))
+
+
+class TestConcurrentUploader(unittest.TestCase):
+    def setUp(self):
+        sleep = mock.patch('time.sleep')
+        sleep.start()
+        self.addCleanup(sleep.stop)
+        self.data = os.urandom(9 * MB + 12345)
+        self.fileobj = tempfile.NamedTemporaryFile()
+        self.addCleanup(self.fileobj.close)
+        self.fileobj.write(self.data)
+        self.fileobj.flush()
+        self.expected_hash = compute_hashes_from_fileobj(
+            StringIO(self.data))[1]
+
+    def test_upload_file(self):
+        api = FakeVaultAPI()
+        uploader = ConcurrentUploader(api, 'vault', num_threads=3)
+        self.assertEqual(uploader.upload(self.fileobj.name), 'archive-1')
+        self.assertEqual(sorted(api.parts),
+                         [(0, 4 * MB - 1), (4 * MB, 8 * MB - 1),
+                          (8 * MB, len(self.data) - 1)])
+        self.assertEqual(api.archive(), self.data)
+        self.assertEqual(api.completed, (self.expected_hash, len(self.data)))
+
+    def test_upload_stream(self):
+        stream = FakeStream(self.data)
+        api = FakeVaultAPI(stream)
+        uploader = ConcurrentUploader(api, 'vault', part_size=MB,
+                                      num_threads=4, max_buffer_size=2 * MB)
+        uploader.upload_fileobj(stream)
+        self.assertEqual(api.archive(), self.data)
+        self.assertEqual(api.completed, (self.expected_hash, len(self.data)))
+        # No more than two parts are ever read ahead of the parts
+        # uploaded.
+        self.assertTrue(api.max_bytes_ahead <= 2 * MB)
+
+    def test_failed_upload_is_aborted(self):
+        api = FakeVaultAPI(fail=True)
+        uploader = ConcurrentUploader(api, 'vault', num_threads=2,
+                                      max_buffer_size=MB)
+        self.assertRaises(UploadArchiveError, uploader.upload,
+                          self.fileobj.name)
+        self.assertTrue(api.aborted)
+        self.assertEqual(api.completed, None)
+
+    def test_worker_reads_old_style_work_items(self):
+        api = FakeVaultAPI()
+        api.part_size = 4 * MB
+        worker_queue = Queue()
+        result_queue = Queue()
+        worker = UploadWorkerThread(api, 'vault', self.fileobj.name,
+                                    'upload-1', worker_queue, result_queue)
+        worker_queue.put((1, 4 * MB))
+        worker_queue.put(_END_SENTINEL)
+        worker.run()
+        part_number, tree_hash_bytes = result_queue.get_nowait()
+        self.assertEqual(part_number, 1)
+        self.assertEqual(api.parts.keys(), [(4 * MB, 8 * MB - 1)])
+        self.assertEqual(api.archive(), self.data[4 * MB:8 * MB])
+
+
+if __name__ == '__main__':
+    unittest.main()
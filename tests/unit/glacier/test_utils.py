@@ -19,12 +19,34 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
 # IN THE SOFTWARE.
 #
+import hashlib
+import os
+import tempfile
 
 from tests.unit import unittest
 
 from boto.glacier import utils
 
 
+def reference_tree_hash(hashes):
+    # The original implementation, which collapsed each level with
+    # list.pop(0).
+    hashes = list(hashes)
+    while len(hashes) > 1:
+        new_hashes = []
+        while True:
+            if len(hashes) > 1:
+                first = hashes.pop(0)
+                second = hashes.pop(0)
+                new_hashes.append(hashlib.sha256(first + second).digest())
+            elif len(hashes) == 1:
+                new_hashes.append(hashes.pop(0))
+            else:
+                break
+        hashes.extend(new_hashes)
+    return hashes[0]
+
+
 class TestPartSizeCalculations(unittest.TestCase):
     def test_small_values_still_use_default_part_size(self):
         self.assertEqual(utils.minimum_part_size(1), 4 * 1024 * 1024)
@@ -49,3 +71,69 @@ class TestPartSizeCalculations(unittest.TestCase):
     def test_file_size_too_large(self):
         with self.assertRaises(ValueError):
             utils.minimum_part_size((40000 * 1024 * 1024 * 1024) + 1)
+
+
+class TestTreeHash(unittest.TestCase):
+    def test_matches_reference(self):
+        hashes = [hashlib.sha256(str(i)).digest() for i in range(70)]
+        for count in range(1, len(hashes) + 1):
+            self.assertEqual(utils.tree_hash(hashes[:count]),
+                             reference_tree_hash(hashes[:count]))
+
+    def test_known_values(self):
+        a, b, c = [hashlib.sha256(x).digest() for x in 'abc']
+        self.assertEqual(utils.tree_hash([a]), a)
+        self.assertEqual(
+            utils.tree_hash([a, b, c]),
+            hashlib.sha256(hashlib.sha256(a + b).digest() + c).digest())
+
+    def test_accepts_iterators(self):
+        hashes = [hashlib.sha256(str(i)).digest() for i in range(5)]
+        self.assertEqual(utils.tree_hash(iter(hashes)),
+                         reference_tree_hash(hashes))
+
+    def test_bytes_to_hex(self):
+        self.assertEqual(utils.bytes_to_hex('\x00\x0f\xff'), '000fff')
+
+
+class TestHashesFromFile(unittest.TestCase):
+    chunk_size = 1000
+
+    def setUp(self):
+        self.data = os.urandom(64 * self.chunk_size * 3 + 123)
+        self.fileobj = tempfile.TemporaryFile()
+        self.addCleanup(self.fileobj.close)
+        self.fileobj.write(self.data)
+        self.fileobj.flush()
+
+    def chunk_hashes(self, **kwargs):
+        return utils.chunk_hashes_from_file(self.fileobj, self.chunk_size,
+                                            **kwargs)
+
+    def test_same_as_chunk_hashes(self):
+        expected = utils.chunk_hashes(self.data, self.chunk_size)
+        for max_workers in (1, 4):
+            self.assertEqual(self.chunk_hashes(max_workers=max_workers),
+                             expected)
+
+    def test_range(self):
+        data = self.data[1500:1500 + 100000]
+        self.assertEqual(
+            self.chunk_hashes(offset=1500, size=100000, max_workers=3),
+            utils.chunk_hashes(data, self.chunk_size))
+        self.assertEqual(self.chunk_hashes(offset=len(self.data)), [])
+
+    def test_tree_hash_from_file(self):
+        self.fileobj.seek(0)
+        linear, tree = utils.compute_hashes_from_fileobj(self.fileobj,
+                                                         self.chunk_size)
+        self.assertEqual(utils.tree_hash_from_file(self.fileobj,
+                                                   self.chunk_size,
+                                                   max_workers=4), tree)
+
+    def test_empty_file(self):
+        empty = tempfile.TemporaryFile()
+        self.addCleanup(empty.close)
+        self.assertEqual(utils.chunk_hashes_from_file(empty), [])
+        self.assertEqual(utils.tree_hash_from_file(empty),
+                         hashlib.sha256('').hexdigest())
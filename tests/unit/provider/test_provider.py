@@ -1,9 +1,16 @@
 #!/usr/bin/env python
+import BaseHTTPServer
+import json
+import threading
+import time
+import weakref
 from datetime import datetime, timedelta
+from functools import partial
 
 from tests.unit import unittest
 import mock
 
+import boto.utils
 from boto import provider
 
 
@@ -145,5 +152,145 @@ class TestProvider(unittest.TestCase):
         self.assertEqual(p.security_token, 'second_token')
 
 
+class MetadataHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    def do_GET(self):
+        server = self.server
+        server.requests.append(self.path)
+        base = '/latest/meta-data/'
+        body = {
+            base: 'iam/',
+            base + 'iam/': 'security-credentials/',
+            base + 'iam/security-credentials/': 'role',
+            base + 'iam/security-credentials/role': json.dumps(
+                server.credentials),
+        }.get(self.path)
+        if body is None:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def make_credentials(name, expires_in):
+    expiration = datetime.utcnow() + timedelta(seconds=expires_in)
+    return {'AccessKeyId': name + '_access_key',
+            'SecretAccessKey': name + '_secret_key',
+            'Token': name + '_token',
+            'Code': 'Success',
+            'Type': 'AWS-HMAC',
+            'Expiration': expiration.strftime('%Y-%m-%dT%H:%M:%SZ')}
+
+
+class TestBackgroundRefresh(unittest.TestCase):
+    def setUp(self):
+        self.server = BaseHTTPServer.HTTPServer(('127.0.0.1', 0),
+                                                MetadataHandler)
+        self.server.requests = []
+        self.server.credentials = make_credentials('first', 10 * 60)
+        thread = threading.Thread(target=self.server.serve_forever,
+                                  args=(0.01,))
+        thread.setDaemon(True)
+        thread.start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        url = 'http://127.0.0.1:%d' % self.server.server_port
+        patches = [
+            mock.patch('boto.utils.get_instance_metadata',
+                       partial(boto.utils.get_instance_metadata, url=url)),
+            mock.patch('os.environ', {}),
+            mock.patch('boto.provider.config.has_option',
+                       lambda *args: False),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def wait_for(self, condition, timeout=5):
+        deadline = time.time() + timeout
+        while not condition() and time.time() < deadline:
+            time.sleep(0.01)
+        return condition()
+
+    def test_credentials_renewed_ahead_of_expiry(self):
+        p = provider.Provider('aws')
+        self.assertEqual(p.access_key, 'first_access_key')
+        self.server.credentials = make_credentials('second', 60 * 60)
+        p.start_background_refresh()
+        self.addCleanup(p.stop_background_refresh)
+        self.assertTrue(self.wait_for(
+            lambda: p.access_key == 'second_access_key'))
+        self.assertEqual(p.secret_key, 'second_secret_key')
+        self.assertEqual(p.security_token, 'second_token')
+
+    def test_request_path_does_not_wait_for_refresh(self):
+        self.server.credentials = make_credentials('first', 2 * 60)
+        p = provider.Provider('aws')
+        requests = len(self.server.requests)
+        self.server.credentials = make_credentials('second', 60 * 60)
+        # Another thread is already fetching new credentials.
+        p._refresh_lock.acquire()
+        try:
+            self.assertEqual(p.access_key, 'first_access_key')
+        finally:
+            p._refresh_lock.release()
+        self.assertEqual(len(self.server.requests), requests)
+        self.assertEqual(p.access_key, 'second_access_key')
+
+    def test_static_credentials_are_not_refreshed(self):
+        p = provider.Provider('aws', 'access_key', 'secret_key')
+        p.start_background_refresh()
+        self.assertNotIn(p, provider._refresher._providers)
+        self.assertEqual(self.server.requests, [])
+
+    def test_stop(self):
+        p = provider.Provider('aws')
+        p.start_background_refresh()
+        thread = provider._refresher._thread
+        p.stop_background_refresh()
+        self.assertTrue(self.wait_for(lambda: not thread.isAlive()))
+
+    def test_one_thread_refreshes_every_provider(self):
+        providers = [provider.Provider('aws') for i in range(5)]
+        self.server.credentials = make_credentials('second', 60 * 60)
+        requests = len(self.server.requests)
+        refresher = provider._CredentialRefresher()
+        patch = mock.patch('boto.provider._refresher', refresher)
+        patch.start()
+        self.addCleanup(patch.stop)
+        # Register them all before the thread starts, so that
+        # they are all due on its first pass.
+        for p in providers:
+            refresher._providers[p] = True
+            self.addCleanup(p.stop_background_refresh)
+        threads = set(threading.enumerate())
+        for p in providers:
+            p.start_background_refresh()
+        self.assertEqual(len(set(threading.enumerate()) - threads), 1)
+        self.assertTrue(self.wait_for(lambda: all(
+            p.access_key == 'second_access_key' for p in providers)))
+        # A single fetch from the metadata server renewed all of them.
+        credential_requests = [
+            path for path in self.server.requests[requests:]
+            if path.endswith('/security-credentials/role')]
+        self.assertEqual(len(credential_requests), 1)
+
+    def test_unused_provider_is_released(self):
+        self.server.credentials = make_credentials('first', 60 * 60)
+        p = provider.Provider('aws')
+        p.start_background_refresh()
+        thread = provider._refresher._thread
+        ref = weakref.ref(p)
+        del p
+        self.assertTrue(self.wait_for(lambda: ref() is None))
+        # The thread notices on its next wakeup that nothing is left.
+        provider._refresher._wakeup.set()
+        self.assertTrue(self.wait_for(lambda: not thread.isAlive()))
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,350 @@
+# Copyright (c) 2013 Amazon.com, Inc. or its affiliates.  All Rights Reserved
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish, dis-
+# tribute, sublicense, and/or sell copies of the Software, and to permit
+# persons to whom the Software is furnished to do so, subject to the fol-
+# lowing conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABIL-
+# ITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT
+# SHALL THE AUTHOR BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
+# IN THE SOFTWARE.
+#
+"""
+An in-memory stand-in for S3, for tests that make many requests,
+possibly from several threads.  FakeS3.connect() returns an
+S3Connection whose HTTP connections are served by the fake.
+"""
+from __future__ import with_statement
+import cgi
+import httplib
+import re
+import threading
+import urllib
+from hashlib import md5
+from StringIO import StringIO
+from xml.sax.saxutils import escape, unescape
+
+from boto.s3.connection import S3Connection, OrdinaryCallingFormat
+
+
+class FakeResponse(object):
+    def __init__(self, status, body='', headers=None):
+        self.status = status
+        self.reason = 'Reason'
+        self.body = body
+        self.headers = dict((k.lower(), v)
+                            for k, v in (headers or {}).items())
+        self.headers.setdefault('content-length', str(len(body)))
+        self.msg = httplib.HTTPMessage(StringIO(''.join(
+            '%s: %s\r\n' % item for item in self.headers.items()) + '\r\n'))
+
+    def read(self, amt=None):
+        if amt is None:
+            data, self.body = self.body, ''
+        else:
+            data, self.body = self.body[:amt], self.body[amt:]
+        return data
+
+    def getheader(self, name, default=None):
+        return self.headers.get(name.lower(), default)
+
+    def getheaders(self):
+        return self.headers.items()
+
+    def isclosed(self):
+        return True
+
+
+class FakeHTTPConnection(object):
+    def __init__(self, server):
+        self.server = server
+        self._HTTPConnection__response = None
+        self.debuglevel = 0
+
+    def request(self, method, path, body=None, headers=None):
+        self.putrequest(method, path)
+        for name, value in (headers or {}).items():
+            self.putheader(name, value)
+        self.endheaders()
+        if body:
+            self.send(body)
+
+    def putrequest(self, method, path):
+        self.method = method
+        self.path = path
+        self.headers = {}
+        self.body = []
+
+    def putheader(self, name, value):
+        self.headers[name.lower()] = value
+
+    def endheaders(self):
+        pass
+
+    def send(self, data):
+        self.body.append(data)
+
+    def getresponse(self):
+        return self.server.handle(self.method, self.path, self.headers,
+                                  ''.join(self.body))
+
+    def set_debuglevel(self, level):
+        self.debuglevel = level
+
+    def close(self):
+        pass
+
+
+class FakeS3(object):
+    """
+    Objects are kept in self.objects as {(bucket, key): data}, and the
+    headers they were PUT with in self.object_headers.  Tests
+    can make the fake misbehave by setting, per part number, how many
+    times a part upload gets a bad ETag (corrupt_parts), and per range
+    start, how many times a ranged GET returns too few bytes
+    (truncated_ranges).  Bucket listings return at most max_keys
+    entries a page.
+    """
+
+    max_keys = 1000
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.objects = {}
+        self.object_headers = {}
+        self.uploads = {}
+        self.cancelled = []
+        self.requests = []
+        self.corrupt_parts = {}
+        self.truncated_ranges = {}
+        self.next_upload_id = 1
+
+    def connect(self):
+        return S3Connection('access_key', 'secret_key', is_secure=True,
+                            calling_format=OrdinaryCallingFormat(),
+                            https_connection_factory=(self._connection, ()))
+
+    def _connection(self, host, **kwargs):
+        return FakeHTTPConnection(self)
+
+    def handle(self, method, path, headers, body):
+        path, _, query = path.partition('?')
+        params = dict((k, v[0]) for k, v in
+                      cgi.parse_qs(query, keep_blank_values=True).items())
+        bucket, _, key = path.lstrip('/').partition('/')
+        with self.lock:
+            self.requests.append((method, path, params))
+            handler = getattr(self, '_%s' % method.lower())
+            return handler(bucket, key, params, headers, body)
+
+    def _etag(self, data):
+        return '"%s"' % md5(data).hexdigest()
+
+    def _post(self, bucket, key, params, headers, body):
+        if 'delete' in params:
+            return self._delete_objects(bucket, body)
+        if 'uploads' in params:
+            upload_id = 'upload-%d' % self.next_upload_id
+            self.next_upload_id += 1
+            self.uploads[upload_id] = {'key': (bucket, key), 'parts': {},
+                                       'headers': headers}
+            return FakeResponse(200, """<?xml version="1.0" encoding="UTF-8"?>
+<InitiateMultipartUploadResult>
+  <Bucket>%s</Bucket><Key>%s</Key><UploadId>%s</UploadId>
+</InitiateMultipartUploadResult>""" % (bucket, key, upload_id))
+        upload = self.uploads.pop(params['uploadId'])
+        parts = upload['parts']
+        data = ''.join(parts[n] for n in sorted(parts))
+        self.objects[upload['key']] = data
+        self.object_headers[upload['key']] = upload['headers']
+        return FakeResponse(200, """<?xml version="1.0" encoding="UTF-8"?>
+<CompleteMultipartUploadResult>
+  <Bucket>%s</Bucket><Key>%s</Key><ETag>"multipart-%d"</ETag>
+</CompleteMultipartUploadResult>""" % (bucket, key, len(parts)))
+
+    def _put(self, bucket, key, params, headers, body):
+        if 'x-amz-copy-source' in headers:
+            return self._copy(bucket, key, params, headers)
+        if 'uploadId' in params:
+            part_num = int(params['partNumber'])
+            self.uploads[params['uploadId']]['parts'][part_num] = body
+            etag = self._etag(body)
+            if self.corrupt_parts.get(part_num):
+                self.corrupt_parts[part_num] -= 1
+                etag = '"bad"'
+            return FakeResponse(200, headers={'ETag': etag})
+        if headers.get('transfer-encoding') == 'chunked':
+            body = self._unchunk(body)
+        self.objects[(bucket, key)] = body
+        self.object_headers[(bucket, key)] = headers
+        return FakeResponse(200, headers={'ETag': self._etag(body)})
+
+    def _unchunk(self, body):
+        data = []
+        while True:
+            size, _, body = body.partition('\r\n')
+            size = int(size.rstrip(';'), 16)
+            if not size:
+                return ''.join(data)
+            data.append(body[:size])
+            body = body[size + 2:]
+
+    def _copy(self, bucket, key, params, headers):
+        source = urllib.unquote(headers['x-amz-copy-source'].split('?')[0])
+        source = tuple(source.lstrip('/').split('/', 1))
+        if source not in self.objects:
+            return FakeResponse(404, '<Error><Code>NoSuchKey</Code></Error>')
+        data = self.objects[source]
+        if headers.get('x-amz-copy-source-if-match',
+                       self._etag(data)) != self._etag(data):
+            return FakeResponse(412, '<Error><Code>PreconditionFailed</Code>'
+                                '</Error>')
+        match = re.match(r'bytes=(\d+)-(\d+)$',
+                         headers.get('x-amz-copy-source-range', ''))
+        if match:
+            data = data[int(match.group(1)):int(match.group(2)) + 1]
+        if 'uploadId' in params:
+            part_num = int(params['partNumber'])
+            self.uploads[params['uploadId']]['parts'][part_num] = data
+            return FakeResponse(200, '<CopyPartResult><ETag>%s</ETag>'
+                                '</CopyPartResult>' % self._etag(data))
+        self.objects[(bucket, key)] = data
+        if headers.get('x-amz-metadata-directive') == 'REPLACE':
+            self.object_headers[(bucket, key)] = headers
+        else:
+            self.object_headers[(bucket, key)] = \
+                self.object_headers.get(source, {})
+        return FakeResponse(200, '<CopyObjectResult><ETag>%s</ETag>'
+                            '</CopyObjectResult>' % self._etag(data))
+
+    def _get(self, bucket, key, params, headers, body):
+        if not key:
+            return self._list(bucket, params)
+        if 'uploadId' in params:
+            if params['uploadId'] not in self.uploads:
+                return FakeResponse(404, '<Error><Code>NoSuchUpload</Code>'
+                                    '</Error>')
+            parts = self.uploads[params['uploadId']]['parts']
+            xml = ''.join('<Part><PartNumber>%d</PartNumber>'
+                          '<ETag>%s</ETag><Size>%d</Size></Part>' %
+                          (n, self._etag(parts[n]), len(parts[n]))
+                          for n in sorted(parts))
+            return FakeResponse(200, """<?xml version="1.0" encoding="UTF-8"?>
+<ListPartsResult><IsTruncated>false</IsTruncated>%s</ListPartsResult>""" % xml)
+        if (bucket, key) not in self.objects:
+            return FakeResponse(404, '<Error><Code>NoSuchKey</Code></Error>')
+        data = self.objects[(bucket, key)]
+        etag = self._etag(data)
+        if headers.get('if-match', etag) != etag:
+            return FakeResponse(412, '<Error><Code>PreconditionFailed</Code>'
+                                '</Error>')
+        response_headers = {'ETag': etag}
+        encoding = self.object_headers.get((bucket, key),
+                                           {}).get('content-encoding')
+        if encoding:
+            response_headers['Content-Encoding'] = encoding
+        match = re.match(r'bytes=(\d+)-(\d*)$', headers.get('range', ''))
+        if match is None:
+            return FakeResponse(200, data, response_headers)
+        start = int(match.group(1))
+        end = min(int(match.group(2) or len(data) - 1), len(data) - 1)
+        if start >= len(data):
+            return FakeResponse(416)
+        body = data[start:end + 1]
+        if self.truncated_ranges.get(start):
+            self.truncated_ranges[start] -= 1
+            body = body[:-1]
+        return FakeResponse(206, body, {
+            'ETag': etag,
+            'Content-Range': 'bytes %d-%d/%d' % (start, end, len(data))})
+
+    def _list(self, bucket, params):
+        prefix = params.get('prefix', '')
+        marker = params.get('marker', '')
+        delimiter = params.get('delimiter', '')
+        max_keys = min(int(params.get('max-keys', 1000)), self.max_keys)
+        entries = []
+        for name in sorted(k for b, k in self.objects if b == bucket):
+            if not name.startswith(prefix):
+                continue
+            rolled_up = None
+            if delimiter:
+                pos = name.find(delimiter, len(prefix))
+                if pos >= 0:
+                    rolled_up = name[:pos + len(delimiter)]
+            if (rolled_up or name) <= marker:
+                continue
+            if rolled_up and entries and entries[-1] == ('prefix', rolled_up):
+                continue
+            if len(entries) == max_keys:
+                truncated = True
+                break
+            if rolled_up:
+                entries.append(('prefix', rolled_up))
+            else:
+                entries.append(('key', name))
+        else:
+            truncated = False
+        xml = []
+        for kind, name in entries:
+            if kind == 'prefix':
+                xml.append('<CommonPrefixes><Prefix>%s</Prefix>'
+                           '</CommonPrefixes>' % escape(name))
+            else:
+                data = self.objects[(bucket, name)]
+                xml.append('<Contents><Key>%s</Key><ETag>%s</ETag>'
+                           '<Size>%d</Size></Contents>' %
+                           (escape(name), escape(self._etag(data)),
+                            len(data)))
+        if truncated and delimiter:
+            xml.append('<NextMarker>%s</NextMarker>' %
+                       escape(entries[-1][1]))
+        return FakeResponse(200, """<?xml version="1.0" encoding="UTF-8"?>
+<ListBucketResult><Name>%s</Name><IsTruncated>%s</IsTruncated>%s
+</ListBucketResult>""" % (bucket, truncated and 'true' or 'false',
+                          ''.join(xml)))
+
+    def _delete_objects(self, bucket, body):
+        names = re.findall(r'<Key>(.*?)</Key>', body)
+        if len(names) > 1000:
+            return FakeResponse(400, '<Error><Code>MalformedXML</Code>'
+                                '</Error>')
+        xml = []
+        for name in names:
+            name = unescape(name)
+            self.objects.pop((bucket, name), None)
+            if '<Quiet>true</Quiet>' not in body:
+                xml.append('<Deleted><Key>%s</Key></Deleted>' % escape(name))
+        return FakeResponse(200, """<?xml version="1.0" encoding="UTF-8"?>
+<DeleteResult>%s</DeleteResult>""" % ''.join(xml))
+
+    def _head(self, bucket, key, params, headers, body):
+        if key and (bucket, key) not in self.objects:
+            return FakeResponse(404)
+        data = self.objects.get((bucket, key), '')
+        response_headers = {'ETag': self._etag(data),
+                            'Content-Length': len(data)}
+        for name, value in self.object_headers.get((bucket, key),
+                                                   {}).items():
+            if (name.startswith('x-amz-meta-') or
+                    name in ('content-type', 'content-encoding')):
+                response_headers[name] = value
+        return FakeResponse(200, headers=response_headers)
+
+    def _delete(self, bucket, key, params, headers, body):
+        if 'uploadId' in params:
+            self.uploads.pop(params['uploadId'], None)
+            self.cancelled.append(params['uploadId'])
+        else:
+            self.objects.pop((bucket, key), None)
+        return FakeResponse(204)
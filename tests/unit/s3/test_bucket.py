@@ -0,0 +1,87 @@
+# Copyright (c) 2013 Amazon.com, Inc. or its affiliates.  All Rights Reserved
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish, dis-
+# tribute, sublicense, and/or sell copies of the Software, and to permit
+# persons to whom the Software is furnished to do so, subject to the fol-
+# lowing conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABIL-
+# ITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT
+# SHALL THE AUTHOR BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
+# IN THE SOFTWARE.
+#
+import mock
+
+from tests.unit import unittest
+from tests.unit.s3.fake_s3 import FakeS3
+from boto.exception import S3ResponseError
+from boto.s3.prefix import Prefix
+
+
+class TestDeleteKeys(unittest.TestCase):
+    def setUp(self):
+        self.s3 = FakeS3()
+        self.bucket = self.s3.connect().get_bucket('bucket', validate=False)
+        self.names = ['key-%05d' % i for i in range(2500)]
+        for name in self.names:
+            self.s3.objects[('bucket', name)] = ''
+
+    def delete_requests(self):
+        return len([r for r in self.s3.requests if r[0] == 'POST'])
+
+    def test_delete_keys(self):
+        result = self.bucket.delete_keys(self.names + [Prefix(name='p/')])
+        self.assertEqual(len(result.deleted), 2500)
+        self.assertEqual([e.code for e in result.errors], ['PrefixSkipped'])
+        self.assertEqual(self.s3.objects, {})
+        self.assertEqual(self.delete_requests(), 3)
+
+    def test_delete_keys_in_batches(self):
+        results = list(self.bucket.delete_keys_in_batches(
+            iter(self.names), max_workers=2))
+        self.assertEqual([len(r.deleted) for r in results], [1000, 1000, 500])
+        self.assertEqual(results[1].deleted[0].key, 'key-01000')
+        self.assertEqual(self.s3.objects, {})
+
+    def test_reads_keys_lazily(self):
+        taken = []
+
+        def keys():
+            for name in self.names:
+                taken.append(name)
+                yield name
+
+        results = self.bucket.delete_keys_in_batches(keys(), max_workers=1)
+        results.next()
+        # The first result is ready once a second batch is in flight.
+        self.assertTrue(len(taken) <= 2001)
+        results.close()
+
+    def test_deletes_listed_entries(self):
+        self.s3.max_keys = 700
+        results = self.bucket.delete_keys_in_batches(
+            self.bucket.list(compact=True), quiet=True)
+        self.assertEqual(sum(len(r.errors) for r in results), 0)
+        self.assertEqual(self.s3.objects, {})
+
+    def test_failure_stops_deleting(self):
+        error = S3ResponseError(403, 'Forbidden')
+        with mock.patch.object(self.bucket, '_delete_batch',
+                               side_effect=error) as delete_batch:
+            results = self.bucket.delete_keys_in_batches(self.names * 10,
+                                                         max_workers=1)
+            self.assertRaises(S3ResponseError, list, results)
+        self.assertEqual(delete_batch.call_count, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
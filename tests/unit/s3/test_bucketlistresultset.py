@@ -0,0 +1,124 @@
+# Copyright (c) 2013 Amazon.com, Inc. or its affiliates.  All Rights Reserved
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish, dis-
+# tribute, sublicense, and/or sell copies of the Software, and to permit
+# persons to whom the Software is furnished to do so, subject to the fol-
+# lowing conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABIL-
+# ITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT
+# SHALL THE AUTHOR BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
+# IN THE SOFTWARE.
+#
+import hashlib
+
+import mock
+
+from tests.unit import unittest
+from tests.unit.s3.fake_s3 import FakeS3
+from boto.exception import S3ResponseError
+from boto.s3.bucketlistresultset import find_split_points
+from boto.s3.prefix import Prefix
+
+
+class TestParallelListing(unittest.TestCase):
+    def setUp(self):
+        self.s3 = FakeS3()
+        self.s3.max_keys = 7
+        self.bucket = self.s3.connect().get_bucket('bucket', validate=False)
+        self.names = []
+        for top in 'abcde':
+            for sub in 'xyz':
+                for n in range(10):
+                    self.names.append('%s/%s/%02d' % (top, sub, n))
+        self.names.append('loose')
+        self.names.sort()
+        for name in self.names:
+            self.s3.objects[('bucket', name)] = name
+
+    def names_of(self, keys):
+        return [k.name for k in keys]
+
+    def test_matches_sequential_listing(self):
+        keys = self.bucket.list(parallel=True)
+        self.assertEqual(self.names_of(keys), self.names)
+        self.assertEqual(self.names_of(self.bucket.list()), self.names)
+
+    def test_unordered_yields_every_key_once(self):
+        keys = self.bucket.list(parallel=True, ordered=False)
+        self.assertEqual(sorted(self.names_of(keys)), self.names)
+
+    def test_split_points(self):
+        points = find_split_points(self.bucket, min_shards=4)
+        self.assertEqual(points, ['a/', 'b/', 'c/', 'd/', 'e/'])
+        points = find_split_points(self.bucket, min_shards=6)
+        self.assertEqual(len(points), 20)
+        self.assertEqual(points[:4], ['a/', 'a/x/', 'a/y/', 'a/z/'])
+
+    def test_caller_split_points_and_marker(self):
+        keys = self.bucket.list(parallel=True, marker='b/y/05',
+                                split_points=['a', 'b/y/05', 'c/q', 'zz'])
+        expected = [n for n in self.names if n > 'b/y/05']
+        self.assertEqual(self.names_of(keys), expected)
+
+    def test_prefix_and_delimiter(self):
+        # A split point inside a rolled-up prefix mustn't repeat it.
+        keys = list(self.bucket.list(prefix='c/', delimiter='/',
+                                     parallel=True,
+                                     split_points=['c/x/05', 'c/y/']))
+        self.assertTrue(all(isinstance(k, Prefix) for k in keys))
+        self.assertEqual(self.names_of(keys), ['c/x/', 'c/y/', 'c/z/'])
+
+    def test_stopping_early(self):
+        keys = iter(self.bucket.list(parallel=True))
+        self.assertEqual(keys.next().name, self.names[0])
+        keys.close()
+
+    def test_error_is_raised(self):
+        error = S3ResponseError(500, 'Internal Error')
+        with mock.patch.object(self.bucket, 'get_all_keys',
+                               side_effect=error):
+            keys = self.bucket.list(parallel=True, split_points=['b'])
+            self.assertRaises(S3ResponseError, list, keys)
+
+
+class TestFlatKeySpace(unittest.TestCase):
+    def setUp(self):
+        self.s3 = FakeS3()
+        self.s3.max_keys = 50
+        self.bucket = self.s3.connect().get_bucket('bucket', validate=False)
+        self.names = sorted(hashlib.md5(str(i)).hexdigest()
+                            for i in range(400))
+        for name in self.names:
+            self.s3.objects[('bucket', name)] = name
+
+    def test_split_on_next_character(self):
+        points = find_split_points(self.bucket, min_shards=16)
+        self.assertEqual(points, list('0123456789abcdef'))
+        points = find_split_points(self.bucket, min_shards=20)
+        self.assertEqual(len(points), 256)
+        self.assertEqual(points[:3], ['00', '01', '02'])
+
+    def test_listing_is_sharded(self):
+        self.s3.requests = []
+        keys = self.bucket.list(parallel=True)
+        self.assertEqual([k.name for k in keys], self.names)
+        # Each of the 16 shards plus the probe was listed.
+        self.assertTrue(len(self.s3.requests) >= 17)
+
+    def test_small_bucket_is_not_split(self):
+        self.s3.max_keys = 1000
+        self.assertEqual(find_split_points(self.bucket), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
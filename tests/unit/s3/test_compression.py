@@ -0,0 +1,193 @@
+# Copyright (c) 2013 Amazon.com, Inc. or its affiliates.  All Rights Reserved
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish, dis-
+# tribute, sublicense, and/or sell copies of the Software, and to permit
+# persons to whom the Software is furnished to do so, subject to the fol-
+# lowing conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABIL-
+# ITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT
+# SHALL THE AUTHOR BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
+# IN THE SOFTWARE.
+#
+import gzip
+import os
+import shutil
+import tempfile
+import zlib
+from StringIO import StringIO
+
+import mock
+
+from tests.unit import unittest
+from tests.unit.s3.fake_s3 import FakeS3
+
+from boto.exception import BotoClientError
+from boto.s3.compression import CompressingReader, DecompressingReader
+from boto.s3.compression import DecompressingWriter, compress_to_tempfile
+
+
+def make_lines(count):
+    return ''.join('%d GET /index.html 200 %d\n' % (i, i * 7 % 1000)
+                   for i in xrange(count))
+
+
+def compress(data, encoding='gzip', level=6, size=None):
+    reader = CompressingReader(StringIO(data), encoding, level, size)
+    parts = []
+    chunk = reader.read(1000)
+    while chunk:
+        parts.append(chunk)
+        chunk = reader.read(1000)
+    return ''.join(parts)
+
+
+class TestCodecs(unittest.TestCase):
+    data = make_lines(20000)
+
+    def test_gzip_is_readable_by_gzip_module(self):
+        compressed = compress(self.data)
+        self.assertTrue(len(compressed) < len(self.data) / 5)
+        self.assertEqual(gzip.GzipFile(fileobj=StringIO(compressed)).read(),
+                         self.data)
+
+    def test_deflate_is_zlib_format(self):
+        self.assertEqual(zlib.decompress(compress(self.data, 'deflate')),
+                         self.data)
+
+    def test_level(self):
+        self.assertTrue(len(compress(self.data, level=9)) <
+                        len(compress(self.data, level=1)))
+
+    def test_size(self):
+        reader = CompressingReader(StringIO(self.data), size=100)
+        self.assertEqual(zlib.decompress(reader.read(), 31), self.data[:100])
+        self.assertEqual(reader.bytes_read, 100)
+
+    def test_reads_are_bounded(self):
+        reader = CompressingReader(StringIO(self.data))
+        self.assertEqual(len(reader.read(10)), 10)
+        self.assertRaises(IOError, reader.tell)
+
+    def test_unknown_encoding(self):
+        self.assertRaises(BotoClientError, CompressingReader, StringIO(''),
+                          'bzip2')
+
+    def test_round_trip(self):
+        for encoding in ('gzip', 'deflate'):
+            compressed = compress(self.data, encoding)
+            reader = DecompressingReader(StringIO(compressed), encoding)
+            parts = []
+            chunk = reader.read(777)
+            while chunk:
+                self.assertTrue(len(chunk) <= 777)
+                parts.append(chunk)
+                chunk = reader.read(777)
+            self.assertEqual(''.join(parts), self.data)
+            out = StringIO()
+            writer = DecompressingWriter(out, encoding)
+            for i in range(0, len(compressed), 100):
+                writer.write(compressed[i:i + 100])
+            writer.close()
+            self.assertEqual(out.getvalue(), self.data)
+
+    def test_concatenated_gzip_members(self):
+        compressed = compress('first\n') + compress('second\n')
+        reader = DecompressingReader(StringIO(compressed), 'gzip')
+        self.assertEqual(reader.read(), 'first\nsecond\n')
+
+    def test_compress_to_tempfile(self):
+        spool = compress_to_tempfile(StringIO(self.data), 'gzip')
+        self.assertEqual(zlib.decompress(spool.read(), 31), self.data)
+
+
+class TestCompressedKeys(unittest.TestCase):
+    data = make_lines(5000)
+
+    def setUp(self):
+        self.s3 = FakeS3()
+        self.bucket = self.s3.connect().get_bucket('bucket', validate=False)
+
+    def stored(self, name):
+        return (self.s3.objects[('bucket', name)],
+                self.s3.object_headers[('bucket', name)])
+
+    def test_upload_and_download(self):
+        key = self.bucket.new_key('access.log')
+        size = key.set_contents_from_string(self.data, compress='gzip')
+        data, headers = self.stored('access.log')
+        self.assertEqual(size, len(data))
+        self.assertEqual(zlib.decompress(data, 31), self.data)
+        self.assertEqual(headers['content-encoding'], 'gzip')
+        key = self.bucket.new_key('access.log')
+        self.assertEqual(key.get_contents_as_string(decompress=True),
+                         self.data)
+        self.assertEqual(key.md5, key.etag.strip('"'))
+        self.assertEqual(key.get_contents_as_string(), data)
+
+    def test_content_type_of_file(self):
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir)
+        filename = os.path.join(tmpdir, 'page.html')
+        f = open(filename, 'wb')
+        f.write(self.data)
+        f.close()
+        key = self.bucket.new_key('page.html')
+        key.set_contents_from_filename(filename, compress='deflate',
+                                       compress_level=9)
+        data, headers = self.stored('page.html')
+        self.assertEqual(zlib.decompress(data), self.data)
+        self.assertEqual(headers['content-type'], 'text/html')
+        self.assertEqual(headers['content-encoding'], 'deflate')
+        self.assertEqual(key.path, filename)
+
+    def test_parallel_upload(self):
+        key = self.bucket.new_key('big.log')
+        key.set_contents_from_file(StringIO(self.data), compress='gzip',
+                                   parallel=True, part_size=5000)
+        data, headers = self.stored('big.log')
+        self.assertTrue(len(data) > 5000)
+        self.assertEqual(zlib.decompress(data, 31), self.data)
+        self.assertEqual(headers['content-encoding'], 'gzip')
+
+    def test_streamed_upload(self):
+        key = self.bucket.new_key('stream.log')
+        provider = self.bucket.connection.provider
+        with mock.patch.object(provider, 'supports_chunked_transfer',
+                               return_value=True):
+            key.set_contents_from_stream(StringIO(self.data),
+                                         compress='gzip')
+            self.bucket.new_key('file.log').set_contents_from_file(
+                StringIO(self.data), compress='gzip')
+        for name in ('stream.log', 'file.log'):
+            data, headers = self.stored(name)
+            self.assertEqual(zlib.decompress(data, 31), self.data)
+            self.assertEqual(headers['content-encoding'], 'gzip')
+            self.assertEqual(headers['transfer-encoding'], 'chunked')
+
+    def test_read(self):
+        self.bucket.new_key('a.log').set_contents_from_string(
+            self.data, compress='gzip')
+        key = self.bucket.new_key('a.log')
+        key.open_read(decompress=True)
+        self.assertEqual(key.read(100), self.data[:100])
+        self.assertEqual(''.join(key), self.data[100:])
+
+    def test_uncompressed_data_is_left_alone(self):
+        self.bucket.new_key('plain').set_contents_from_string(self.data)
+        key = self.bucket.new_key('plain')
+        self.assertEqual(key.get_contents_as_string(decompress=True),
+                         self.data)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,115 @@
+# Copyright (c) 2013 Amazon.com, Inc. or its affiliates.  All Rights Reserved
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish, dis-
+# tribute, sublicense, and/or sell copies of the Software, and to permit
+# persons to whom the Software is furnished to do so, subject to the fol-
+# lowing conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABIL-
+# ITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT
+# SHALL THE AUTHOR BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
+# IN THE SOFTWARE.
+#
+import mock
+
+from tests.unit import unittest
+
+from boto.s3.connection import S3Connection, OrdinaryCallingFormat
+from boto.s3.connection import ProtocolIndependentOrdinaryCallingFormat
+from boto.s3.connection import SubdomainCallingFormat
+
+
+class TestGenerateUrls(unittest.TestCase):
+    keys = ['key', u'd\xe9j\xe0/vu', 'with space?&=+', 'dir/', 'a//b',
+            '/leading', '']
+
+    def connect(self, **kwargs):
+        return S3Connection('access_key', 'secret/key+', **kwargs)
+
+    def assert_same_urls(self, conn, **kwargs):
+        items = []
+        for bucket in ('bucket', 'other-bucket'):
+            for i, key in enumerate(self.keys):
+                items.append((bucket, key, 60 * (i + 1)))
+        with mock.patch('time.time', return_value=1234567890.5):
+            urls = conn.generate_urls(items, **kwargs)
+            expected = [conn.generate_url(expires_in, kwargs.get('method',
+                                                                 'GET'),
+                                          bucket, key,
+                                          force_http=kwargs.get('force_http',
+                                                                False),
+                                          expires_in_absolute=kwargs.get(
+                                              'expires_in_absolute', False))
+                        for bucket, key, expires_in in items]
+        self.assertEqual(urls, expected)
+
+    def test_default_calling_format(self):
+        self.assert_same_urls(self.connect())
+
+    def test_subdomain(self):
+        self.assert_same_urls(
+            self.connect(calling_format=SubdomainCallingFormat()))
+        self.assert_same_urls(self.connect(
+            calling_format=SubdomainCallingFormat(), is_secure=False,
+            port=8080))
+
+    def test_ordinary(self):
+        self.assert_same_urls(
+            self.connect(calling_format=OrdinaryCallingFormat()))
+
+    def test_protocol_independent(self):
+        self.assert_same_urls(self.connect(
+            calling_format=ProtocolIndependentOrdinaryCallingFormat()))
+
+    def test_path_and_port(self):
+        self.assert_same_urls(self.connect(
+            calling_format=OrdinaryCallingFormat(), path='/base/',
+            host='localhost', port=8080, is_secure=False))
+
+    def test_consecutive_slashes_kept(self):
+        self.assert_same_urls(self.connect(
+            calling_format=OrdinaryCallingFormat(),
+            suppress_consec_slashes=False))
+
+    def test_security_token(self):
+        self.assert_same_urls(self.connect(security_token='to/ken='))
+
+    def test_options(self):
+        self.assert_same_urls(self.connect(), method='PUT', force_http=True)
+        self.assert_same_urls(self.connect(), expires_in_absolute=True)
+
+    def test_uses_one_credential_snapshot(self):
+        conn = self.connect(security_token='old')
+        items = [('bucket', 'a', 60), ('bucket', 'b', 60)]
+        with mock.patch('time.time', return_value=1234567890.5):
+            # The properties would give the credentials of a refresh
+            # landing while the URLs are generated.
+            with mock.patch.object(
+                    conn.provider, 'get_current_credentials',
+                    return_value=('new_key', 'new/secret', 'new')):
+                urls = conn.generate_urls(items)
+            expected = S3Connection(
+                'new_key', 'new/secret',
+                security_token='new').generate_urls(items)
+        self.assertEqual(urls, expected)
+
+    def test_signs_once_per_url(self):
+        conn = self.connect()
+        with mock.patch.object(conn._auth_handler, 'sign_string') as sign:
+            urls = conn.generate_urls([('bucket', 'a', 60),
+                                       ('bucket', 'b', 60)])
+        self.assertEqual(len(urls), 2)
+        self.assertFalse(sign.called)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,94 @@
+# Copyright (c) 2013 Amazon.com, Inc. or its affiliates.  All Rights Reserved
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish, dis-
+# tribute, sublicense, and/or sell copies of the Software, and to permit
+# persons to whom the Software is furnished to do so, subject to the fol-
+# lowing conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABIL-
+# ITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT
+# SHALL THE AUTHOR BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
+# IN THE SOFTWARE.
+#
+import os
+from StringIO import StringIO
+
+import mock
+
+from tests.unit import unittest
+from tests.unit.s3.fake_s3 import FakeS3
+from boto.exception import S3DataError
+from boto.utils import compute_md5
+
+
+class CountingFile(StringIO):
+    def __init__(self, data):
+        StringIO.__init__(self, data)
+        self.bytes_read = 0
+
+    def read(self, n=-1):
+        data = StringIO.read(self, n)
+        self.bytes_read += len(data)
+        return data
+
+
+class TestSinglePassUpload(unittest.TestCase):
+    def setUp(self):
+        self.s3 = FakeS3()
+        self.bucket = self.s3.connect().get_bucket('bucket', validate=False)
+        self.data = os.urandom(20000)
+
+    def test_default_reads_file_twice(self):
+        fp = CountingFile(self.data)
+        key = self.bucket.new_key('obj')
+        key.set_contents_from_file(fp)
+        self.assertEqual(fp.bytes_read, 2 * len(self.data))
+        headers = self.s3.object_headers[('bucket', 'obj')]
+        self.assertEqual(headers['content-md5'], compute_md5(StringIO(self.data))[1])
+
+    def test_single_pass_reads_file_once(self):
+        fp = CountingFile(self.data)
+        key = self.bucket.new_key('obj')
+        key.set_contents_from_file(fp, single_pass=True)
+        self.assertEqual(fp.bytes_read, len(self.data))
+        self.assertEqual(self.s3.objects[('bucket', 'obj')], self.data)
+        self.assertNotIn('content-md5',
+                         self.s3.object_headers[('bucket', 'obj')])
+        self.assertEqual(key.md5, compute_md5(StringIO(self.data))[0])
+        self.assertEqual(key.size, len(self.data))
+
+    def test_single_pass_honours_size(self):
+        fp = CountingFile(self.data)
+        fp.seek(100)
+        key = self.bucket.new_key('obj')
+        key.set_contents_from_file(fp, single_pass=True, size=1000)
+        self.assertEqual(fp.bytes_read, 1000)
+        self.assertEqual(self.s3.objects[('bucket', 'obj')],
+                         self.data[100:1100])
+        self.assertEqual(key.size, 1000)
+
+    def test_single_pass_from_config(self):
+        fp = CountingFile(self.data)
+        key = self.bucket.new_key('obj')
+        with mock.patch('boto.config.getbool', return_value=True):
+            key.set_contents_from_file(fp)
+        self.assertEqual(fp.bytes_read, len(self.data))
+
+    def test_single_pass_detects_corruption(self):
+        key = self.bucket.new_key('obj')
+        with mock.patch.object(self.s3, '_etag', return_value='"bad"'):
+            self.assertRaises(S3DataError, key.set_contents_from_file,
+                              StringIO(self.data), single_pass=True)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,105 @@
+# Copyright (c) 2013 Amazon.com, Inc. or its affiliates.  All Rights Reserved
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish, dis-
+# tribute, sublicense, and/or sell copies of the Software, and to permit
+# persons to whom the Software is furnished to do so, subject to the fol-
+# lowing conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABIL-
+# ITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT
+# SHALL THE AUTHOR BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
+# IN THE SOFTWARE.
+#
+from tests.unit import unittest
+from tests.unit.s3.fake_s3 import FakeS3
+from boto import handler
+from boto.resultset import ResultSet
+from boto.s3.key import Key
+from boto.s3.keyentry import KeyEntry
+from boto.s3.prefix import Prefix
+
+LIST_BUCKET_RESULT = """<?xml version="1.0" encoding="UTF-8"?>
+<ListBucketResult xmlns="http://s3.amazonaws.com/doc/2006-03-01/">
+  <Name>bucket</Name><Prefix/><Marker/><IsTruncated>false</IsTruncated>
+  <Contents>
+    <Key>logs/a.log</Key>
+    <LastModified>2013-01-01T00:00:00.000Z</LastModified>
+    <ETag>&quot;0cc175b9c0f1b6a831c399e269772661&quot;</ETag>
+    <Size>1024</Size>
+    <Owner><ID>75aa57f09aa0c8ca</ID><DisplayName>webfile</DisplayName></Owner>
+    <StorageClass>REDUCED_REDUNDANCY</StorageClass>
+  </Contents>
+  <CommonPrefixes><Prefix>photos/</Prefix></CommonPrefixes>
+</ListBucketResult>"""
+
+
+def parse(key_class):
+    rs = ResultSet([('Contents', key_class), ('CommonPrefixes', Prefix)])
+    handler.parse_string(LIST_BUCKET_RESULT, handler.XmlHandler(rs, None))
+    return rs
+
+
+class TestKeyEntry(unittest.TestCase):
+    def test_parses_like_key(self):
+        entry, prefix = parse(KeyEntry)
+        key = parse(Key)[0]
+        self.assertTrue(isinstance(prefix, Prefix))
+        for attr in ('name', 'size', 'etag', 'last_modified',
+                     'storage_class'):
+            self.assertEqual(getattr(entry, attr), getattr(key, attr))
+        self.assertEqual(entry.owner_id, key.owner.id)
+        self.assertEqual(entry.key, 'logs/a.log')
+
+    def test_has_no_dict(self):
+        entry = parse(KeyEntry)[0]
+        self.assertFalse(hasattr(entry, '__dict__'))
+        self.assertRaises(AttributeError, setattr, entry, 'metadata', {})
+
+    def test_shares_repeated_values(self):
+        first, second = parse(KeyEntry)[0], parse(KeyEntry)[0]
+        self.assertTrue(first.owner_id is second.owner_id)
+        self.assertTrue(first.storage_class is second.storage_class)
+
+    def test_to_key(self):
+        key = parse(KeyEntry)[0].to_key()
+        self.assertTrue(isinstance(key, Key))
+        self.assertEqual(key.name, 'logs/a.log')
+        self.assertEqual(key.size, 1024)
+        self.assertEqual(key.storage_class, 'REDUCED_REDUNDANCY')
+        self.assertEqual(key.owner.id, '75aa57f09aa0c8ca')
+
+
+class TestCompactListing(unittest.TestCase):
+    def setUp(self):
+        self.s3 = FakeS3()
+        self.s3.max_keys = 3
+        self.bucket = self.s3.connect().get_bucket('bucket', validate=False)
+        self.names = ['a/%d' % i for i in range(5)] + ['b/0', 'b/1']
+        for name in self.names:
+            self.s3.objects[('bucket', name)] = name
+
+    def test_list(self):
+        entries = list(self.bucket.list(compact=True))
+        self.assertEqual([e.name for e in entries], self.names)
+        self.assertTrue(all(isinstance(e, KeyEntry) for e in entries))
+        key = entries[0].to_key()
+        self.assertTrue(key.bucket is self.bucket)
+        self.assertEqual(key.get_contents_as_string(), 'a/0')
+
+    def test_parallel_list(self):
+        entries = list(self.bucket.list(compact=True, parallel=True))
+        self.assertEqual([e.name for e in entries], self.names)
+        self.assertTrue(all(isinstance(e, KeyEntry) for e in entries))
+
+
+if __name__ == '__main__':
+    unittest.main()
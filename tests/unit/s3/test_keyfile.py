@@ -0,0 +1,138 @@
+# Copyright (c) 2013 Amazon.com, Inc. or its affiliates.  All Rights Reserved
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish, dis-
+# tribute, sublicense, and/or sell copies of the Software, and to permit
+# persons to whom the Software is furnished to do so, subject to the fol-
+# lowing conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABIL-
+# ITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT
+# SHALL THE AUTHOR BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
+# IN THE SOFTWARE.
+#
+import os
+import zipfile
+from StringIO import StringIO
+
+import mock
+
+from tests.unit import unittest
+from tests.unit.s3.fake_s3 import FakeS3
+from boto.exception import S3ResponseError
+from boto.s3.keyfile import KeyFile
+
+
+class TestKeyFile(unittest.TestCase):
+    def setUp(self):
+        sleep = mock.patch('time.sleep')
+        sleep.start()
+        self.addCleanup(sleep.stop)
+        self.s3 = FakeS3()
+        self.bucket = self.s3.connect().get_bucket('bucket', validate=False)
+        self.data = os.urandom(10000)
+        self.s3.objects[('bucket', 'obj')] = self.data
+
+    def open(self, **kwargs):
+        kwargs.setdefault('block_size', 100)
+        return KeyFile(self.bucket.new_key('obj'), **kwargs)
+
+    def gets(self):
+        return len([r for r in self.s3.requests if r[0] == 'GET'])
+
+    def test_seek_tell_read(self):
+        f = self.open()
+        self.assertEqual(f.size, 10000)
+        f.seek(-50, os.SEEK_END)
+        self.assertEqual(f.tell(), 9950)
+        self.assertEqual(f.read(), self.data[-50:])
+        self.assertEqual(f.read(), '')
+        f.seek(150)
+        self.assertEqual(f.read(300), self.data[150:450])
+        f.seek(-100, os.SEEK_CUR)
+        self.assertEqual(f.read(10), self.data[350:360])
+        f.seek(20000)
+        self.assertEqual(f.read(10), '')
+        self.assertRaises(IOError, f.seek, -1)
+
+    def test_readinto(self):
+        f = self.open()
+        f.seek(9990)
+        buf = bytearray(20)
+        self.assertEqual(f.readinto(buf), 10)
+        self.assertEqual(str(buf[:10]), self.data[9990:])
+
+    def test_blocks_are_cached(self):
+        f = self.open()
+        f.seek(5000)
+        f.read(10)
+        f.seek(0)
+        f.read(10)
+        f.seek(5005)
+        f.read(10)
+        self.assertEqual(self.gets(), 2)
+        self.assertEqual(f.hits, 1)
+
+    def test_sequential_read_ahead(self):
+        f = self.open(max_read_ahead=8)
+        chunks = list(f)
+        self.assertEqual(''.join(chunks), self.data)
+        # Fetches grow 1, 1, 2, 5, 9, 9, ... blocks at a time.
+        self.assertEqual(f.requests, 15)
+        self.assertEqual(self.gets(), 15)
+
+    def test_random_reads_dont_read_ahead(self):
+        f = self.open(max_read_ahead=8)
+        for offset in (9000, 100, 5000, 2000, 7000):
+            f.seek(offset)
+            f.read(100)
+        self.assertEqual(f.requests, 5)
+
+    def test_prefetch(self):
+        f = self.open(max_read_ahead=4, prefetch=True)
+        self.assertEqual(f.read(), self.data)
+        self.assertEqual(f.requests, 100)
+        f.close()
+
+    def test_zipfile(self):
+        buf = StringIO()
+        archive = zipfile.ZipFile(buf, 'w')
+        for i in range(20):
+            archive.writestr('member-%d' % i, os.urandom(3000))
+        archive.writestr('last', 'the last member')
+        archive.close()
+        self.s3.objects[('bucket', 'archive.zip')] = buf.getvalue()
+        f = KeyFile(self.bucket.get_key('archive.zip'), block_size=1024)
+        self.assertEqual(zipfile.ZipFile(f).read('last'), 'the last member')
+        # The central directory, and the member's header and data.
+        self.assertTrue(f.requests <= 3)
+
+    def test_detects_changed_object(self):
+        f = self.open()
+        f.read(10)
+        self.s3.objects[('bucket', 'obj')] = 'changed'
+        f.seek(5000)
+        self.assertRaises(S3ResponseError, f.read, 10)
+
+    def test_missing_key(self):
+        self.assertRaises(S3ResponseError, KeyFile,
+                          self.bucket.new_key('missing'))
+
+    def test_closed(self):
+        with self.open(prefetch=True) as f:
+            f.read(1000)
+        self.assertTrue(f.closed)
+        self.assertRaises(ValueError, f.read)
+        self.assertRaises(ValueError, f.tell)
+
+
+if __name__ == '__main__':
+    unittest.main()
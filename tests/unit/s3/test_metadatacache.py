@@ -0,0 +1,142 @@
+# Copyright (c) 2013 Amazon.com, Inc. or its affiliates.  All Rights Reserved
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish, dis-
+# tribute, sublicense, and/or sell copies of the Software, and to permit
+# persons to whom the Software is furnished to do so, subject to the fol-
+# lowing conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABIL-
+# ITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT
+# SHALL THE AUTHOR BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
+# IN THE SOFTWARE.
+#
+import pickle
+
+import mock
+
+from tests.unit import unittest
+from tests.unit.s3.fake_s3 import FakeS3
+from boto.s3.metadatacache import KeyMetadataCache
+
+
+class TestKeyMetadataCache(unittest.TestCase):
+    def setUp(self):
+        self.now = 1000.0
+        self.cache = KeyMetadataCache(capacity=2, ttl=60, negative_ttl=5,
+                                      clock=lambda: self.now)
+        self.bucket = FakeS3().connect().get_bucket('bucket',
+                                                    validate=False)
+
+    def test_ttl(self):
+        self.cache.put('bucket', 'a', self.bucket.new_key('a'))
+        self.cache.put('bucket', 'missing', None)
+        self.now += 3
+        self.assertEqual(self.cache.get('bucket', 'missing'), (True, None))
+        self.now += 30
+        self.assertEqual(self.cache.get('bucket', 'a')[0], True)
+        self.assertEqual(self.cache.get('bucket', 'missing'), (False, None))
+        self.now += 30
+        self.assertEqual(self.cache.get('bucket', 'a'), (False, None))
+        self.assertEqual(self.cache.get_stats()['hits'], 2)
+        self.assertEqual(self.cache.get_stats()['misses'], 2)
+
+    def test_hits_are_copies(self):
+        key = self.bucket.new_key('a')
+        key.metadata['color'] = 'blue'
+        self.cache.put('bucket', 'a', key)
+        first = self.cache.get('bucket', 'a')[1]
+        first.metadata['color'] = 'red'
+        second = self.cache.get('bucket', 'a')[1]
+        self.assertEqual(second.metadata, {'color': 'blue'})
+        self.assertFalse(first is second)
+
+    def test_lru_eviction(self):
+        for name in 'abc':
+            self.cache.put('bucket', name, self.bucket.new_key(name))
+        self.assertEqual(self.cache.get('bucket', 'a'), (False, None))
+        self.assertEqual(self.cache.get_stats()['size'], 2)
+
+    def test_invalidate(self):
+        self.cache.put('bucket', 'a', self.bucket.new_key('a'))
+        self.cache.put('bucket', 'a', self.bucket.new_key('a'), 'v1')
+        self.cache.put('other', 'b', self.bucket.new_key('b'))
+        self.cache.invalidate('bucket', 'a')
+        self.assertEqual(self.cache.get('bucket', 'a', 'v1'), (False, None))
+        self.cache.invalidate('other')
+        self.assertEqual(self.cache.get('other', 'b'), (False, None))
+        self.assertEqual(self.cache.get_stats()['invalidations'], 2)
+
+    def test_unicode_and_utf8_names_match(self):
+        self.cache.put('bucket', u'caf\xe9', self.bucket.new_key(u'caf\xe9'))
+        self.assertEqual(self.cache.get('bucket', 'caf\xc3\xa9')[0], True)
+        self.cache.invalidate('bucket', 'caf\xc3\xa9')
+        self.assertEqual(self.cache.get('bucket', u'caf\xe9'), (False, None))
+
+    def test_pickle(self):
+        self.cache.put('bucket', 'a', self.bucket.new_key('a'))
+        cache = pickle.loads(pickle.dumps(self.cache))
+        self.assertEqual(cache.ttl, 60)
+        self.assertEqual(cache.get_stats()['size'], 0)
+
+
+class TestGetKeyCaching(unittest.TestCase):
+    def setUp(self):
+        self.s3 = FakeS3()
+        self.s3.objects[('bucket', 'hot')] = 'data'
+        conn = self.s3.connect()
+        conn.metadata_cache = KeyMetadataCache(negative_ttl=60)
+        self.cache = conn.metadata_cache
+        self.bucket = conn.get_bucket('bucket', validate=False)
+
+    def heads(self):
+        return len([r for r in self.s3.requests if r[0] == 'HEAD'])
+
+    def test_repeated_get_key(self):
+        for i in range(3):
+            key = self.bucket.get_key('hot')
+            self.assertEqual(key.size, 4)
+            self.assertTrue(key.bucket is self.bucket)
+        self.assertEqual(self.heads(), 1)
+        self.assertEqual(self.bucket.lookup('missing'), None)
+        self.assertEqual(self.bucket.lookup('missing'), None)
+        self.assertEqual(self.heads(), 2)
+        self.assertEqual(self.cache.get_stats()['hits'], 3)
+
+    def test_headers_bypass_cache(self):
+        self.bucket.get_key('hot')
+        self.bucket.get_key('hot', headers={'x-amz-foo': 'bar'})
+        self.assertEqual(self.heads(), 2)
+
+    def test_writes_invalidate(self):
+        self.bucket.get_key('hot')
+        self.bucket.new_key('hot').set_contents_from_string('new data')
+        self.assertEqual(self.bucket.get_key('hot').size, 8)
+        self.bucket.delete_key('hot')
+        self.assertEqual(self.bucket.get_key('hot'), None)
+        self.bucket.new_key('hot').set_contents_from_string('back')
+        self.assertEqual(self.bucket.get_key('hot').size, 4)
+        self.bucket.delete_keys(['hot'])
+        self.assertEqual(self.bucket.get_key('hot'), None)
+        self.assertEqual(self.heads(), 5)
+
+    def test_enabled_from_config(self):
+        values = {'metadata_cache_size': 10, 'metadata_cache_ttl': 5}
+        with mock.patch('boto.config.getint',
+                        lambda s, name, default=0: values.get(name, default)):
+            conn = FakeS3().connect()
+        self.assertEqual(conn.metadata_cache.capacity, 10)
+        self.assertEqual(conn.metadata_cache.ttl, 5)
+        self.assertEqual(FakeS3().connect().metadata_cache, None)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,299 @@
+# Copyright (c) 2013 Amazon.com, Inc. or its affiliates.  All Rights Reserved
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish, dis-
+# tribute, sublicense, and/or sell copies of the Software, and to permit
+# persons to whom the Software is furnished to do so, subject to the fol-
+# lowing conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABIL-
+# ITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT
+# SHALL THE AUTHOR BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
+# IN THE SOFTWARE.
+#
+import os
+import shutil
+import tempfile
+import threading
+from StringIO import StringIO
+
+import mock
+
+from tests.unit import unittest
+from tests.unit.s3.fake_s3 import FakeS3
+from boto.exception import S3DataError, S3ResponseError
+from boto.s3.multipart import choose_part_size, FileSection, MAX_PARTS
+from boto.s3.multipart import MultiPartUploadTracker
+
+
+class TestPartSize(unittest.TestCase):
+    def test_default_part_size(self):
+        self.assertEqual(choose_part_size(100), 8 * 1024 * 1024)
+        self.assertEqual(choose_part_size(100, 1024), 1024)
+
+    def test_stays_within_part_limit(self):
+        size = 200 * 1024 ** 3
+        part_size = choose_part_size(size)
+        self.assertTrue(part_size * MAX_PARTS >= size)
+
+
+class TestFileSection(unittest.TestCase):
+    def test_reads_only_its_range(self):
+        fp = StringIO('0123456789')
+        section = FileSection(fp, 3, 4, threading.Lock())
+        self.assertEqual(section.read(2), '34')
+        self.assertEqual(section.read(), '56')
+        self.assertEqual(section.read(), '')
+        section.seek(0, os.SEEK_END)
+        self.assertEqual(section.tell(), 4)
+        section.seek(1)
+        self.assertEqual(section.read(10), '456')
+
+
+class TestParallelUpload(unittest.TestCase):
+    def setUp(self):
+        sleep = mock.patch('time.sleep')
+        sleep.start()
+        self.addCleanup(sleep.stop)
+        self.s3 = FakeS3()
+        self.bucket = self.s3.connect().get_bucket('bucket', validate=False)
+        self.data = os.urandom(9500)
+
+    def parts_sent(self):
+        return [params['partNumber'] for method, path, params
+                in self.s3.requests
+                if method == 'PUT' and 'partNumber' in params]
+
+    def test_uploads_parts_and_completes(self):
+        progress = []
+        key = self.bucket.new_key('big')
+        size = key.set_contents_from_file(
+            StringIO(self.data), parallel=True, part_size=1000,
+            cb=lambda done, total: progress.append((done, total)))
+        self.assertEqual(size, 9500)
+        self.assertEqual(self.s3.objects[('bucket', 'big')], self.data)
+        self.assertEqual(sorted(self.parts_sent(), key=int),
+                         [str(i) for i in range(1, 11)])
+        self.assertEqual(key.etag, '"multipart-10"')
+        self.assertEqual(progress[-1], (9500, 9500))
+
+    def test_uploads_from_current_position(self):
+        fp = StringIO('header' + self.data)
+        fp.seek(6)
+        self.bucket.new_key('big').set_contents_from_file(
+            fp, parallel=True, part_size=4000, size=9000)
+        self.assertEqual(self.s3.objects[('bucket', 'big')], self.data[:9000])
+        self.assertEqual(fp.tell(), 9006)
+
+    def test_failed_part_is_retried_on_its_own(self):
+        self.s3.corrupt_parts[3] = 2
+        self.bucket.new_key('big').set_contents_from_file(
+            StringIO(self.data), parallel=True, part_size=1000)
+        self.assertEqual(self.s3.objects[('bucket', 'big')], self.data)
+        sent = self.parts_sent()
+        self.assertEqual(sent.count('3'), 3)
+        self.assertEqual(sent.count('4'), 1)
+
+    def test_upload_cancelled_when_part_keeps_failing(self):
+        self.s3.corrupt_parts[2] = 10
+        key = self.bucket.new_key('big')
+        self.assertRaises(S3DataError, key.set_contents_from_file,
+                          StringIO(self.data), parallel=True, part_size=1000)
+        self.assertEqual(self.s3.cancelled, ['upload-1'])
+        self.assertFalse(('bucket', 'big') in self.s3.objects)
+
+    def test_small_file_uses_single_put(self):
+        self.bucket.new_key('small').set_contents_from_file(
+            StringIO(self.data), parallel=True, part_size=10000)
+        self.assertEqual(self.s3.objects[('bucket', 'small')], self.data)
+        self.assertEqual(self.parts_sent(), [])
+
+
+
+class TestParallelCopy(unittest.TestCase):
+    def setUp(self):
+        sleep = mock.patch('time.sleep')
+        sleep.start()
+        self.addCleanup(sleep.stop)
+        self.s3 = FakeS3()
+        self.conn = self.s3.connect()
+        self.bucket = self.conn.get_bucket('bucket', validate=False)
+        self.data = os.urandom(9500)
+        self.s3.objects[('src', 'big')] = self.data
+        self.s3.object_headers[('src', 'big')] = {
+            'content-type': 'image/png', 'x-amz-meta-color': 'blue'}
+
+    def parts_copied(self):
+        return sorted(int(params['partNumber']) for method, path, params
+                      in self.s3.requests
+                      if method == 'PUT' and 'partNumber' in params)
+
+    def test_copies_parts_and_completes(self):
+        key = self.bucket.copy_key('copy', 'src', 'big', parallel=True,
+                                   part_size=1000)
+        self.assertEqual(self.s3.objects[('bucket', 'copy')], self.data)
+        self.assertEqual(self.parts_copied(), range(1, 11))
+        self.assertEqual(key.etag, '"multipart-10"')
+        self.assertEqual(key.size, 9500)
+        copy = self.bucket.get_key('copy')
+        self.assertEqual(copy.content_type, 'image/png')
+        self.assertEqual(copy.metadata, {'color': 'blue'})
+
+    def test_replaces_metadata(self):
+        self.bucket.copy_key('copy', 'src', 'big', metadata={'size': 'L'},
+                             parallel=True, part_size=1000)
+        copy = self.bucket.get_key('copy')
+        self.assertEqual(copy.metadata, {'size': 'L'})
+        self.assertNotEqual(copy.content_type, 'image/png')
+
+    def test_key_copy(self):
+        src = self.conn.get_bucket('src', validate=False).get_key('big')
+        src.copy('bucket', 'copy', validate_dst_bucket=False, parallel=True,
+                 part_size=4000)
+        self.assertEqual(self.s3.objects[('bucket', 'copy')], self.data)
+        self.assertEqual(self.parts_copied(), [1, 2, 3])
+
+    def test_changed_source_cancels_copy(self):
+        original = self.s3._copy
+
+        def copy(bucket, key, params, headers):
+            # The source is overwritten after the first part.
+            self.s3.objects[('src', 'big')] = 'changed'
+            return original(bucket, key, params, headers)
+
+        with mock.patch.object(self.s3, '_copy', copy):
+            self.assertRaises(S3ResponseError, self.bucket.copy_key,
+                              'copy', 'src', 'big', parallel=True,
+                              part_size=1000)
+        self.assertEqual(self.s3.cancelled, ['upload-1'])
+        self.assertFalse(('bucket', 'copy') in self.s3.objects)
+
+    def test_small_key_uses_single_copy(self):
+        self.bucket.copy_key('copy', 'src', 'big', parallel=True,
+                             part_size=10000)
+        self.assertEqual(self.s3.objects[('bucket', 'copy')], self.data)
+        self.assertEqual(self.parts_copied(), [])
+        self.assertEqual(self.s3.uploads, {})
+
+
+class TestResumableUpload(unittest.TestCase):
+    def setUp(self):
+        sleep = mock.patch('time.sleep')
+        sleep.start()
+        self.addCleanup(sleep.stop)
+        self.s3 = FakeS3()
+        self.bucket = self.s3.connect().get_bucket('bucket', validate=False)
+        self.data = os.urandom(9500)
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+        self.tracker_file_name = os.path.join(self.tmpdir, 'tracker')
+
+    def upload(self, data=None, **kwargs):
+        self.s3.requests = []
+        kwargs.setdefault('part_size', 1000)
+        return self.bucket.new_key('big').set_contents_from_file(
+            StringIO(data or self.data), parallel=True,
+            tracker_file_name=self.tracker_file_name, **kwargs)
+
+    def parts_sent(self):
+        return sorted(int(params['partNumber']) for method, path, params
+                      in self.s3.requests
+                      if method == 'PUT' and 'partNumber' in params)
+
+    def journal(self):
+        f = open(self.tracker_file_name)
+        try:
+            return f.read().splitlines()
+        finally:
+            f.close()
+
+    def missing_parts(self):
+        parts = self.s3.uploads['upload-1']['parts']
+        return [n for n in range(1, 11) if n not in parts]
+
+    def fail_first_attempt(self):
+        self.s3.corrupt_parts[7] = 10
+        self.assertRaises(S3DataError, self.upload)
+        self.assertEqual(self.s3.cancelled, [])
+        del self.s3.corrupt_parts[7]
+        # Part 7 never made it to S3.
+        del self.s3.uploads['upload-1']['parts'][7]
+
+    def test_resumes_after_failure(self):
+        self.fail_first_attempt()
+        journal = self.journal()
+        self.assertEqual(journal[0],
+                         'upload\tupload-1\tbucket\tbig\t9500\t1000')
+        recorded = [int(line.split('\t')[1]) for line in journal[1:]]
+        self.assertFalse(7 in recorded)
+        missing = self.missing_parts()
+        self.upload()
+        self.assertEqual(self.s3.objects[('bucket', 'big')], self.data)
+        self.assertEqual(self.parts_sent(), missing)
+        self.assertFalse(os.path.exists(self.tracker_file_name))
+
+    def test_uploaded_parts_are_checked_on_workers(self):
+        self.fail_first_attempt()
+        part_uploaded = MultiPartUploadTracker.part_uploaded
+        threads = set()
+        def record_thread(tracker, part_num, section):
+            threads.add(threading.current_thread())
+            return part_uploaded(tracker, part_num, section)
+        with mock.patch.object(MultiPartUploadTracker, 'part_uploaded',
+                               record_thread):
+            self.upload()
+        self.assertEqual(self.s3.objects[('bucket', 'big')], self.data)
+        self.assertFalse(threading.current_thread() in threads)
+
+    def test_parts_missing_from_journal_are_checked(self):
+        self.fail_first_attempt()
+        # Lose the last parts recorded, and cut the last line short.
+        journal = self.journal()
+        f = open(self.tracker_file_name, 'w')
+        f.write('\n'.join(journal[:3]) + '\n' + journal[3][:10])
+        f.close()
+        missing = self.missing_parts()
+        self.upload()
+        self.assertEqual(self.s3.objects[('bucket', 'big')], self.data)
+        self.assertEqual(self.parts_sent(), missing)
+
+    def test_parts_with_other_etags_are_sent_again(self):
+        self.fail_first_attempt()
+        self.s3.uploads['upload-1']['parts'][1] = 'other data'
+        missing = self.missing_parts()
+        self.upload()
+        self.assertEqual(self.s3.objects[('bucket', 'big')], self.data)
+        self.assertEqual(self.parts_sent(), [1] + missing)
+
+    def test_changed_source_parts_are_sent_again(self):
+        self.fail_first_attempt()
+        # The file changes between runs, but keeps its size.
+        data = self.data[:1500] + 'x' * 1000 + self.data[2500:]
+        missing = self.missing_parts()
+        self.upload(data)
+        self.assertEqual(self.s3.objects[('bucket', 'big')], data)
+        self.assertEqual(self.parts_sent(), sorted([2, 3] + missing))
+
+    def test_different_upload_starts_afresh(self):
+        self.fail_first_attempt()
+        self.upload(self.data[:9000])
+        self.assertEqual(self.s3.objects[('bucket', 'big')], self.data[:9000])
+        self.assertEqual(self.parts_sent(), range(1, 10))
+
+    def test_finished_upload_starts_afresh(self):
+        self.fail_first_attempt()
+        del self.s3.uploads['upload-1']
+        self.upload()
+        self.assertEqual(self.s3.objects[('bucket', 'big')], self.data)
+        self.assertEqual(self.parts_sent(), range(1, 11))
+
+if __name__ == '__main__':
+    unittest.main()
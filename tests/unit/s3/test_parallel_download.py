@@ -0,0 +1,106 @@
+# Copyright (c) 2013 Amazon.com, Inc. or its affiliates.  All Rights Reserved
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish, dis-
+# tribute, sublicense, and/or sell copies of the Software, and to permit
+# persons to whom the Software is furnished to do so, subject to the fol-
+# lowing conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABIL-
+# ITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT
+# SHALL THE AUTHOR BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
+# IN THE SOFTWARE.
+#
+import os
+from StringIO import StringIO
+
+import mock
+
+from tests.unit import unittest
+from tests.unit.s3.fake_s3 import FakeS3
+from boto.exception import S3DataError, S3ResponseError
+from boto.s3.resumable_download_handler import ResumableDownloadHandler
+
+
+class TestParallelDownload(unittest.TestCase):
+    def setUp(self):
+        sleep = mock.patch('time.sleep')
+        sleep.start()
+        self.addCleanup(sleep.stop)
+        self.s3 = FakeS3()
+        self.bucket = self.s3.connect().get_bucket('bucket', validate=False)
+        self.data = os.urandom(9500)
+        self.s3.objects[('bucket', 'big')] = self.data
+
+    def ranges_requested(self):
+        return len([r for r in self.s3.requests if r[0] == 'GET'])
+
+    def test_downloads_ranges_in_order(self):
+        progress = []
+        fp = StringIO()
+        key = self.bucket.new_key('big')
+        key.get_contents_to_file(
+            fp, parallel=True, range_size=1000, num_cb=-1,
+            cb=lambda done, total: progress.append((done, total)))
+        self.assertEqual(fp.getvalue(), self.data)
+        self.assertEqual(self.ranges_requested(), 10)
+        self.assertEqual(key.size, 9500)
+        self.assertEqual(progress[0], (0, 9500))
+        self.assertEqual(progress[-1], (9500, 9500))
+        self.assertEqual(len(progress), 11)
+
+    def test_short_range_is_retried(self):
+        self.s3.truncated_ranges[3000] = 2
+        fp = StringIO()
+        self.bucket.new_key('big').get_file(fp, parallel=True,
+                                            range_size=1000)
+        self.assertEqual(fp.getvalue(), self.data)
+        self.assertEqual(self.ranges_requested(), 12)
+
+    def test_changed_object_fails(self):
+        key = self.bucket.new_key('big')
+        original = key._get_range
+        def replace_object(*args):
+            self.s3.objects[('bucket', 'big')] = 'changed' * 2000
+            return original(*args)
+        key._get_range = replace_object
+        self.assertRaises(S3ResponseError, key.get_file, StringIO(),
+                          parallel=True, range_size=1000)
+
+    def test_md5_checked_against_etag(self):
+        key = self.bucket.new_key('big')
+        with mock.patch.object(self.s3, '_etag', return_value='"%s"' % ('0' * 32)):
+            self.assertRaises(S3DataError, key.get_file, StringIO(),
+                              parallel=True, range_size=1000)
+
+    def test_empty_object(self):
+        self.s3.objects[('bucket', 'empty')] = ''
+        fp = StringIO()
+        self.bucket.new_key('empty').get_file(fp, parallel=True)
+        self.assertEqual(fp.getvalue(), '')
+
+    def test_resumes_with_handler(self):
+        fp = StringIO(self.data[:2500])
+        fp.name = 'partial'
+        fp.seek(0, os.SEEK_END)
+        key = self.bucket.get_key('big')
+        handler = ResumableDownloadHandler()
+        handler.etag_value_for_current_download = key.etag.strip('"')
+        key.get_contents_to_file(fp, res_download_handler=handler,
+                                 parallel=True, range_size=1000)
+        self.assertEqual(fp.getvalue(), self.data)
+        self.assertEqual(handler.download_start_point, 2500)
+        # 2500-3499 first, then the 6 ranges after it.
+        self.assertEqual(self.ranges_requested(), 7)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,500 @@
+# Copyright (c) 2013 Amazon.com, Inc. or its affiliates.  All Rights Reserved
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish, dis-
+# tribute, sublicense, and/or sell copies of the Software, and to permit
+# persons to whom the Software is furnished to do so, subject to the fol-
+# lowing conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABIL-
+# ITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT
+# SHALL THE AUTHOR BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
+# IN THE SOFTWARE.
+#
+import httplib
+import threading
+import time
+from StringIO import StringIO
+
+from mock import Mock, patch
+
+import boto.metrics
+import boto.ratelimit
+from tests.unit import unittest
+from boto.connection import AWSQueryConnection, ConnectionPool, HTTPResponse
+from boto.exception import BotoServerError, CircuitOpenError
+from boto.exception import ConnectionPoolTimeoutError
+
+
+def ready_connection():
+    conn = Mock()
+    conn._HTTPConnection__response = None
+    return conn
+
+
+class TestConnectionPool(unittest.TestCase):
+    def test_reuses_ready_connection(self):
+        pool = ConnectionPool()
+        self.assertIsNone(pool.get_http_connection('host', True))
+        conn = ready_connection()
+        pool.put_http_connection('host', True, conn)
+        self.assertIs(pool.get_http_connection('host', True), conn)
+        stats = pool.get_stats()
+        self.assertEqual(stats['hits'], 1)
+        self.assertEqual(stats['misses'], 1)
+
+    def test_skips_connection_with_unread_response(self):
+        pool = ConnectionPool()
+        busy = Mock()
+        busy._HTTPConnection__response.isclosed.return_value = False
+        conn = ready_connection()
+        pool.put_http_connection('host', True, busy)
+        pool.put_http_connection('host', True, conn)
+        self.assertIs(pool.get_http_connection('host', True), conn)
+        self.assertEqual(pool.size(), 1)
+
+    def test_busy_connection_is_reused_once_read(self):
+        pool = ConnectionPool()
+        busy = Mock()
+        busy._HTTPConnection__response.isclosed.return_value = False
+        pool.put_http_connection('host', True, busy)
+        self.assertIsNone(pool.get_http_connection('host', True))
+        self.assertEqual(pool.size(), 1)
+        busy._HTTPConnection__response.isclosed.return_value = True
+        self.assertIs(pool.get_http_connection('host', True), busy)
+        self.assertEqual(pool.size(), 0)
+
+    def test_unread_connection_expires(self):
+        pool = ConnectionPool(max_connections_per_host=1,
+                              checkout_timeout=0.1)
+        self.assertIsNone(pool.get_http_connection('host', True))
+        busy = Mock()
+        busy._HTTPConnection__response.isclosed.return_value = False
+        pool.put_http_connection('host', True, busy)
+        host_pool = pool.host_to_pool[('host', True)]
+        host_pool.busy[0] = (busy, 0)
+        # Its response is never read, but the slot is freed once the
+        # connection goes stale.
+        self.assertIsNone(pool.get_http_connection('host', True))
+        self.assertEqual(host_pool.size(), 0)
+        self.assertFalse(busy.close.called)
+        self.assertEqual(pool.get_stats()['stale_evictions'], 1)
+
+    def test_clean_expires_unread_connections(self):
+        pool = ConnectionPool()
+        busy = Mock()
+        busy._HTTPConnection__response.isclosed.return_value = False
+        pool.put_http_connection('host', True, busy)
+        pool.host_to_pool[('host', True)].busy[0] = (busy, 0)
+        pool.clean()
+        self.assertEqual(pool.size(), 0)
+
+    def test_stale_connections_are_evicted(self):
+        pool = ConnectionPool(max_connections_per_host=1)
+        self.assertIsNone(pool.get_http_connection('host', True))
+        pool.put_http_connection('host', True, ready_connection())
+        pool.host_to_pool[('host', True)].ready[0] = (ready_connection(), 0)
+        # The stale connection is dropped and its slot reused.
+        self.assertIsNone(pool.get_http_connection('host', True))
+        self.assertEqual(pool.get_stats()['stale_evictions'], 1)
+
+    def test_bounded_pool_times_out(self):
+        pool = ConnectionPool(max_connections_per_host=1,
+                              checkout_timeout=0.1)
+        self.assertIsNone(pool.get_http_connection('host', True))
+        with self.assertRaises(ConnectionPoolTimeoutError):
+            pool.get_http_connection('host', True)
+        # Other hosts are limited independently.
+        self.assertIsNone(pool.get_http_connection('other', True))
+        self.assertEqual(pool.get_stats()['waits'], 1)
+
+    def test_non_blocking_checkout_fails_at_once(self):
+        pool = ConnectionPool(max_connections_per_host=1)
+        self.assertIsNone(pool.get_http_connection('host', True))
+        with self.assertRaises(ConnectionPoolTimeoutError):
+            pool.get_http_connection('host', True, blocking=False)
+        self.assertEqual(pool.get_stats()['waits'], 0)
+
+    def test_discard_frees_slot(self):
+        pool = ConnectionPool(max_connections_per_host=1,
+                              checkout_timeout=0.1)
+        self.assertIsNone(pool.get_http_connection('host', True))
+        pool.discard_http_connection('host', True)
+        self.assertIsNone(pool.get_http_connection('host', True))
+
+    def test_blocked_checkout_gets_returned_connection(self):
+        pool = ConnectionPool(max_connections_per_host=1,
+                              checkout_timeout=5)
+        self.assertIsNone(pool.get_http_connection('host', True))
+        conn = ready_connection()
+        result = []
+        waiter = threading.Thread(
+            target=lambda: result.append(
+                pool.get_http_connection('host', True)))
+        waiter.start()
+        time.sleep(0.1)
+        pool.put_http_connection('host', True, conn)
+        waiter.join()
+        self.assertEqual(result, [conn])
+        stats = pool.get_stats()
+        self.assertEqual(stats['hits'], 1)
+        self.assertTrue(stats['wait_time'] > 0)
+
+    def test_take_idle_connection_frees_slot(self):
+        pool = ConnectionPool(max_connections_per_host=1,
+                              checkout_timeout=0.1)
+        self.assertIsNone(pool.take_idle_connection('host', True))
+        self.assertIsNone(pool.get_http_connection('host', True))
+        conn = ready_connection()
+        pool.put_http_connection('host', True, conn)
+        self.assertIs(pool.take_idle_connection('host', True), conn)
+        self.assertIsNone(pool.get_http_connection('host', True))
+
+
+class V2QueryConnection(AWSQueryConnection):
+    def _required_auth_capability(self):
+        return ['sign-v2']
+
+
+class MockQueryConnectionTestCase(unittest.TestCase):
+    def setUp(self):
+        self.events = []
+        self.http_connections = []
+        self.statuses = []
+        factory = Mock(side_effect=self._new_http_connection)
+        self.service_connection = V2QueryConnection(
+            host='example.com',
+            https_connection_factory=(factory, ()),
+            aws_access_key_id='aws_access_key_id',
+            aws_secret_access_key='aws_secret_access_key')
+
+    def _new_http_connection(self, host, **kwargs):
+        index = len(self.http_connections)
+        connection = Mock(spec=httplib.HTTPSConnection)
+        connection._HTTPConnection__response = None
+        connection.request.side_effect = \
+            lambda *args: self.events.append(('send', index))
+        def getresponse():
+            self.events.append(('receive', index))
+            response = Mock(spec=httplib.HTTPResponse)
+            response.status = self.statuses and self.statuses.pop(0) or 200
+            response.reason = 'Reason'
+            response.read.return_value = (
+                '<Response><return>%s</return></Response>' %
+                (index % 2 == 0 and 'true' or 'false'))
+            response.getheader.return_value = None
+            return response
+        connection.getresponse.side_effect = getresponse
+        self.http_connections.append(connection)
+        return connection
+
+
+class TestBatchedQueryRequests(MockQueryConnectionTestCase):
+    def test_requests_are_sent_before_responses_are_read(self):
+        responses = self.service_connection.make_requests(
+            'Action', [{'Id': str(i)} for i in range(3)])
+        self.assertEqual(len(responses), 3)
+        self.assertEqual(self.events, [
+            ('send', 0), ('send', 1), ('send', 2),
+            ('receive', 0), ('receive', 1), ('receive', 2)])
+
+    def test_max_in_flight_limits_window(self):
+        self.service_connection.make_requests(
+            'Action', [{'Id': str(i)} for i in range(3)], max_in_flight=2)
+        self.assertEqual(self.events, [
+            ('send', 0), ('send', 1), ('receive', 0), ('receive', 1),
+            ('send', 0), ('receive', 0)])
+        # The connections were reused for the second window.
+        self.assertEqual(len(self.http_connections), 2)
+
+    def test_error_frees_unread_connections(self):
+        conn = self.service_connection
+        conn._pool = ConnectionPool(max_connections_per_host=3,
+                                    checkout_timeout=0.1)
+        original = self._new_http_connection
+        def new_http_connection(host, **kwargs):
+            connection = original(host, **kwargs)
+            if len(self.http_connections) == 1:
+                connection.getresponse.side_effect = ValueError('boom')
+            return connection
+        conn.https_connection_factory = new_http_connection
+        with self.assertRaises(ValueError):
+            conn.make_requests('Action', [{'Id': str(i)} for i in range(3)])
+        # The two connections that were never read were closed.
+        self.assertTrue(self.http_connections[1].close.called)
+        self.assertTrue(self.http_connections[2].close.called)
+        # Every slot in the pool is free again.
+        for i in range(3):
+            self.assertIsNone(conn._pool.get_http_connection(
+                'example.com', True))
+
+    def test_connection_property_does_not_hold_pool_slots(self):
+        conn = self.service_connection
+        conn._pool = ConnectionPool(max_connections_per_host=1,
+                                    checkout_timeout=0.1)
+        for i in range(3):
+            conn.connection
+        self.assertEqual(conn.make_request('Action', {}).status, 200)
+        # The idle connection left by that request is handed out, and
+        # no longer counts against the limit.
+        self.assertIs(conn.connection, self.http_connections[-1])
+        self.assertEqual(conn.make_request('Action', {}).status, 200)
+
+    def test_concurrent_batches_share_bounded_pool(self):
+        conn = self.service_connection
+        conn._pool = ConnectionPool(max_connections_per_host=4,
+                                    checkout_timeout=3)
+        original = self._new_http_connection
+        def new_http_connection(host, **kwargs):
+            connection = original(host, **kwargs)
+            send = connection.request.side_effect
+            def slow_send(*args):
+                # Let the other batch take connections in between.
+                time.sleep(0.01)
+                send(*args)
+            connection.request.side_effect = slow_send
+            return connection
+        conn.https_connection_factory = new_http_connection
+        results = []
+        def batch():
+            try:
+                responses = conn.make_requests(
+                    'Action', [{'Id': str(i)} for i in range(8)])
+                results.append([r.status for r in responses])
+            except Exception, e:
+                results.append(e)
+        threads = [threading.Thread(target=batch) for i in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(10)
+        self.assertEqual(results, [[200] * 8] * 2)
+        self.assertTrue(len(self.http_connections) <= 4)
+
+    def test_get_statuses_parses_in_order(self):
+        statuses = self.service_connection.get_statuses(
+            'Action', [{'Id': str(i)} for i in range(3)])
+        self.assertEqual(statuses, [True, False, True])
+
+
+class TestConcurrentRequests(MockQueryConnectionTestCase):
+    def test_map_requests_returns_responses_in_order(self):
+        conn = self.service_connection
+        requests = [conn.build_query_request('Action', {'Id': str(i)})
+                    for i in range(4)]
+        responses = conn.map_requests(requests)
+        self.assertEqual([r.status for r in responses], [200] * 4)
+
+    def test_submit_runs_bound_method(self):
+        conn = self.service_connection
+        future = conn.submit(conn.get_status, 'Action', {})
+        self.assertEqual(future.result(), True)
+        conn.close()
+        self.assertIsNone(conn._executor)
+
+
+class TestFlowControl(MockQueryConnectionTestCase):
+    def setUp(self):
+        super(TestFlowControl, self).setUp()
+        boto.ratelimit.reset()
+        self.addCleanup(boto.ratelimit.reset)
+        sleep = patch('time.sleep')
+        sleep.start()
+        self.addCleanup(sleep.stop)
+
+    def test_server_errors_lower_shared_rate(self):
+        conn = self.service_connection
+        conn.adaptive_rate_limit = True
+        self.statuses = [503, 503, 200]
+        self.assertEqual(conn.get_status('Action', {}), True)
+        limiter = boto.ratelimit.get_rate_limiter('example.com')
+        self.assertEqual(limiter.throttles, 2)
+        self.assertIs(conn.get_rate_limiter(), limiter)
+
+    def test_retry_handler_throttle_is_recorded_once(self):
+        conn = self.service_connection
+        conn.adaptive_rate_limit = True
+        conn.circuit_breaker_threshold = 3
+        limiter = conn.get_rate_limiter()
+        breaker = conn.get_circuit_breaker()
+        outcomes = []
+        for obj, name in ((limiter, 'throttled'), (limiter, 'succeeded'),
+                          (breaker, 'record_failure'),
+                          (breaker, 'record_success')):
+            self._spy(obj, name, outcomes)
+        def retry_handler(response, i, next_sleep):
+            if response.status == 400:
+                conn.record_throttle(response)
+                return ('Throttled', i + 1, 0)
+        self.statuses = [400, 200]
+        request = conn.build_base_http_request('GET', '/', '/')
+        response = conn._mexe(request, retry_handler=retry_handler)
+        self.assertEqual(response.status, 200)
+        self.assertEqual(outcomes, ['record_failure', 'throttled',
+                                    'record_success', 'succeeded'])
+
+    def _spy(self, obj, name, calls):
+        method = getattr(obj, name)
+        def spy(*args):
+            calls.append(name)
+            return method(*args)
+        setattr(obj, name, spy)
+        self.addCleanup(delattr, obj, name)
+
+    def test_open_circuit_fails_fast(self):
+        conn = self.service_connection
+        conn.num_retries = 2
+        conn.circuit_breaker_threshold = 3
+        self.statuses = [503] * 3
+        self.assertRaises(BotoServerError, conn.get_status, 'Action', {})
+        sent = len(self.events)
+        self.assertRaises(CircuitOpenError, conn.get_status, 'Action', {})
+        self.assertEqual(len(self.events), sent)
+        # The pool slot is released when the request is refused.
+        self.assertEqual(conn._pool.host_to_count, {})
+
+    def test_disabled_by_default(self):
+        conn = self.service_connection
+        self.assertIsNone(conn.get_rate_limiter())
+        self.assertIsNone(conn.get_circuit_breaker())
+
+
+class TestRequestHooks(MockQueryConnectionTestCase):
+    def setUp(self):
+        super(TestRequestHooks, self).setUp()
+        sleep = patch('time.sleep')
+        sleep.start()
+        self.addCleanup(sleep.stop)
+        self.hook_calls = []
+        for event in boto.metrics.EVENTS:
+            self.service_connection.add_request_hook(
+                event, self._hook(event))
+
+    def _hook(self, event):
+        def hook(record):
+            self.hook_calls.append((event, record.attempts, record.status))
+        return hook
+
+    def test_hooks_see_retries(self):
+        stats = boto.metrics.RequestStats()
+        self.service_connection.add_request_hook('after-response', stats)
+        self.statuses = [503, 200]
+        self.service_connection.get_status('Action', {'Id': '1'})
+        self.assertEqual(self.hook_calls, [
+            ('before-send', 1, None),
+            ('on-retry', 1, 503),
+            ('before-send', 2, 503),
+            ('after-response', 2, 200)])
+        summary = stats.summary()[('V2QueryConnection', 'Action')]
+        self.assertEqual(summary['count'], 1)
+        self.assertEqual(summary['retries'], 1)
+        self.assertEqual(summary['bytes_sent'], 0)
+
+    def test_failed_request_is_recorded(self):
+        records = []
+        self.service_connection.add_request_hook('after-response',
+                                                 records.append)
+        self.service_connection.num_retries = 0
+        self.statuses = [500]
+        self.assertRaises(BotoServerError, self.service_connection.get_status,
+                          'Action', {})
+        self.assertTrue(isinstance(records[0].error, BotoServerError))
+        self.assertTrue(records[0].total_time >= 0)
+
+    def test_batched_requests_are_recorded(self):
+        self.statuses = [200, 503]
+        self.service_connection.make_requests(
+            'Action', [{'Id': str(i)} for i in range(2)])
+        self.assertEqual(sorted(self.hook_calls), [
+            ('after-response', 1, 200),
+            ('after-response', 2, 200),
+            ('before-send', 1, None),
+            ('before-send', 1, None),
+            ('before-send', 2, 503),
+            ('on-retry', 1, 503)])
+
+    def test_global_hooks_and_failing_hooks(self):
+        def broken(record):
+            raise ValueError('broken hook')
+        records = []
+        boto.metrics.add_request_hook('after-response', broken)
+        self.addCleanup(boto.metrics.remove_request_hook, 'after-response',
+                        broken)
+        self.service_connection.add_request_hook('after-response',
+                                                 records.append)
+        self.assertEqual(self.service_connection.get_status('Action', {}),
+                         True)
+        self.assertEqual(len(records), 1)
+
+    def test_unknown_event(self):
+        self.assertRaises(ValueError, self.service_connection.add_request_hook,
+                          'after-send', lambda record: None)
+
+
+class FakeSocket(object):
+    def __init__(self, data):
+        self.data = data
+
+    def makefile(self, *args, **kwargs):
+        return StringIO(self.data)
+
+
+def make_http_response(body, status='200 OK'):
+    response = HTTPResponse(FakeSocket(
+        'HTTP/1.1 %s\r\nContent-Length: %d\r\n\r\n%s' %
+        (status, len(body), body)))
+    response.begin()
+    return response
+
+
+class TestStreamingResponses(MockQueryConnectionTestCase):
+    body = ('<DescribeResponse><Items><item><name>a</name></item>'
+            '<item><name>b</name></item></Items></DescribeResponse>')
+
+    def test_parses_while_reading(self):
+        conn = self.service_connection
+        conn.stream_xml_responses = True
+        response = make_http_response(self.body)
+        rs = conn._parse_list(response, [('item', Item)], conn)
+        self.assertEqual([item.name for item in rs], ['a', 'b'])
+        # The body was never read into a single string.
+        self.assertEqual(response._cached_response, '')
+
+    def test_error_response_is_not_streamed(self):
+        conn = self.service_connection
+        conn.stream_xml_responses = True
+        response = make_http_response('<Error/>', '400 Bad Request')
+        with self.assertRaises(conn.ResponseError) as cm:
+            conn._parse_list(response, [('item', Item)], conn)
+        self.assertEqual(cm.exception.body, '<Error/>')
+
+    def test_buffered_when_disabled(self):
+        conn = self.service_connection
+        response = make_http_response(self.body)
+        rs = conn._parse_list(response, [('item', Item)], conn)
+        self.assertEqual([item.name for item in rs], ['a', 'b'])
+        self.assertEqual(response._cached_response, self.body)
+
+
+class Item(object):
+    def __init__(self, connection):
+        self.name = None
+
+    def startElement(self, name, attrs, connection):
+        return None
+
+    def endElement(self, name, value, connection):
+        if name == 'name':
+            self.name = value
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,98 @@
+# Copyright (c) 2013 Amazon.com, Inc. or its affiliates.  All Rights Reserved
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish, dis-
+# tribute, sublicense, and/or sell copies of the Software, and to permit
+# persons to whom the Software is furnished to do so, subject to the fol-
+# lowing conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABIL-
+# ITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT
+# SHALL THE AUTHOR BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
+# IN THE SOFTWARE.
+#
+import threading
+import time
+
+from tests.unit import unittest
+from boto.executor import Executor, TimeoutError
+
+
+class TestExecutor(unittest.TestCase):
+    def setUp(self):
+        self.executor = Executor(max_workers=3)
+
+    def tearDown(self):
+        self.executor.shutdown()
+
+    def test_map_preserves_order(self):
+        def slow_square(x):
+            time.sleep((5 - x) * 0.01)
+            return x * x
+        self.assertEqual(self.executor.map(slow_square, range(5)),
+                         [0, 1, 4, 9, 16])
+
+    def test_map_raises_after_all_calls_finish(self):
+        finished = []
+        def work(x):
+            if x == 0:
+                raise ValueError('boom')
+            time.sleep(0.05)
+            finished.append(x)
+        with self.assertRaises(ValueError):
+            self.executor.map(work, range(3))
+        self.assertEqual(sorted(finished), [1, 2])
+
+    def test_result_reraises_exception(self):
+        def fail():
+            raise ValueError('boom')
+        future = self.executor.submit(fail)
+        with self.assertRaises(ValueError):
+            future.result()
+        self.assertIsInstance(future.exception(), ValueError)
+
+    def test_worker_count_is_bounded(self):
+        lock = threading.Lock()
+        active = [0, 0]
+        def work():
+            with lock:
+                active[0] += 1
+                active[1] = max(active[0], active[1])
+            time.sleep(0.02)
+            with lock:
+                active[0] -= 1
+        self.executor.map(lambda _: work(), range(10))
+        self.assertEqual(active[1], 3)
+
+    def test_result_timeout(self):
+        event = threading.Event()
+        future = self.executor.submit(event.wait)
+        with self.assertRaises(TimeoutError):
+            future.result(timeout=0.01)
+        event.set()
+        future.result()
+        self.assertTrue(future.done())
+
+    def test_done_callback(self):
+        called = []
+        future = self.executor.submit(lambda: 42)
+        future.result()
+        future.add_done_callback(lambda f: called.append(f.result()))
+        self.assertEqual(called, [42])
+
+    def test_submit_after_shutdown(self):
+        self.executor.shutdown()
+        with self.assertRaises(RuntimeError):
+            self.executor.submit(lambda: None)
+
+
+if __name__ == '__main__':
+    unittest.main()
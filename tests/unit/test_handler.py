@@ -0,0 +1,170 @@
+# Copyright (c) 2013 Amazon.com, Inc. or its affiliates.  All Rights Reserved
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish, dis-
+# tribute, sublicense, and/or sell copies of the Software, and to permit
+# persons to whom the Software is furnished to do so, subject to the fol-
+# lowing conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABIL-
+# ITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT
+# SHALL THE AUTHOR BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
+# IN THE SOFTWARE.
+#
+import xml.sax
+from StringIO import StringIO
+
+import mock
+
+from tests.unit import unittest
+from boto import handler
+from boto.resultset import ResultSet
+from boto.s3.acl import Policy
+from boto.s3.key import Key
+
+
+LIST_BUCKET_RESULT = """<?xml version="1.0" encoding="UTF-8"?>
+<ListBucketResult xmlns="http://s3.amazonaws.com/doc/2006-03-01/">
+  <Name>bucket</Name>
+  <Prefix/>
+  <Marker></Marker>
+  <MaxKeys>1000</MaxKeys>
+  <IsTruncated>false</IsTruncated>
+  <Contents>
+    <Key>caf\xc3\xa9 &amp; cr\xc3\xa8me</Key>
+    <LastModified>2012-11-12T04:35:49.000Z</LastModified>
+    <ETag>&quot;5eb63bbbe01eeed093cb22bb8f5acdc3&quot;</ETag>
+    <Size>11</Size>
+    <Owner><ID>abc</ID><DisplayName>owner</DisplayName></Owner>
+    <StorageClass>STANDARD</StorageClass>
+  </Contents>
+  <Contents>
+    <Key>plain</Key>
+    <LastModified>2012-11-12T04:35:50.000Z</LastModified>
+    <ETag>&quot;d41d8cd98f00b204e9800998ecf8427e&quot;</ETag>
+    <Size>0</Size>
+    <StorageClass>REDUCED_REDUNDANCY</StorageClass>
+  </Contents>
+</ListBucketResult>"""
+
+ACCESS_CONTROL_POLICY = """<?xml version="1.0" encoding="UTF-8"?>
+<AccessControlPolicy xmlns="http://s3.amazonaws.com/doc/2006-03-01/">
+  <Owner><ID>abc</ID><DisplayName>owner</DisplayName></Owner>
+  <AccessControlList>
+    <Grant>
+      <Grantee xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance"
+               xsi:type="CanonicalUser">
+        <ID>abc</ID><DisplayName>owner</DisplayName>
+      </Grantee>
+      <Permission>FULL_CONTROL</Permission>
+    </Grant>
+  </AccessControlList>
+</AccessControlPolicy>"""
+
+
+class EventRecorder(xml.sax.ContentHandler):
+    def __init__(self):
+        self.events = []
+        self.text = u''
+
+    def startElement(self, name, attrs):
+        self.events.append(('start', name, sorted(attrs.items()), self.text))
+        self.text = u''
+
+    def endElement(self, name):
+        self.events.append(('end', name, self.text))
+        self.text = u''
+
+    def characters(self, content):
+        self.text += content
+
+
+class TestParsers(unittest.TestCase):
+    def parse_events(self, parser_name, body):
+        recorder = EventRecorder()
+        handler.parse_string(body, recorder,
+                             handler.get_parser(parser_name))
+        return recorder.events
+
+    def test_events_match_sax(self):
+        for name in ('expat', 'etree'):
+            for body in (LIST_BUCKET_RESULT, ACCESS_CONTROL_POLICY):
+                self.assertEqual(self.parse_events(name, body),
+                                 self.parse_events('sax', body))
+
+    def test_etree_builds_same_keys(self):
+        def keys(parser_name):
+            rs = ResultSet([('Contents', Key)])
+            handler.parse_string(LIST_BUCKET_RESULT,
+                                 handler.XmlHandler(rs, None),
+                                 handler.get_parser(parser_name))
+            return [(k.name, k.size, k.etag, k.last_modified,
+                     k.storage_class) for k in rs]
+        self.assertEqual(keys('etree'), keys('sax'))
+        self.assertEqual(keys('etree')[0][0], u'caf\xe9 & cr\xe8me')
+
+    def test_etree_handles_namespaced_attributes(self):
+        policy = Policy()
+        handler.parse_string(ACCESS_CONTROL_POLICY,
+                             handler.XmlHandler(policy, None),
+                             handler.get_parser('etree'))
+        self.assertEqual(policy.acl.grants[0].type, 'CanonicalUser')
+        self.assertEqual(policy.acl.grants[0].permission, 'FULL_CONTROL')
+
+    def test_parse_errors_are_sax_exceptions(self):
+        for name in ('sax', 'expat', 'etree'):
+            with self.assertRaises(xml.sax.SAXParseException):
+                self.parse_events(name, '<Unclosed>')
+
+    def test_unknown_parser_is_an_error(self):
+        self.assertRaises(ValueError, handler.get_parser, 'missing')
+
+    def test_unavailable_parser_falls_back_to_sax(self):
+        def missing():
+            raise ImportError('lxml')
+        with mock.patch.dict(handler._PARSER_LOADERS, {'lxml': missing}):
+            with mock.patch.dict(handler.PARSERS):
+                handler.PARSERS.pop('lxml', None)
+                self.assertIs(handler.get_parser('lxml'),
+                              handler.get_parser('sax'))
+
+    def test_parse_stream_counts_bytes(self):
+        for name in ('sax', 'expat', 'etree'):
+            recorder = EventRecorder()
+            size = handler.parse_stream(StringIO(LIST_BUCKET_RESULT),
+                                        recorder, chunk_size=64,
+                                        parser=handler.get_parser(name))
+            self.assertEqual(size, len(LIST_BUCKET_RESULT))
+            self.assertEqual(recorder.events,
+                             self.parse_events('sax', LIST_BUCKET_RESULT))
+        self.assertEqual(handler.parse_stream(StringIO(''), EventRecorder()),
+                         0)
+
+    def test_parse_stream_default_chunk_size(self):
+        # Several KB, so pyexpat asks for the document in smaller reads
+        # than the first chunk parse_stream reads.
+        contents = ''.join(
+            '<Contents><Key>key-%d</Key><Size>%d</Size></Contents>' % (i, i)
+            for i in range(400))
+        body = ('<?xml version="1.0" encoding="UTF-8"?>'
+                '<ListBucketResult>%s</ListBucketResult>' % contents)
+        self.assertTrue(len(body) > 8192)
+        expected = self.parse_events('sax', body)
+        for name in ('sax', 'expat', 'etree'):
+            recorder = EventRecorder()
+            size = handler.parse_stream(StringIO(body), recorder,
+                                        parser=handler.get_parser(name))
+            self.assertEqual(size, len(body))
+            self.assertEqual(recorder.events, expected)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,102 @@
+# Copyright (c) 2013 Amazon.com, Inc. or its affiliates.  All Rights Reserved
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish, dis-
+# tribute, sublicense, and/or sell copies of the Software, and to permit
+# persons to whom the Software is furnished to do so, subject to the fol-
+# lowing conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABIL-
+# ITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT
+# SHALL THE AUTHOR BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
+# IN THE SOFTWARE.
+#
+from mock import Mock
+
+from tests.unit import unittest
+from boto.connection import HTTPRequest
+from boto.metrics import Histogram, RequestRecord, RequestStats
+
+
+class TestHistogram(unittest.TestCase):
+    def test_percentiles_within_precision(self):
+        histogram = Histogram(precision=0.01)
+        for value in range(1, 1001):
+            histogram.add(value / 1000.0)
+        self.assertAlmostEqual(histogram.percentile(50), 0.5, delta=0.005)
+        self.assertAlmostEqual(histogram.percentile(99), 0.99, delta=0.01)
+        self.assertEqual(histogram.percentile(100), 1.0)
+        self.assertEqual(histogram.min, 0.001)
+        self.assertAlmostEqual(histogram.mean(), 0.5005)
+
+    def test_empty(self):
+        histogram = Histogram()
+        self.assertEqual(histogram.percentile(50), None)
+        self.assertEqual(histogram.mean(), None)
+
+
+class FakeClock(object):
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_record(clock, action='DescribeInstances', body='body'):
+    request = HTTPRequest('POST', 'https', 'ec2.amazonaws.com', 443, '/',
+                          None, {'Action': action}, {}, body)
+    return RequestRecord('ec2', request, clock=clock)
+
+
+class TestRequestRecord(unittest.TestCase):
+    def test_times_and_sizes(self):
+        clock = FakeClock()
+        record = make_record(clock)
+        response = Mock(status=200)
+        response.getheader.return_value = '42'
+        clock.now = 1.0
+        record.start_attempt(Mock(sock=object()))
+        clock.now = 1.25
+        record.got_response(response)
+        clock.now = 2.0
+        record.finish(response)
+        self.assertEqual(record.action, 'DescribeInstances')
+        self.assertEqual(record.time_to_first_byte, 0.25)
+        self.assertEqual(record.total_time, 2.0)
+        self.assertEqual(record.bytes_sent, 4)
+        self.assertEqual(record.bytes_received, 42)
+        self.assertTrue(record.reused_connection)
+
+
+class TestRequestStats(unittest.TestCase):
+    def test_groups_by_service_and_action(self):
+        clock = FakeClock()
+        stats = RequestStats()
+        for action, seconds in [('A', 1.0), ('A', 3.0), ('B', 2.0)]:
+            record = make_record(clock, action)
+            clock.now += seconds
+            record.finish(error=ValueError())
+            stats(record)
+        summary = stats.summary()
+        self.assertEqual(summary[('ec2', 'A')]['count'], 2)
+        self.assertEqual(summary[('ec2', 'A')]['errors'], 2)
+        self.assertEqual(summary[('ec2', 'A')]['max'], 3.0)
+        self.assertEqual(summary[('ec2', 'B')]['p99'], 2.0)
+        report = stats.report().splitlines()
+        self.assertEqual(len(report), 3)
+        self.assertTrue(report[1].startswith('ec2/A '))
+        stats.reset()
+        self.assertEqual(stats.summary(), {})
+
+
+if __name__ == '__main__':
+    unittest.main()
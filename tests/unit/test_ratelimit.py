@@ -0,0 +1,127 @@
+# Copyright (c) 2013 Amazon.com, Inc. or its affiliates.  All Rights Reserved
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish, dis-
+# tribute, sublicense, and/or sell copies of the Software, and to permit
+# persons to whom the Software is furnished to do so, subject to the fol-
+# lowing conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABIL-
+# ITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT
+# SHALL THE AUTHOR BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
+# IN THE SOFTWARE.
+#
+from tests.unit import unittest
+from boto.exception import CircuitOpenError
+from boto.ratelimit import AdaptiveRateLimiter, CircuitBreaker
+
+
+class FakeClock(object):
+    def __init__(self, now=1000.0):
+        self.now = now
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class TestAdaptiveRateLimiter(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.limiter = AdaptiveRateLimiter(clock=self.clock,
+                                           sleep=self.clock.sleep)
+
+    def test_does_not_wait_before_first_throttle(self):
+        for _ in range(100):
+            self.assertEqual(self.limiter.acquire(), 0)
+        self.assertEqual(self.clock.sleeps, [])
+        self.assertEqual(self.limiter.rate, None)
+
+    def test_throttle_halves_observed_rate(self):
+        for _ in range(20):
+            self.limiter.acquire()
+        self.limiter.throttled()
+        self.assertEqual(self.limiter.rate, 10)
+        self.limiter.throttled()
+        self.assertEqual(self.limiter.rate, 5)
+        self.assertEqual(self.limiter.throttles, 2)
+
+    def test_rate_never_drops_below_minimum(self):
+        for _ in range(10):
+            self.limiter.throttled()
+        self.assertEqual(self.limiter.rate, self.limiter.min_rate)
+
+    def test_requests_are_paced_at_rate(self):
+        for _ in range(8):
+            self.limiter.acquire()
+        self.limiter.throttled()
+        start = self.clock.now
+        for _ in range(9):
+            self.limiter.acquire()
+        # 4 requests per second, starting from an empty bucket.
+        self.assertAlmostEqual(self.clock.now - start, 9 / 4.0)
+
+    def test_success_raises_rate_up_to_maximum(self):
+        self.limiter.max_rate = 3
+        self.limiter.throttled()
+        self.limiter.throttled()
+        rate = self.limiter.rate
+        self.limiter.succeeded()
+        self.assertAlmostEqual(self.limiter.rate, rate + 1.0 / rate)
+        for _ in range(100):
+            self.limiter.succeeded()
+        self.assertEqual(self.limiter.rate, 3)
+
+
+class TestCircuitBreaker(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.breaker = CircuitBreaker(failure_threshold=3, reset_timeout=10,
+                                      clock=self.clock)
+
+    def test_opens_after_consecutive_failures(self):
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+        self.breaker.record_success()
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+        self.assertFalse(self.breaker.is_open())
+        self.breaker.record_failure()
+        self.assertTrue(self.breaker.is_open())
+        self.assertRaises(CircuitOpenError, self.breaker.before_request)
+
+    def test_trial_request_after_timeout(self):
+        for _ in range(3):
+            self.breaker.record_failure()
+        self.clock.now += 10
+        self.breaker.before_request()
+        # Only one request is let through while the trial is running.
+        self.assertRaises(CircuitOpenError, self.breaker.before_request)
+        self.breaker.record_success()
+        self.assertFalse(self.breaker.is_open())
+        self.breaker.before_request()
+
+    def test_failed_trial_reopens(self):
+        for _ in range(3):
+            self.breaker.record_failure()
+        self.clock.now += 10
+        self.breaker.before_request()
+        self.breaker.record_failure()
+        self.clock.now += 5
+        self.assertRaises(CircuitOpenError, self.breaker.before_request)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -23,6 +23,7 @@ import unittest
 import hashlib
 import hmac
 
+from boto.utils import LRUCache
 from boto.utils import Password
 from boto.utils import pythonize_name
 
@@ -105,5 +106,36 @@ class TestPythonizeName(unittest.TestCase):
         self.assertEqual(pythonize_name('HTTPStatus200Ok'), 'http_status_200_ok')
 
 
+
+class TestLRUCache(unittest.TestCase):
+    def test_evicts_least_recently_used(self):
+        cache = LRUCache(2)
+        cache['a'] = 1
+        cache['b'] = 2
+        cache['a']
+        cache['c'] = 3
+        self.assertEqual(list(cache), ['c', 'a'])
+        self.assertEqual(cache.get('b'), None)
+
+    def test_delete(self):
+        cache = LRUCache(3)
+        for name in 'abc':
+            cache[name] = name
+        del cache['b']
+        self.assertEqual(list(cache), ['c', 'a'])
+        del cache['c']
+        del cache['a']
+        self.assertEqual(list(cache), [])
+        cache['d'] = 4
+        self.assertEqual(list(cache), ['d'])
+        self.assertRaises(KeyError, cache.__delitem__, 'x')
+
+    def test_clear(self):
+        cache = LRUCache(3)
+        cache['a'] = 1
+        cache.clear()
+        self.assertEqual(len(cache), 0)
+        self.assertEqual(list(cache), [])
+
 if __name__ == '__main__':
     unittest.main()